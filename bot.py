@@ -1,15 +1,19 @@
-from src.core.bot import create_bot
+from src.core.bot import GuapishBot, create_bot
 from src.core.events import CoreCog
 from src.features import FEATURES
 
 
-bot = create_bot()
-bot.add_cog(CoreCog(bot))
-for feature in FEATURES:
-	bot.add_cog(feature(bot))
+def build_bot() -> GuapishBot:
+	bot = create_bot()
+	bot.add_cog(CoreCog(bot))
+	for feature in FEATURES:
+		bot.add_cog(feature(bot))
+	return bot
 
 
+# Nothing may run on import: music worker processes import this module again.
 if __name__ == '__main__':
+	bot = build_bot()
 	token = bot.app_config.bot_token
 	if not token:
 		print(' ERR > Token is invalid!')
@@ -9,6 +9,7 @@ FALSY = {'false', 'f', 'no', 'n', '0', 'off'}
 # The original hardcoded roller list. Kept as the default so an unset
 # ALLOWED_ROLLERS_* does not silently revoke access for two of the three.
 DEFAULT_ALLOWED_ROLLERS = '148907812670406656,373724550350897154,289947773183197185'
+DEFAULT_MUSIC_CACHE_MB = 2048
 
 
 class AppConfig:
@@ -17,6 +18,13 @@ class AppConfig:
 		self.bot_token = ''
 		self.allowed_rollers: list[str] = []
 		self.patreon_role = ''
+		self.music_cache_mb = DEFAULT_MUSIC_CACHE_MB
+		self.music_warmup = True
+		self.music_worker_processes = False
+		self.music_worker_url: str | None = None
+		self.music_worker_token: str | None = None
+		self.music_gapless = True
+		self.music_crossfade_seconds = 0
 
 		self.load_env()
 
@@ -38,6 +46,15 @@ class AppConfig:
 			return []
 		return [part.strip() for part in value.split(',') if part.strip()]
 
+	def env_int(self, key: str, default: int) -> int:
+		value = self.env(key)
+		if value is None or not value.strip():
+			return default
+		try:
+			return int(value.strip())
+		except ValueError:
+			raise ValueError(f'{key} must be a whole number, got: {value!r}') from None
+
 	def load_env(self) -> None:
 		load_dotenv()
 
@@ -46,6 +63,15 @@ class AppConfig:
 		self.bot_token = self.env('BOT_TOKEN')
 		self.allowed_rollers = self.env_list('ALLOWED_ROLLERS', DEFAULT_ALLOWED_ROLLERS)
 		self.patreon_role = self.env('PATREON_ROLE')
+		self.music_cache_mb = self.env_int('MUSIC_CACHE_MB', DEFAULT_MUSIC_CACHE_MB)
+		self.music_warmup = self._parse_bool(self.env('MUSIC_WARMUP'), default=True, key='MUSIC_WARMUP')
+		self.music_worker_processes = self._parse_bool(
+			self.env('MUSIC_WORKER_PROCESSES'), default=False, key='MUSIC_WORKER_PROCESSES',
+		)
+		self.music_worker_url = self.env('MUSIC_WORKER_URL') or None
+		self.music_worker_token = self.env('MUSIC_WORKER_TOKEN') or None
+		self.music_gapless = self._parse_bool(self.env('MUSIC_GAPLESS'), default=True, key='MUSIC_GAPLESS')
+		self.music_crossfade_seconds = self.env_int('MUSIC_CROSSFADE_SECONDS', 0)
 
 	@staticmethod
 	def _parse_bool(value: str | None, *, default: bool, key: str = 'DEV_MODE') -> bool:
@@ -0,0 +1,214 @@
+import multiprocessing
+import pickle
+import resource
+import signal
+import threading
+import time
+from collections.abc import Callable
+from multiprocessing.connection import Connection
+from typing import Any
+
+
+# A worker process is replaced after this many jobs.
+WORKER_MAX_JOBS = 50
+# A worker whose peak memory has grown past this is replaced after its job.
+WORKER_MAX_RSS = 512 * 1024 * 1024
+# How often a waiting call looks at its abort event.
+_ABORT_POLL = 0.1
+
+
+class JobTimeout(TimeoutError):
+	pass
+
+
+class JobAborted(Exception):
+	pass
+
+
+class JobFailed(Exception):
+	"""A worker raised something that could not be sent back as itself."""
+
+
+class Host:
+	"""The parent, as seen from inside a worker process.
+
+	ask() blocks until the parent answers; tell() does not wait. Either is handled
+	by the `serve` callback of the call() currently running the job.
+	"""
+
+	def __init__(self, conn: Connection):
+		self._conn = conn
+
+	def ask(self, name: str, *args) -> Any:
+		self._conn.send(('ask', name, args))
+		return self._conn.recv()
+
+	def tell(self, name: str, *args):
+		self._conn.send(('tell', name, args))
+
+
+def _peak_rss() -> int:
+	# Kilobytes on Linux.
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _portable(error: BaseException) -> BaseException:
+	"""`error` if it survives pickling, else a JobFailed carrying its message."""
+	try:
+		pickle.loads(pickle.dumps(error))
+		return error
+	except Exception:
+		# An exception holding a traceback, for one.
+		return JobFailed(f'{type(error).__name__}: {error}')
+
+
+def _serve(conn: Connection, initializer: Callable[[Host], None] | None):
+	# Ctrl+C reaches the whole process group; the parent decides when workers stop.
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+	if initializer is not None:
+		initializer(Host(conn))
+	while True:
+		try:
+			fn, args = conn.recv()
+		except EOFError:
+			return
+		try:
+			reply = ('ok', fn(*args))
+		except BaseException as error:
+			reply = ('error', _portable(error))
+		conn.send((*reply, _peak_rss()))
+
+
+class _Worker:
+	__slots__ = ('process', 'conn', 'jobs')
+
+	def __init__(self, process: multiprocessing.Process, conn: Connection):
+		self.process = process
+		self.conn = conn
+		self.jobs = 0
+
+	def kill(self):
+		self.conn.close()
+		if self.process.is_alive():
+			self.process.kill()
+		self.process.join()
+
+
+class ProcessPool:
+	"""Worker processes for CPU-heavy jobs, one per calling thread.
+
+	Work that holds the GIL in a thread takes that time from the event loop and
+	py-cord's voice thread; here the thread only waits on a pipe. A worker can also
+	be killed, which a thread cannot: a job that runs past its timeout or is
+	aborted takes its worker down with it, and the thread starts a fresh one for
+	its next job.
+
+	Workers are spawned, so each imports the main module again: everything it does
+	besides imports must sit under `if __name__ == '__main__'`.
+	"""
+
+	def __init__(
+		self,
+		*,
+		initializer: Callable[[Host], None] | None = None,
+		max_jobs: int = WORKER_MAX_JOBS,
+		max_rss: int = WORKER_MAX_RSS,
+	):
+		self.initializer = initializer
+		self.max_jobs = max_jobs
+		self.max_rss = max_rss
+		# Never fork: the parent is full of threads holding locks.
+		self._context = multiprocessing.get_context('spawn')
+		self._local = threading.local()
+		self._workers: set[_Worker] = set()
+		self._lock = threading.Lock()
+
+	def call(
+		self,
+		fn: Callable,
+		*args,
+		timeout: float,
+		abort: threading.Event | None = None,
+		serve: Callable[..., Any] | None = None,
+	) -> Any:
+		"""Run fn(*args) in this thread's worker process and return what it returns.
+
+		`fn`, its arguments and its result must pickle. Time the parent spends in
+		`serve`, answering the worker, does not count against `timeout`.
+		"""
+		worker = self._checkout()
+		deadline = time.monotonic() + timeout
+		try:
+			worker.conn.send((fn, args))
+			while True:
+				if abort is not None and abort.is_set():
+					raise JobAborted(f'{fn.__name__} aborted')
+				remaining = deadline - time.monotonic()
+				if remaining <= 0:
+					raise JobTimeout(f'{fn.__name__} took longer than {timeout:.0f}s')
+				if not worker.conn.poll(min(remaining, _ABORT_POLL)):
+					continue
+
+				kind, *payload = worker.conn.recv()
+				if kind in ('ask', 'tell'):
+					name, request = payload
+					started = time.monotonic()
+					answer = serve(name, *request)
+					deadline += time.monotonic() - started
+					if kind == 'ask':
+						worker.conn.send(answer)
+					continue
+
+				value, rss = payload
+				break
+		except (JobAborted, JobTimeout):
+			# Mid-job: the only way to stop it is to kill it.
+			self._retire(worker)
+			raise
+		except (EOFError, OSError) as error:
+			self._retire(worker)
+			raise JobFailed(f'Worker process exited (code {worker.process.exitcode})') from error
+		except BaseException:
+			self._retire(worker)
+			raise
+
+		worker.jobs += 1
+		if worker.jobs >= self.max_jobs or rss >= self.max_rss:
+			self._retire(worker)
+		if kind == 'error':
+			raise value
+		return value
+
+	def close(self):
+		"""Stop every worker. Threads start fresh ones on their next call."""
+		with self._lock:
+			workers, self._workers = self._workers, set()
+		for worker in workers:
+			worker.kill()
+
+	def _checkout(self) -> _Worker:
+		worker = getattr(self._local, 'worker', None)
+		if worker is not None and worker in self._workers:
+			return worker
+
+		conn, child_conn = self._context.Pipe()
+		process = self._context.Process(
+			target=_serve,
+			args=(child_conn, self.initializer),
+			name=f'music-{threading.current_thread().name}',
+			daemon=True,
+		)
+		process.start()
+		child_conn.close()
+		worker = _Worker(process, conn)
+		self._local.worker = worker
+		with self._lock:
+			self._workers.add(worker)
+		return worker
+
+	def _retire(self, worker: _Worker):
+		with self._lock:
+			self._workers.discard(worker)
+		if getattr(self._local, 'worker', None) is worker:
+			self._local.worker = None
+		worker.kill()
@@ -0,0 +1,187 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+
+DEFAULT_CACHE_MAX_BYTES = 2 * 1024 ** 3
+# Cached files are named after their key: the YouTube video id, and the bitrate
+# cap it was fetched at, if any. Anything else in the directory is a download that
+# never finished (yt-dlp .part files, staging names).
+_ENTRY_NAME = re.compile(r'^(?P<key>[A-Za-z0-9_-]{11}(?:\.\d+k)?)\.[A-Za-z0-9]+$')
+
+
+@dataclass(slots=True)
+class _Entry:
+	path: Path
+	size: int
+	refs: int = 0
+
+
+def cache_key(video_id: str, cap: int | None = None) -> str:
+	"""The key for `video_id` fetched at `cap` kbps at most, or uncapped."""
+	return video_id if cap is None else f'{video_id}.{cap}k'
+
+
+class AudioCache:
+	"""Downloaded audio shared across guilds, keyed by cache_key().
+
+	Least recently used files are evicted once the directory exceeds its byte
+	budget, but never while a player still holds a reference: every acquire() or
+	add() must be paired with exactly one release().
+	"""
+
+	def __init__(self, root: Path, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+		self.root = root
+		self.max_bytes = max_bytes
+		self._entries: OrderedDict[str, _Entry] = OrderedDict()
+		self._by_path: dict[Path, str] = {}
+		self._size = 0
+		# Downloads finish on worker threads; the index is shared with the loop.
+		self._lock = threading.Lock()
+
+	@property
+	def size(self) -> int:
+		return self._size
+
+	def __len__(self) -> int:
+		return len(self._entries)
+
+	def rebuild(self):
+		"""Re-index what a previous process left on disk. Safe to call at startup.
+
+		Unfinished downloads are deleted; complete files are kept, oldest first in
+		eviction order, and the budget is enforced straight away.
+		"""
+		with self._lock:
+			self._entries.clear()
+			self._by_path.clear()
+			self._size = 0
+			if not self.root.exists():
+				return
+
+			found: list[tuple[float, str, Path, int]] = []
+			seen: set[str] = set()
+			removed = 0
+			for path in self.root.iterdir():
+				if not path.is_file():
+					continue
+
+				match = _ENTRY_NAME.match(path.name)
+				if match is None or match['key'] in seen:
+					_remove(path)
+					removed += 1
+					continue
+
+				try:
+					stat = path.stat()
+				except OSError as error:
+					print(f' ERR > Failed to index cached audio {path}: {error}')
+					continue
+				seen.add(match['key'])
+				found.append((stat.st_mtime, match['key'], path, stat.st_size))
+
+			for _, key, path, size in sorted(found):
+				self._insert(key, path, size)
+			self._evict()
+
+		if removed:
+			print(f'LOG > Cleared {removed} unfinished music download(s)')
+		print(f'LOG > Music cache holds {len(self._entries)} file(s), {self._size // (1024 * 1024)} MiB')
+
+	def acquire(self, key: str) -> Path | None:
+		"""A referenced path to the cached audio for `key`, if there is one."""
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is None:
+				return None
+
+			if not entry.path.exists():
+				# Deleted behind our back; forget it rather than hand out a dead path.
+				self._forget(key)
+				return None
+
+			entry.refs += 1
+			self._entries.move_to_end(key)
+			_touch(entry.path)
+			return entry.path
+
+	def add(self, key: str, staged: Path) -> Path:
+		"""Move a finished download into the cache and return a referenced path.
+
+		If another download of the same video got there first, the staged copy is
+		discarded and the existing file is shared instead.
+		"""
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is not None and entry.path.exists():
+				if staged != entry.path:
+					_remove(staged)
+				entry.refs += 1
+				self._entries.move_to_end(key)
+				return entry.path
+			if entry is not None:
+				self._forget(key)
+
+			self.root.mkdir(parents=True, exist_ok=True)
+			path = self.root / f'{key}{staged.suffix}'
+			os.replace(staged, path)
+			entry = self._insert(key, path, path.stat().st_size)
+			entry.refs += 1
+			self._evict()
+			return path
+
+	def owns(self, path: Path) -> bool:
+		with self._lock:
+			return path in self._by_path
+
+	def release(self, path: Path) -> bool:
+		"""Drop one reference to `path`. False if the cache does not own it."""
+		with self._lock:
+			key = self._by_path.get(path)
+			if key is None:
+				return False
+
+			entry = self._entries[key]
+			entry.refs = max(0, entry.refs - 1)
+			self._evict()
+			return True
+
+	def _insert(self, key: str, path: Path, size: int) -> _Entry:
+		entry = _Entry(path=path, size=size)
+		self._entries[key] = entry
+		self._by_path[path] = key
+		self._size += size
+		return entry
+
+	def _forget(self, key: str) -> _Entry:
+		entry = self._entries.pop(key)
+		self._by_path.pop(entry.path, None)
+		self._size -= entry.size
+		return entry
+
+	def _evict(self):
+		if self._size <= self.max_bytes:
+			return
+
+		for key in [key for key, entry in self._entries.items() if entry.refs == 0]:
+			if self._size <= self.max_bytes:
+				return
+			_remove(self._forget(key).path)
+
+
+def _remove(path: Path):
+	try:
+		path.unlink(missing_ok=True)
+	except OSError as error:
+		print(f' ERR > Failed to delete cached audio {path}: {error}')
+
+
+def _touch(path: Path):
+	# The mtime is the LRU order a restarted process rebuilds from.
+	try:
+		path.touch()
+	except OSError:
+		pass
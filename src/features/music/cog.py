@@ -4,20 +4,34 @@ import discord
 
 from src.core.bot import GuapishBot
 from src.core.pagination import PaginationView
-from src.features.music.extractor import TrackExtractError, clear_cache, extract_track
+from src.features.music.extractor import (
+	TrackExtractError,
+	configure_cache,
+	configure_service,
+	configure_workers,
+	extract_playlist,
+	extract_track,
+	is_playlist_url,
+	load_cache,
+	unload,
+	warm_up,
+)
 from src.features.music.helpers import (
 	build_queue_pages,
 	cleared_embed,
 	now_playing_embed,
+	parse_timestamp,
 	paused_embed,
 	playing_embed,
+	playlist_embed,
 	queued_embed,
 	render_queue_page,
 	resumed_embed,
+	seeked_embed,
 	skipped_embed,
 	stopped_embed,
 )
-from src.features.music.player import GuildPlayer
+from src.features.music.player import GuildPlayer, configure_transitions
 from src.features.music.pycord_patch import apply as apply_pycord_patches
 
 
@@ -31,7 +45,12 @@ class MusicCog(discord.Cog):
 		self.players: dict[int, GuildPlayer] = {}
 		# Before any voice connection exists; see pycord_patch for why.
 		apply_pycord_patches()
-		clear_cache()
+		configure_cache(bot.app_config.music_cache_mb * 1024 * 1024)
+		configure_workers(bot.app_config.music_worker_processes)
+		configure_service(bot.app_config.music_worker_url, bot.app_config.music_worker_token)
+		load_cache()
+		configure_transitions(bot.app_config.music_gapless, bot.app_config.music_crossfade_seconds)
+		self._warmup: asyncio.Task | None = None
 
 	def cog_unload(self):
 		for player in list(self.players.values()):
@@ -42,6 +61,9 @@ class MusicCog(discord.Cog):
 				except RuntimeError:
 					pass
 		self.players.clear()
+		if self._warmup is not None:
+			self._warmup.cancel()
+		unload()
 
 	def _get_player(self, guild_id: int) -> GuildPlayer:
 		player = self.players.get(guild_id)
@@ -108,6 +130,14 @@ class MusicCog(discord.Cog):
 		else:
 			player.start_alone_timer()
 
+	@discord.Cog.listener()
+	async def on_ready(self):
+		# on_ready fires again after every gateway reconnect; one warm-up per process
+		# is enough. A worker service warms itself up.
+		config = self.bot.app_config
+		if self._warmup is None and config.music_warmup and not config.music_worker_url:
+			self._warmup = asyncio.create_task(warm_up())
+
 	@discord.Cog.listener()
 	async def on_voice_state_update(self, member, before, after):
 		guild = member.guild
@@ -142,7 +172,7 @@ class MusicCog(discord.Cog):
 
 		await self._sync_alone_state(player, bot_channel)
 
-	@discord.slash_command(description='Play a YouTube song by title or URL.')
+	@discord.slash_command(description='Play a YouTube song by title or URL, or a whole playlist.')
 	async def play(self, ctx, query: str):
 		if ctx.guild is None:
 			await ctx.respond('This command can only be used in a server.', ephemeral=True)
@@ -167,21 +197,25 @@ class MusicCog(discord.Cog):
 
 		await ctx.defer()
 
+		if is_playlist_url(query):
+			await self._play_playlist(ctx, player, channel, query)
+			return
+
 		async with player.request_lock:
 			# Checked before extraction so a full queue costs no network work.
-			# request_lock is the only path that grows the queue, so this holds.
-			queued = list(player.queue)
-			if len(queued) >= MAX_QUEUE_SIZE:
-				await ctx.respond(f'The queue is full ({MAX_QUEUE_SIZE} tracks). Try again once it drains.')
-				return
-
-			owned = sum(1 for queued_track in queued if queued_track.requester_id == ctx.author.id)
-			if owned >= MAX_TRACKS_PER_USER:
-				await ctx.respond(f'You already have {MAX_TRACKS_PER_USER} tracks queued. Wait for some to play.')
+			refusal = self._queue_refusal(player, ctx.author.id)
+			if refusal is not None:
+				await ctx.respond(refusal)
 				return
 
 			try:
-				track = await extract_track(query, ctx.author.id, ctx.author.name)
+				track = await extract_track(
+					query,
+					ctx.author.id,
+					ctx.author.name,
+					ctx.guild.id,
+					bitrate=getattr(channel, 'bitrate', None),
+				)
 			except TrackExtractError as error:
 				await ctx.respond(str(error))
 				return
@@ -190,21 +224,109 @@ class MusicCog(discord.Cog):
 				await ctx.respond('Could not find that track.')
 				return
 
+			if not await self._join(ctx, player, channel):
+				return
+
+			print(f'LOG > Queued by {ctx.author.name}: {track.title}')
+			should_start, position = await player.enqueue(track)
+
+		await self._announce(ctx, player, track, should_start, position)
+
+	async def _play_playlist(self, ctx, player: GuildPlayer, channel, url: str):
+		tracks = extract_playlist(url, ctx.author.id, ctx.author.name, ctx.guild.id)
+		announced = asyncio.Event()
+		async with player.request_lock:
+			refusal = self._queue_refusal(player, ctx.author.id)
+			if refusal is not None:
+				await ctx.respond(refusal)
+				return
+
 			try:
-				await player.connect(channel)
+				# Only the first entry is waited for; the rest follow in the background.
+				first = await anext(tracks, None)
+			except TrackExtractError as error:
+				await ctx.respond(str(error))
+				return
 			except Exception as error:
-				print(f' ERR (play connect) > {error}')
-				await ctx.respond('Could not join your voice channel.')
+				print(f' ERR (play playlist) > {error}')
+				await ctx.respond('Could not read that playlist.')
+				return
+			if first is None:
+				await ctx.respond('That playlist has no playable tracks.')
 				return
 
-			# Cover the case where the last human left while we were extracting/connecting;
-			# no further voice event will fire for us in that window.
-			await self._sync_alone_state(player, channel)
+			if not await self._join(ctx, player, channel):
+				await tracks.aclose()
+				return
 
-			player.text_channel = ctx.channel
-			print(f'LOG > Queued by {ctx.author.name}: {track.title}')
-			should_start, position = await player.enqueue(track)
+			print(f'LOG > Queued playlist by {ctx.author.name}: {url}')
+			should_start, position = await player.enqueue(first)
+			player.ingest(self._ingest_playlist(ctx, player, tracks, announced))
+
+		try:
+			await self._announce(ctx, player, first, should_start, position)
+		finally:
+			announced.set()
+
+	async def _ingest_playlist(self, ctx, player: GuildPlayer, tracks, announced: asyncio.Event):
+		"""Queue the rest of a playlist as it is listed, taking the request lock per entry."""
+		added = 1
+		stopped = None
+		try:
+			async for track in tracks:
+				async with player.request_lock:
+					stopped = self._queue_refusal(player, ctx.author.id)
+					if stopped is not None:
+						break
+					await player.enqueue(track)
+					added += 1
+		except TrackExtractError as error:
+			stopped = str(error)
+		except Exception as error:
+			print(f' ERR (playlist) > {error}')
+			stopped = 'Could not read the rest of the playlist.'
+		finally:
+			await tracks.aclose()
+
+		print(f'LOG > Queued {added} playlist track(s) for {ctx.author.name}')
+		# After the first track's own reply, so the two arrive in order.
+		await announced.wait()
+		try:
+			await ctx.respond(embed=playlist_embed(added, stopped))
+		except Exception as error:
+			print(f' ERR (playlist) > {error}')
+
+	def _queue_refusal(self, player: GuildPlayer, user_id: int) -> str | None:
+		"""Why `user_id` cannot queue another track right now, if they cannot.
+
+		Caller must hold player.request_lock: it is the only path that grows the
+		queue, so the answer holds until it is released.
+		"""
+		queued = list(player.queue)
+		if len(queued) >= MAX_QUEUE_SIZE:
+			return f'The queue is full ({MAX_QUEUE_SIZE} tracks). Try again once it drains.'
+
+		owned = sum(1 for queued_track in queued if queued_track.requester_id == user_id)
+		if owned >= MAX_TRACKS_PER_USER:
+			return f'You already have {MAX_TRACKS_PER_USER} tracks queued. Wait for some to play.'
+		return None
+
+	async def _join(self, ctx, player: GuildPlayer, channel) -> bool:
+		try:
+			await player.connect(channel)
+		except Exception as error:
+			print(f' ERR (play connect) > {error}')
+			await ctx.respond('Could not join your voice channel.')
+			return False
 
+		# Cover the case where the last human left while we were extracting/connecting;
+		# no further voice event will fire for us in that window.
+		await self._sync_alone_state(player, channel)
+
+		player.text_channel = ctx.channel
+		return True
+
+	async def _announce(self, ctx, player: GuildPlayer, track, should_start: bool, position: int):
 		if should_start:
 			await player.wait_for_start()
 
@@ -215,6 +337,14 @@ class MusicCog(discord.Cog):
 		else:
 			await ctx.respond('Could not play that track.')
 
+	async def _seek(self, ctx, player: GuildPlayer, position: float):
+		position, error = await player.seek(position)
+		if error:
+			await ctx.respond(error, ephemeral=True)
+			return
+
+		await ctx.respond(embed=seeked_embed(player.current, position, player.is_paused))
+
 	@discord.slash_command(description='Pause the current track.')
 	async def pause(self, ctx):
 		player, error = self._require_controller(ctx)
@@ -258,6 +388,33 @@ class MusicCog(discord.Cog):
 		skipped, next_track, remaining = result
 		await ctx.respond(embed=skipped_embed(skipped, next_track, remaining))
 
+	@discord.slash_command(description='Jump to a point in the current track, e.g. 1:30.')
+	async def seek(self, ctx, time: str):
+		player, error = self._require_controller(ctx)
+		if error:
+			await ctx.respond(error, ephemeral=True)
+			return
+
+		position = parse_timestamp(time)
+		if position is None:
+			await ctx.respond('Give a time like 90, 1:30 or 1:02:03.', ephemeral=True)
+			return
+
+		await self._seek(ctx, player, position)
+
+	@discord.slash_command(description='Skip ahead in the current track by a number of seconds.')
+	async def forward(self, ctx, seconds: int):
+		player, error = self._require_controller(ctx)
+		if error:
+			await ctx.respond(error, ephemeral=True)
+			return
+
+		if seconds <= 0:
+			await ctx.respond('Give a number of seconds to skip ahead.', ephemeral=True)
+			return
+
+		await self._seek(ctx, player, player.elapsed + seconds)
+
 	@discord.slash_command(description='Clear the queue. The current track keeps playing.')
 	async def clear(self, ctx):
 		player, error = self._require_controller(ctx)
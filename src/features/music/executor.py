@@ -0,0 +1,207 @@
+import asyncio
+import itertools
+import threading
+from collections import Counter
+from collections.abc import Callable
+from concurrent.futures import Future
+from enum import IntEnum
+from typing import Any
+
+
+# yt-dlp work is mostly waiting on the network, but every worker is a thread
+# competing with the event loop and py-cord's voice thread for the GIL.
+EXECUTOR_WORKERS = 4
+# Look-ahead downloads may never occupy more than this many workers, so a
+# search or the track that is about to play always finds one free soon.
+MAX_PREFETCH_WORKERS = 2
+# Jobs a single guild may have waiting (not running) outside the playback lane.
+MAX_PENDING_PER_GUILD = 6
+
+
+class Lane(IntEnum):
+	"""Lower runs first."""
+	PLAYBACK = 0
+	INTERACTIVE = 1
+	PREFETCH = 2
+
+
+class ExecutorBusy(Exception):
+	pass
+
+
+class Ticket:
+	"""The lane a job runs in.
+
+	It can be promoted while the job is still waiting, e.g. when a prefetched
+	track becomes the one about to play.
+	"""
+	__slots__ = ('lane', '_wake')
+
+	def __init__(self, lane: Lane):
+		self.lane = lane
+		self._wake: Callable[[], None] | None = None
+
+	def promote(self, lane: Lane):
+		if lane >= self.lane:
+			return
+		self.lane = lane
+		if self._wake is not None:
+			self._wake()
+
+	def on_promote(self, callback: Callable[[], None]):
+		"""Call `callback` after a promotion, for a job waiting somewhere other than a PriorityExecutor."""
+		self._wake = callback
+
+
+class _Job:
+	__slots__ = ('fn', 'args', 'ticket', 'guild_id', 'seq', 'future')
+
+	def __init__(self, fn: Callable, args: tuple, ticket: Ticket, guild_id: int | None, seq: int):
+		self.fn = fn
+		self.args = args
+		self.ticket = ticket
+		self.guild_id = guild_id
+		self.seq = seq
+		self.future: Future = Future()
+
+
+class PriorityExecutor:
+	"""Worker threads for yt-dlp calls, kept apart from the loop's default executor.
+
+	The next job is picked by lane first, then from whichever guild has the fewest
+	jobs already running, then whichever guild was served longest ago, then oldest
+	first. That way one guild queueing fifty tracks cannot starve another guild's
+	/play.
+	"""
+
+	def __init__(
+		self,
+		workers: int = EXECUTOR_WORKERS,
+		*,
+		max_prefetch_workers: int = MAX_PREFETCH_WORKERS,
+		max_pending_per_guild: int = MAX_PENDING_PER_GUILD,
+	):
+		self.workers = workers
+		self.max_prefetch_workers = max_prefetch_workers
+		self.max_pending_per_guild = max_pending_per_guild
+		self._pending: list[_Job] = []
+		self._running_by_guild: Counter = Counter()
+		self._last_served: dict[int | None, int] = {}
+		self._served = itertools.count()
+		self._running_prefetch = 0
+		self._threads: list[threading.Thread] = []
+		self._seq = itertools.count()
+		self._cond = threading.Condition()
+		# Bumped by shutdown(); workers from an older generation exit.
+		self._gen = 0
+
+	def submit(self, fn: Callable, *args, ticket: Ticket, guild_id: int | None = None) -> Future:
+		with self._cond:
+			if ticket.lane != Lane.PLAYBACK:
+				waiting = sum(1 for job in self._pending if job.guild_id == guild_id)
+				if waiting >= self.max_pending_per_guild:
+					raise ExecutorBusy(f'{waiting} jobs already waiting for guild {guild_id}')
+
+			job = _Job(fn, args, ticket, guild_id, next(self._seq))
+			ticket._wake = self._wake
+			self._pending.append(job)
+			job.future.add_done_callback(lambda future, job=job: self._forget(job))
+			self._start_workers()
+			self._cond.notify()
+			return job.future
+
+	async def run(self, fn: Callable, *args, ticket: Ticket, guild_id: int | None = None) -> Any:
+		"""submit() from the loop. Cancelling the caller withdraws a job that has not started."""
+		return await asyncio.wrap_future(self.submit(fn, *args, ticket=ticket, guild_id=guild_id))
+
+	def pending(self, guild_id: int | None = None) -> int:
+		with self._cond:
+			return sum(1 for job in self._pending if guild_id is None or job.guild_id == guild_id)
+
+	def shutdown(self):
+		"""Cancel waiting jobs and retire the workers once their current job ends.
+
+		A later submit() starts fresh workers, so a reloaded cog can keep using it.
+		"""
+		with self._cond:
+			self._gen += 1
+			self._threads = []
+			pending, self._pending = self._pending, []
+			self._cond.notify_all()
+		for job in pending:
+			job.future.cancel()
+
+	def _wake(self):
+		with self._cond:
+			self._cond.notify_all()
+
+	def _start_workers(self):
+		"""Caller must hold self._cond."""
+		while len(self._threads) < self.workers:
+			thread = threading.Thread(
+				target=self._work,
+				args=(self._gen,),
+				name=f'music-worker-{len(self._threads)}',
+				daemon=True,
+			)
+			self._threads.append(thread)
+			thread.start()
+
+	def _forget(self, job: _Job):
+		# Cancelled while waiting; the worker loop would skip it anyway, but it must
+		# stop counting against its guild's queue depth straight away.
+		if not job.future.cancelled():
+			return
+		with self._cond:
+			if job in self._pending:
+				self._pending.remove(job)
+
+	def _next_job(self) -> _Job | None:
+		"""Caller must hold self._cond."""
+		best = None
+		best_key = None
+		for job in self._pending:
+			if job.ticket.lane == Lane.PREFETCH and self._running_prefetch >= self.max_prefetch_workers:
+				continue
+			key = (
+				job.ticket.lane,
+				self._running_by_guild[job.guild_id],
+				self._last_served.get(job.guild_id, -1),
+				job.seq,
+			)
+			if best_key is None or key < best_key:
+				best, best_key = job, key
+		return best
+
+	def _work(self, gen: int):
+		while True:
+			with self._cond:
+				job = None
+				while gen == self._gen:
+					job = self._next_job()
+					if job is not None:
+						break
+					self._cond.wait()
+				if job is None:
+					return
+
+				self._pending.remove(job)
+				if not job.future.set_running_or_notify_cancel():
+					continue
+				prefetch = job.ticket.lane == Lane.PREFETCH
+				self._last_served[job.guild_id] = next(self._served)
+				self._running_by_guild[job.guild_id] += 1
+				self._running_prefetch += prefetch
+
+			try:
+				result = job.fn(*job.args)
+			except BaseException as error:
+				job.future.set_exception(error)
+			else:
+				job.future.set_result(result)
+			finally:
+				with self._cond:
+					self._running_by_guild[job.guild_id] -= 1
+					self._running_prefetch -= prefetch
+					# A finished prefetch may unblock a waiting one.
+					self._cond.notify()
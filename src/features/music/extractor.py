@@ -1,31 +1,291 @@
 import asyncio
+import copy
+import os
+import re
 import tempfile
+import threading
+import time
+import unicodedata
 import uuid
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
-from urllib.parse import urlparse
+from urllib.parse import parse_qs, urlparse
 
 import yt_dlp
 from yt_dlp.networking.impersonate import ImpersonateTarget
 
+from src.core.process_pool import Host, JobAborted, JobTimeout, ProcessPool
+from src.features.music.cache import AudioCache, cache_key
+from src.features.music.executor import ExecutorBusy, Lane, PriorityExecutor, Ticket
+from src.features.music.governor import Governor, RemoteGovernor
+from src.features.music.metadata_store import MetadataStore
 from src.features.music.track import Track
+from src.features.music.worker_client import ServiceError, ServiceUnavailable, WorkerClient
+from src.features.music.ydl_pool import YdlPool
 
 
 CACHE_DIR = Path(tempfile.gettempdir()) / 'guapish-music'
+# Where this process downloads for itself when a worker service, which owns
+# CACHE_DIR even on the same machine, cannot be reached.
+FALLBACK_CACHE_DIR = CACHE_DIR / 'fallback'
+# Survives reboots, unlike CACHE_DIR: nothing in here is ever bulk-deleted.
+STATE_DIR = Path(os.getenv('XDG_CACHE_HOME') or Path.home() / '.cache') / 'guapish-bot'
+# yt-dlp's own cache: YouTube's player JavaScript and the signature and nsig
+# solutions worked out from it. Without it every restart pays for that again on
+# the first /play.
+YTDLP_CACHE_DIR = STATE_DIR / 'yt-dlp'
+# Resolved once at startup so the player JavaScript is fetched and solved before
+# anyone asks for a track. Short, and on YouTube since 2005.
+WARMUP_URL = 'https://www.youtube.com/watch?v=jNQXAC9IVRw'
 MAX_DURATION_SECONDS = 30 * 60
+# Answer a text search from the results page alone (id, title, duration,
+# thumbnail) and leave the full resolve of the video to its download, instead of
+# running the player and format work for a track that may be far down the queue.
+FLAT_SEARCH = True
+# Media URLs resolved at /play time are signed and expire after a few hours.
+# Stop trusting them this long beforehand so a download started from one has
+# time to finish.
+SOURCE_EXPIRY_MARGIN = 10 * 60
+# Attempts at one download. They share a staging path, so each one resumes the
+# .part file the last left behind instead of starting over.
+DOWNLOAD_ATTEMPTS = 3
+# Seconds before the first retry, doubling for each one after it.
+DOWNLOAD_BACKOFF = 0.5
+# A download averaging less than this once it has run for THROTTLE_GRACE
+# seconds is on a throttled URL, and counts as YouTube pushing back.
+THROTTLED_BYTES_PER_SECOND = 64 * 1024
+THROTTLE_GRACE = 10.0
+# Hard limits on one job in a worker process, not counting time spent waiting on
+# the governor. A thread cannot be stopped, so without worker processes a job
+# runs for as long as yt-dlp takes.
+EXTRACT_TIMEOUT = 60.0
+# Per download attempt. Longer than the player's DOWNLOAD_TIMEOUT, the most a
+# track with nothing to stream waits for its file, so this only cuts short a
+# download running behind a stream or ahead in the queue.
+WORKER_DOWNLOAD_TIMEOUT = 10 * 60.0
+# Shared by every guild; sized from config by configure_cache() at startup.
+AUDIO_CACHE = AudioCache(CACHE_DIR)
+METADATA_CACHE = MetadataStore(STATE_DIR / 'metadata.sqlite3')
+# Every yt-dlp call runs here rather than on the loop's default executor.
+EXECUTOR = PriorityExecutor()
+# Paces every one of those calls, process-wide, so several busy guilds slow down
+# together instead of hammering YouTube into 429s.
+GOVERNOR = Governor()
+# Set by configure_workers() when yt-dlp runs in worker processes instead of the
+# executor's own threads.
+WORKERS: ProcessPool | None = None
+# Set by configure_service() when extraction and downloads are left to a
+# separate worker service; this process only falls back to doing them itself.
+SERVICE: WorkerClient | None = None
+
+# Caps in kbps that audio is fetched at, for channels below the next one up;
+# from 128 kbps on, the best Opus is fetched. Few of them, because each is cached
+# apart. YouTube's Opus formats sit at about 50, 70 and 130-160 kbps.
+BITRATE_CAPS = (64, 96)
+_UNCAPPED_KBPS = 128
+
+
+def bitrate_cap(bitrate: int | None) -> int | None:
+	"""The cap in kbps for a voice channel carrying `bitrate` bits per second; None for none."""
+	if not bitrate or bitrate // 1000 >= _UNCAPPED_KBPS:
+		return None
+	kbps = bitrate // 1000
+	return max((cap for cap in BITRATE_CAPS if cap <= kbps), default=BITRATE_CAPS[0])
+
+
+def audio_format(bitrate: int | None = None) -> str:
+	"""The yt-dlp format spec for a voice channel carrying `bitrate` bits per second.
+
+	Discord only carries Opus, and an Opus source is passed through without being
+	decoded, so any Opus format beats a higher bitrate in another codec. Within
+	Opus, nothing richer than the channel's bitrate_cap() is fetched.
+	"""
+	cap = bitrate_cap(bitrate)
+	if cap is None:
+		return 'bestaudio[acodec=opus]/bestaudio/best'
+	return f'bestaudio[acodec=opus][abr<=?{cap}]/bestaudio[acodec=opus]/bestaudio[abr<=?{cap}]/bestaudio/best'
+
+
+def _usable_keys(video_id: str, cap: int | None) -> list[str]:
+	"""Cache keys whose file will do for a channel capped at `cap`, its own first.
+
+	Audio fetched for a richer channel plays fine in this one, so it is taken
+	rather than fetched again; audio fetched for a poorer one is not.
+	"""
+	if cap is None:
+		return [cache_key(video_id)]
+	return [cache_key(video_id, other) for other in BITRATE_CAPS if other >= cap] + [cache_key(video_id)]
+
+
+# The only extractors yt-dlp may use: videos, ytsearch, playlist pages, bare
+# playlist ids and youtu.be links. Each YoutubeDL otherwise instantiates all of
+# its ~1700 extractors and walks them in order to match a URL; with yt-dlp's
+# lazy extractors, the ones left out are never imported either.
+YOUTUBE_EXTRACTORS = ('youtube', 'youtube:tab', 'youtube:playlist', 'youtube:search', 'YoutubeYtBe')
 
 YDL_OPTS = {
-	'format': 'bestaudio/best',
+	'format': audio_format(),
+	'allowed_extractors': list(YOUTUBE_EXTRACTORS),
+	'cachedir': str(YTDLP_CACHE_DIR),
 	'noplaylist': True,
 	'quiet': True,
 	'no_warnings': True,
 	'impersonate': ImpersonateTarget('chrome'),
 }
+# Playlists are only paged through, one flat entry per video; each entry is
+# resolved properly when it is about to play.
+PLAYLIST_OPTS = {
+	**YDL_OPTS,
+	'noplaylist': False,
+	'extract_flat': 'in_playlist',
+	'lazy_playlist': True,
+}
+DOWNLOAD_OPTS = {
+	**YDL_OPTS,
+	'noprogress': True,
+	# Staging names are unique per download, so anything already at one is a
+	# previous attempt's work: a .part file to resume, or a finished file whose
+	# remux failed.
+	'overwrites': False,
+	'continuedl': True,
+	# Remux (never re-encode) Opus out of WebM into Ogg, which the player can
+	# send to Discord without starting ffmpeg at all.
+	'postprocessors': [{'key': 'FFmpegExtractAudio', 'preferredcodec': 'webm>opus'}],
+	'progress_hooks': [lambda status: _on_progress(status)],
+}
+
+# Just enough of an extraction result for process_ie_result() to pick the same
+# format again and download it without re-fetching the watch page or player.
+_SOURCE_KEYS = ('id', 'title', 'duration', 'webpage_url', 'extractor', 'extractor_key', 'format_id', '_format_sort_fields')
+_FORMAT_KEYS = (
+	'format_id', 'format_note', 'url', 'protocol', 'ext', 'container', 'acodec', 'vcodec',
+	'abr', 'asr', 'tbr', 'audio_channels', 'filesize', 'filesize_approx', 'quality',
+	'source_preference', 'language', 'language_preference', 'has_drm',
+	'http_headers', 'downloader_options',
+)
+# Everything extract_track() reads from an extraction result, besides the formats.
+_INFO_KEYS = (
+	'id', 'title', 'duration', 'webpage_url', 'original_url', 'artist', 'uploader', 'channel',
+	'extractor', 'extractor_key', 'format_id', '_format_sort_fields',
+)
 
 
 class TrackExtractError(Exception):
 	pass
 
 
+class TrackRejected(TrackExtractError):
+	"""The query resolved, but to nothing that can play. Remembered for a while."""
+
+	def __init__(self, message: str, video_id: str | None = None):
+		super().__init__(message)
+		self.video_id = video_id
+
+
+# Separate pools so a burst of searches never waits on a handle that is busy
+# streaming a download, and vice versa. A rejection is raised between requests,
+# so the handle that found it stays warm.
+_EXTRACT_POOL = YdlPool(YDL_OPTS, clean_errors=(TrackRejected,))
+_DOWNLOAD_POOL = YdlPool(DOWNLOAD_OPTS, clean_errors=(TrackRejected,))
+_PLAYLIST_POOL = YdlPool(PLAYLIST_OPTS, clean_errors=(TrackRejected,))
+
+
+# The download running on this worker thread, as seen by the progress hook yt-dlp
+# calls after every chunk it writes: its abort event, and whether it has already
+# been reported as throttled.
+_JOB = threading.local()
+# How YouTube says it is being asked too much: rate limiting, or a bot check.
+_PUSHBACK_MARKERS = ('HTTP Error 429', 'Too Many Requests', 'not a bot')
+
+
+def _check_abort():
+	abort = getattr(_JOB, 'abort', None)
+	if abort is not None and abort.is_set():
+		raise yt_dlp.utils.DownloadCancelled('Download abandoned')
+
+
+def _on_progress(status: dict):
+	_check_abort()
+	if status.get('status') != 'downloading' or getattr(_JOB, 'throttled', False):
+		return
+	elapsed = status.get('elapsed') or 0
+	if elapsed < THROTTLE_GRACE:
+		return
+	speed = (status.get('downloaded_bytes') or 0) / elapsed
+	if speed < THROTTLED_BYTES_PER_SECOND:
+		_JOB.throttled = True
+		GOVERNOR.back_off(f'download throttled to {speed / 1024:.0f} KiB/s')
+
+
+def _is_pushback(error: BaseException) -> bool:
+	"""Whether YouTube refused because of how much it is being asked, anywhere in the cause chain."""
+	seen = set()
+	while error is not None and id(error) not in seen:
+		seen.add(id(error))
+		if getattr(error, 'status', None) == 429 or any(marker in str(error) for marker in _PUSHBACK_MARKERS):
+			return True
+		# yt-dlp wraps what actually went wrong in DownloadError.exc_info.
+		exc_info = getattr(error, 'exc_info', None)
+		error = error.__cause__ or error.__context__ or (exc_info[1] if exc_info else None)
+	return False
+
+
+@contextmanager
+def _paced(abort: threading.Event | None = None) -> Iterator[None]:
+	"""Wait for the governor before talking to YouTube, and tell it how that went."""
+	if not GOVERNOR.acquire(abort):
+		raise yt_dlp.utils.DownloadCancelled('Download abandoned')
+	try:
+		yield
+	except Exception as error:
+		if _is_pushback(error):
+			GOVERNOR.back_off('rate limited')
+		raise
+	if not getattr(_JOB, 'throttled', False):
+		GOVERNOR.recover()
+
+
+_BUSY_MESSAGE = 'Too many requests are already waiting in this server. Try again in a moment.'
+_VIDEO_ID = re.compile(r'[A-Za-z0-9_-]{11}')
+# youtube.com paths that carry the video id as their second segment.
+_ID_PATHS = ('shorts', 'embed', 'live', 'v', 'e')
+# What people tack onto a song name that says nothing about which song it is.
+_NOISE_PHRASE = r'official (?:music |lyric )?(?:video|audio|visuali[sz]er)|lyrics? video|(?:with )?lyrics?'
+# One such suffix. Every separator has a single way to match, and suffixes are
+# peeled off one at a time: a repeated group here used to backtrack
+# exponentially on a query like "song (hd) (hd) ... x".
+_QUERY_NOISE = re.compile(
+	rf'(?:(?:\s*[-|])?\s*[(\[](?:{_NOISE_PHRASE}|audio|video|hd|hq|4k)[)\]]|(?:\s*[-|]\s*|\s+)(?:{_NOISE_PHRASE}))$'
+)
+# Noise suffixes stripped from one query at most.
+MAX_NOISE_SUFFIXES = 4
+# Longer free text is refused rather than searched for.
+MAX_QUERY_CHARS = 200
+_NOT_FOUND_MESSAGE = 'Could not find that track.'
+_TIMEOUT_MESSAGE = 'YouTube took too long to answer. Try again in a moment.'
+
+
+@dataclass(frozen=True, slots=True)
+class AudioStream:
+	"""A directly playable media URL and the headers YouTube expects with it."""
+	url: str
+	headers: dict[str, str] = field(default_factory=dict)
+	codec: str | None = None
+	# The compact extraction result a fresh resolve came from, for the Track to
+	# keep so its download does not resolve the video again.
+	source: dict | None = field(default=None, repr=False, compare=False)
+
+
+def _use_format(ydl: yt_dlp.YoutubeDL, spec: str):
+	"""Point a pooled handle at a format spec. The selector is only recompiled when it changes."""
+	if ydl.params.get('format') == spec:
+		return
+	ydl.params['format'] = spec
+	ydl.format_selector = ydl.build_format_selector(spec)
+
+
 def _is_youtube_url(url: str) -> bool:
 	host = (urlparse(url).hostname or '').lower()
 	if host.startswith('www.'):
@@ -34,7 +294,8 @@ def _is_youtube_url(url: str) -> bool:
 
 
 def _is_youtube_info(info: dict) -> bool:
-	extractor = (info.get('extractor_key') or info.get('extractor') or '').lower()
+	# Flat search and playlist entries only name the extractor that would resolve them.
+	extractor = (info.get('extractor_key') or info.get('extractor') or info.get('ie_key') or '').lower()
 	if 'youtube' in extractor:
 		return True
 
@@ -42,6 +303,56 @@ def _is_youtube_info(info: dict) -> bool:
 	return bool(url) and _is_youtube_url(url)
 
 
+def _video_id(url: str) -> str | None:
+	"""The video id in any YouTube URL that names one video, whatever else it carries."""
+	if not _is_youtube_url(url):
+		return None
+	parsed = urlparse(url)
+	host = (parsed.hostname or '').lower()
+	parts = [part for part in parsed.path.split('/') if part]
+	if host == 'youtu.be':
+		candidate = parts[0] if parts else None
+	elif len(parts) >= 2 and parts[0] in _ID_PATHS:
+		candidate = parts[1]
+	else:
+		ids = parse_qs(parsed.query).get('v')
+		candidate = ids[0] if ids else None
+	if candidate is None or not _VIDEO_ID.fullmatch(candidate):
+		return None
+	return candidate
+
+
+def _canonical_query(query: str) -> str:
+	"""One spelling for the many ways people ask for the same video or song.
+
+	A YouTube URL naming a video becomes its plain watch URL, dropping timestamps,
+	share and playlist parameters. Free text is Unicode-normalized, casefolded and
+	stripped of trailing noise such as "lyrics" or "(official audio)".
+	"""
+	query = query.strip()
+	if query.startswith(('http://', 'https://')):
+		video_id = _video_id(query)
+		return f'https://www.youtube.com/watch?v={video_id}' if video_id else query
+
+	text = ' '.join(unicodedata.normalize('NFKC', query[:MAX_QUERY_CHARS * 2]).casefold().split())
+	stripped = text
+	for _ in range(MAX_NOISE_SUFFIXES):
+		noise = _QUERY_NOISE.search(stripped)
+		if noise is None:
+			break
+		stripped = stripped[:noise.start()]
+	# Never strip a query down to nothing: "lyrics" alone is still a search.
+	return stripped.strip() or text
+
+
+def is_playlist_url(query: str) -> bool:
+	"""True for a YouTube playlist page. A watch URL inside a playlist is still one video."""
+	if not query.startswith(('http://', 'https://')) or not _is_youtube_url(query):
+		return False
+	parsed = urlparse(query)
+	return parsed.path.rstrip('/') == '/playlist' and bool(parse_qs(parsed.query).get('list'))
+
+
 def _is_live(info: dict) -> bool:
 	if info.get('is_live'):
 		return True
@@ -49,42 +360,62 @@ def _is_live(info: dict) -> bool:
 
 
 def _search_query(query: str) -> str:
+	if len(query) > MAX_QUERY_CHARS:
+		raise TrackExtractError(f'That search is too long. Keep it under {MAX_QUERY_CHARS} characters.')
+	query = query.strip()
 	if query.startswith(('http://', 'https://')):
 		if not _is_youtube_url(query):
 			raise TrackExtractError('Only YouTube URLs are supported.')
-		return query
+		# Still the same video, without the parameters that do not matter to it.
+		return _canonical_query(query)
+	# Searched as typed: dropping "lyrics" or "(official audio)" would change what
+	# YouTube finds, so the canonical form is only the cache key.
 	return f'ytsearch1:{query}'
 
 
 def _validate_info(info: dict):
+	video_id = info.get('id')
 	if not _is_youtube_info(info):
-		raise TrackExtractError('Only YouTube tracks are supported.')
+		raise TrackRejected('Only YouTube tracks are supported.')
 
 	if _is_live(info):
-		raise TrackExtractError('Live streams are not supported.')
+		raise TrackRejected('Live streams are not supported.', video_id)
 
 	duration = info.get('duration')
 	if duration is None:
-		raise TrackExtractError('That track has no known duration.')
+		raise TrackRejected('That track has no known duration.', video_id)
 	if int(duration) > MAX_DURATION_SECONDS:
 		limit = MAX_DURATION_SECONDS // 60
-		raise TrackExtractError(f'Tracks longer than {limit} minutes are not supported.')
+		raise TrackRejected(f'Tracks longer than {limit} minutes are not supported.', video_id)
 
 
-def _extract_info(query: str) -> dict:
-	with yt_dlp.YoutubeDL(YDL_OPTS) as ydl:
-		info = ydl.extract_info(_search_query(query), download=False)
-		if not info:
-			raise ValueError(f'No results for: {query}')
+def _extract_info(query: str, spec: str) -> dict:
+	search = _search_query(query)
+	if FLAT_SEARCH and search.startswith('ytsearch'):
+		# A search is a playlist to yt-dlp, so the flat playlist handles list it.
+		with _paced(), _PLAYLIST_POOL.checkout() as ydl:
+			hit = _first_entry(ydl.extract_info(search, download=False))
+		if hit.get('duration') is not None or _is_live(hit):
+			_validate_info(hit)
+			return hit
+		if not hit.get('id'):
+			raise TrackRejected(_NOT_FOUND_MESSAGE)
+		# The results page left out what validation needs; resolve just this video.
+		search = hit.get('url') or f'https://www.youtube.com/watch?v={hit["id"]}'
 
-		if 'entries' in info:
-			entries = [entry for entry in info['entries'] if entry]
-			if not entries:
-				raise ValueError(f'No results for: {query}')
-			info = entries[0]
+	with _paced(), _EXTRACT_POOL.checkout() as ydl:
+		_use_format(ydl, spec)
+		info = _first_entry(ydl.extract_info(search, download=False))
+	_validate_info(info)
+	return info
 
-		_validate_info(info)
-		return info
+
+def _first_entry(info: dict | None) -> dict:
+	if info and 'entries' in info:
+		info = next((entry for entry in info['entries'] if entry), None)
+	if not info:
+		raise TrackRejected(_NOT_FOUND_MESSAGE)
+	return info
 
 
 def _thumbnail(info: dict) -> str | None:
@@ -134,76 +465,727 @@ def _downloaded_path(ydl: yt_dlp.YoutubeDL, info: dict) -> Path:
 	raise ValueError(f'Download finished but file is missing: {path}')
 
 
-def _download_audio(webpage_url: str, guild_id: int, token: str) -> Path:
-	CACHE_DIR.mkdir(parents=True, exist_ok=True)
-	opts = {
-		**YDL_OPTS,
-		# The token keeps concurrent downloads of the same video in the same guild
-		# (e.g. a skip landing on a duplicate request) from writing the same file.
-		'outtmpl': str(CACHE_DIR / f'{guild_id}-{token}-%(id)s.%(ext)s'),
-		'noprogress': True,
-		'overwrites': True,
-	}
-	with yt_dlp.YoutubeDL(opts) as ydl:
-		info = ydl.extract_info(webpage_url, download=True)
-		if not info:
-			raise ValueError(f'Could not download: {webpage_url}')
-		if 'entries' in info:
-			entries = [entry for entry in info['entries'] if entry]
-			if not entries:
+def _url_expiry(url: str) -> float | None:
+	expire = parse_qs(urlparse(url).query).get('expire')
+	try:
+		return float(expire[0]) if expire else None
+	except ValueError:
+		return None
+
+
+def _compact_source(info: dict) -> dict | None:
+	"""The part of an extraction result a later download needs, or None if it cannot be reused.
+
+	Every plain HTTP(S) audio-only format is kept so format selection lands on the
+	same choice; anything fragmented or behind a manifest is left to a re-resolve.
+	"""
+	chosen = info.get('format_id')
+	formats = []
+	for fmt in info.get('formats') or []:
+		if fmt.get('protocol') not in ('http', 'https') or not fmt.get('url'):
+			continue
+		if fmt.get('vcodec') != 'none' and fmt.get('format_id') != chosen:
+			continue
+		formats.append({key: fmt[key] for key in _FORMAT_KEYS if fmt.get(key) is not None})
+
+	if not chosen or not any(fmt.get('format_id') == chosen for fmt in formats):
+		return None
+
+	source = {key: info[key] for key in _SOURCE_KEYS if info.get(key) is not None}
+	source['formats'] = formats
+	expiries = [expiry for expiry in map(_url_expiry, (fmt['url'] for fmt in formats)) if expiry is not None]
+	source['expires'] = min(expiries) if expiries else None
+	return source
+
+
+def _is_fresh(source: dict | None) -> bool:
+	if source is None:
+		return False
+	expires = source.get('expires')
+	return expires is None or expires - SOURCE_EXPIRY_MARGIN > time.time()
+
+
+def _slim_info(info: dict) -> dict:
+	"""The part of an extraction result a worker process sends back; the rest is mostly formats and description."""
+	slim = {key: info[key] for key in _INFO_KEYS if info.get(key) is not None}
+	slim['thumbnail'] = _thumbnail(info)
+	source = _compact_source(info)
+	if source is not None:
+		slim['formats'] = source['formats']
+	return slim
+
+
+def _source_stream(source: dict) -> AudioStream | None:
+	for fmt in source['formats']:
+		if fmt.get('format_id') == source.get('format_id'):
+			return AudioStream(
+				url=fmt['url'],
+				headers=dict(fmt.get('http_headers') or {}),
+				codec=fmt.get('acodec'),
+			)
+	return None
+
+
+def _download_audio(
+	webpage_url: str,
+	guild_id: int,
+	token: str,
+	source: dict | None = None,
+	spec: str = YDL_OPTS['format'],
+	abort: threading.Event | None = None,
+	staging: Path | None = None,
+) -> tuple[str, Path]:
+	# A worker process has the default CACHE_DIR, not whatever the parent was
+	# configured with, so the parent passes its own.
+	staging = staging or CACHE_DIR
+	staging.mkdir(parents=True, exist_ok=True)
+	_JOB.abort = abort
+	_JOB.throttled = False
+	try:
+		with _paced(abort), _DOWNLOAD_POOL.checkout() as ydl:
+			# Staged under a unique name and only moved to its cache name once complete.
+			# The token keeps an abandoned download that is still winding down from
+			# writing the same file as a fresh one for the same video. The format id
+			# keeps a retry that lands on another format from resuming the wrong bytes.
+			ydl.params['outtmpl']['default'] = str(staging / f'{guild_id}-{token}-%(id)s.%(format_id)s.%(ext)s')
+			if source is not None:
+				# Straight to the media URLs resolved at /play time, and the format that
+				# was chosen then. yt-dlp fills the dict in as it goes, so it gets a
+				# copy a retry can still use.
+				_use_format(ydl, source['format_id'])
+				info = ydl.process_ie_result(copy.deepcopy(source), download=True)
+			else:
+				_use_format(ydl, spec)
+				# Unprocessed first, so the video is checked before a byte is fetched:
+				# a track queued from a flat search was only judged by its results page.
+				info = _first_entry(ydl.extract_info(webpage_url, download=False, process=False))
+				_validate_info(info)
+				info = ydl.process_ie_result(info, download=True)
+			if not info:
 				raise ValueError(f'Could not download: {webpage_url}')
-			info = entries[0]
-		return _downloaded_path(ydl, info)
+			if 'entries' in info:
+				entries = [entry for entry in info['entries'] if entry]
+				if not entries:
+					raise ValueError(f'Could not download: {webpage_url}')
+				info = entries[0]
+			return info['id'], _downloaded_path(ydl, info)
+	except yt_dlp.utils.DownloadCancelled:
+		_remove_staged(guild_id, token, staging)
+		raise
+	finally:
+		_JOB.abort = None
+		_JOB.throttled = False
+
+
+def _remove_staged(guild_id: int, token: str, staging: Path):
+	"""Delete whatever an abandoned download left behind: .part files, fragments, unremuxed media."""
+	for path in staging.glob(f'{guild_id}-{token}-*'):
+		try:
+			path.unlink()
+		except OSError as error:
+			print(f' ERR > Failed to remove {path.name}: {error}')
+
+
+def _resolve_stream(webpage_url: str, spec: str) -> AudioStream:
+	with _paced(), _EXTRACT_POOL.checkout() as ydl:
+		_use_format(ydl, spec)
+		info = ydl.extract_info(webpage_url, download=False)
+	if not info:
+		raise ValueError(f'Could not resolve: {webpage_url}')
+	_validate_info(info)
+
+	# A single selected format is merged into the top level of the info dict.
+	url = info.get('url')
+	if not url:
+		raise ValueError(f'No direct stream for: {webpage_url}')
+	return AudioStream(
+		url=url,
+		headers=dict(info.get('http_headers') or {}),
+		codec=info.get('acodec'),
+		source=_compact_source(info),
+	)
+
+
+def _enter_worker(host: Host):
+	"""Runs first in every worker process."""
+	global GOVERNOR
+	GOVERNOR = RemoteGovernor(host)
+
+
+def _governed(abort: threading.Event | None) -> Callable:
+	"""Answers a worker process's governor from GOVERNOR, with `abort` standing in for its own."""
+	def serve(name: str, *args):
+		if name == 'acquire':
+			return GOVERNOR.acquire(abort)
+		return getattr(GOVERNOR, name)(*args)
+	return serve
+
+
+def _extract_slim(query: str, spec: str) -> dict:
+	return _slim_info(_extract_info(query, spec))
+
+
+def _extract_in_worker(query: str, spec: str) -> dict:
+	return WORKERS.call(_extract_slim, query, spec, timeout=EXTRACT_TIMEOUT, serve=_governed(None))
+
+
+def _resolve_in_worker(webpage_url: str, spec: str) -> AudioStream:
+	return WORKERS.call(_resolve_stream, webpage_url, spec, timeout=EXTRACT_TIMEOUT, serve=_governed(None))
+
+
+def _download_in_worker(
+	webpage_url: str,
+	guild_id: int,
+	token: str,
+	source: dict | None,
+	spec: str,
+	abort: threading.Event,
+	staging: Path,
+) -> tuple[str, Path]:
+	try:
+		return WORKERS.call(
+			_download_audio, webpage_url, guild_id, token, source, spec, None, staging,
+			timeout=WORKER_DOWNLOAD_TIMEOUT,
+			abort=abort,
+			serve=_governed(abort),
+		)
+	except JobAborted:
+		# The worker was killed mid-chunk, so nothing in it cleaned up.
+		_remove_staged(guild_id, token, staging)
+		raise yt_dlp.utils.DownloadCancelled('Download abandoned') from None
+
+
+async def resolve_stream(
+	webpage_url: str,
+	guild_id: int | None = None,
+	source: dict | None = None,
+	bitrate: int | None = None,
+) -> AudioStream:
+	"""A media URL to stream `webpage_url` from, reusing `source` while it is still valid."""
+	if _is_fresh(source):
+		stream = _source_stream(source)
+		if stream is not None:
+			return stream
+	return await _via_service(
+		lambda: _remote_stream(webpage_url, guild_id, bitrate),
+		lambda: _resolve_here(webpage_url, guild_id, bitrate),
+	)
+
+
+async def _remote_stream(webpage_url: str, guild_id: int | None, bitrate: int | None) -> AudioStream:
+	return AudioStream(**await SERVICE.stream(webpage_url, guild_id, bitrate))
+
+
+# Stream resolves in progress, keyed by video id, for a download of the same
+# video to take its source from. Only touched from the event loop.
+_RESOLVING: dict[str, asyncio.Task] = {}
+
+
+async def _resolve_here(webpage_url: str, guild_id: int | None, bitrate: int | None) -> AudioStream:
+	task = asyncio.ensure_future(EXECUTOR.run(
+		_resolve_stream if WORKERS is None else _resolve_in_worker, webpage_url, audio_format(bitrate),
+		ticket=Ticket(Lane.PLAYBACK),
+		guild_id=guild_id,
+	))
+	video_id = _video_id(webpage_url)
+	if video_id is not None:
+		_RESOLVING[video_id] = task
 
+		def land(done: asyncio.Task):
+			if _RESOLVING.get(video_id) is done:
+				del _RESOLVING[video_id]
 
-async def extract_info(query: str) -> dict:
+		task.add_done_callback(land)
+	return await task
+
+
+async def _resolving_source(webpage_url: str) -> dict | None:
+	"""The source of a stream resolve of this video already under way, once it lands; None without one."""
+	video_id = _video_id(webpage_url)
+	task = _RESOLVING.get(video_id) if video_id is not None else None
+	if task is None:
+		return None
+	await asyncio.wait((task,))
+	if task.cancelled() or task.exception() is not None:
+		return None
+	return task.result().source
+
+
+async def _via_service(remote: Callable[[], Awaitable], here: Callable[[], Awaitable]):
+	"""Run a job on the worker service if there is one, or here if there is none or it cannot be reached."""
+	if SERVICE is not None:
+		try:
+			return await remote()
+		except ServiceUnavailable as error:
+			print(f' ERR > Music worker service unreachable, running the job here: {error}')
+		except ServiceError as error:
+			if error.kind == 'rejected':
+				raise TrackRejected(str(error), error.video_id) from None
+			if error.kind == 'refused':
+				raise TrackExtractError(str(error)) from None
+			raise
+	return await here()
+
+
+async def extract_info(query: str, guild_id: int | None = None, bitrate: int | None = None) -> dict:
+	try:
+		return await EXECUTOR.run(
+			_extract_info if WORKERS is None else _extract_in_worker, query, audio_format(bitrate),
+			ticket=Ticket(Lane.INTERACTIVE),
+			guild_id=guild_id,
+		)
+	except ExecutorBusy:
+		raise TrackExtractError(_BUSY_MESSAGE) from None
+	except JobTimeout:
+		raise TrackExtractError(_TIMEOUT_MESSAGE) from None
+
+
+async def warm_up(url: str = WARMUP_URL) -> bool:
+	"""Resolve one video in the background to fill yt-dlp's player cache. Never raises.
+
+	Only the worker that runs this gets a warm handle, but every handle reads the
+	solved player from YTDLP_CACHE_DIR instead of solving it again.
+	"""
+	started = time.monotonic()
+	try:
+		await EXECUTOR.run(
+			_extract_info if WORKERS is None else _extract_in_worker, url, YDL_OPTS['format'],
+			ticket=Ticket(Lane.PREFETCH),
+		)
+	except asyncio.CancelledError:
+		raise
+	except Exception as error:
+		print(f' ERR > yt-dlp warm-up failed: {error}')
+		return False
+
+	print(f'LOG > yt-dlp warmed up in {time.monotonic() - started:.1f}s')
+	return True
+
+
+# Marks the end of a playlist listing on its way from the worker thread.
+_LISTED = object()
+
+
+def _list_playlist(url: str, emit: Callable[[dict], None], stop: threading.Event):
+	"""Page through a playlist, emitting flat entries as yt-dlp yields them.
+
+	process=False leaves `entries` as the extractor's own generator, so each page
+	is only fetched once the previous one has been handed on.
+	"""
+	with _paced(), _PLAYLIST_POOL.checkout() as ydl:
+		info = ydl.extract_info(url, download=False, process=False)
+		# The tab extractor can answer with a redirect to the canonical playlist.
+		for _ in range(2):
+			if not info or info.get('_type') not in ('url', 'url_transparent'):
+				break
+			info = ydl.extract_info(info['url'], download=False, process=False)
+		if not info or 'entries' not in info:
+			raise ValueError(f'Not a playlist: {url}')
+
+		for entry in info['entries']:
+			if stop.is_set():
+				return
+			if entry:
+				emit(entry)
+
+
+def _entry_fields(entry: dict) -> dict | None:
+	"""Track fields for a flat playlist entry, or None if it could never play.
+
+	Private, deleted and live entries come back without a duration.
+	"""
+	video_id = entry.get('id')
+	duration = entry.get('duration')
+	if not video_id or duration is None or _is_live(entry):
+		return None
+	if int(duration) > MAX_DURATION_SECONDS:
+		return None
+
+	return {
+		'title': entry.get('title') or 'Unknown',
+		'webpage_url': f'https://www.youtube.com/watch?v={video_id}',
+		'duration': int(duration),
+		'thumbnail': _thumbnail(entry),
+		'uploader': _uploader(entry),
+	}
+
+
+async def extract_playlist(
+	url: str,
+	requester_id: int,
+	requester_name: str,
+	guild_id: int | None = None,
+) -> AsyncIterator[Track]:
+	"""Tracks from a playlist as they are listed. Entries that cannot play are skipped.
+
+	Nothing is resolved beyond the listing; the download does that shortly before
+	each track plays. Closing the iterator stops the listing.
+	"""
 	loop = asyncio.get_running_loop()
-	return await loop.run_in_executor(None, _extract_info, query)
+	listed: asyncio.Queue = asyncio.Queue()
+	stop = threading.Event()
+
+	def emit(entry: dict):
+		loop.call_soon_threadsafe(listed.put_nowait, entry)
+
+	listing = asyncio.ensure_future(EXECUTOR.run(
+		_list_playlist, url, emit, stop,
+		ticket=Ticket(Lane.INTERACTIVE),
+		guild_id=guild_id,
+	))
+	# Queued behind every entry the thread emitted before it returned.
+	listing.add_done_callback(lambda _: listed.put_nowait(_LISTED))
+
+	skipped = 0
+	try:
+		while (entry := await listed.get()) is not _LISTED:
+			fields = _entry_fields(entry)
+			if fields is None:
+				skipped += 1
+				continue
+			yield Track(**fields, requester_id=requester_id, requester_name=requester_name, query=url)
+
+		try:
+			await listing
+		except ExecutorBusy:
+			raise TrackExtractError(_BUSY_MESSAGE) from None
+	finally:
+		stop.set()
+		if not listing.done():
+			listing.cancel()
+		elif not listing.cancelled():
+			# Closed early: nobody else will ever look at how the listing ended.
+			listing.exception()
+		if skipped:
+			print(f'LOG > Skipped {skipped} unplayable playlist entries from {url}')
+
+
+def _lookup_key(query: str) -> str:
+	query = _canonical_query(query)
+	if query.startswith(('http://', 'https://')):
+		video_id = _video_id(query)
+		if video_id is not None:
+			return f'id:{video_id}'
+		return f'url:{query}'
+	return f'q:{query}'
 
 
-async def extract_track(query: str, requester_id: int, requester_name: str) -> Track:
-	info = await extract_info(query)
+def _track_fields(info: dict, query: str) -> dict:
 	duration = info.get('duration')
+	return {
+		'title': info.get('title') or 'Unknown',
+		'webpage_url': _webpage_url(info, query),
+		'duration': int(duration) if duration is not None else None,
+		'thumbnail': _thumbnail(info),
+		'uploader': _uploader(info),
+	}
+
+
+def _cached_fields(query: str) -> dict | None:
+	key = _lookup_key(query)
+	if key.startswith('id:'):
+		return METADATA_CACHE.get_video(key[3:])
+	return METADATA_CACHE.get(key)
+
+
+def _cache_rejection(query: str, error: TrackRejected):
+	# Under the video id as well, so a URL to what a search turned up is refused too.
+	keys = [_lookup_key(query)]
+	if error.video_id and keys[0] != f'id:{error.video_id}':
+		keys.append(f'id:{error.video_id}')
+	METADATA_CACHE.put_rejection(keys, str(error))
+
+
+def _cache_fields(query: str, fields: dict):
+	video_id = _video_id(fields['webpage_url'])
+	if video_id is None:
+		return
+
+	key = _lookup_key(query)
+	METADATA_CACHE.put(video_id, fields, [] if key.startswith('id:') else [key])
+
+
+async def _lookup(query: str, guild_id: int | None, bitrate: int | None) -> tuple[dict, dict | None]:
+	"""Track fields for `query` and the extraction result a download can reuse, from the caches if possible.
+
+	The metadata store is SQLite on disk, and a write syncs it, so every call to it
+	runs on a thread rather than stalling voice and every other guild.
+	"""
+	rejection = await asyncio.to_thread(METADATA_CACHE.get_rejection, _lookup_key(query))
+	if rejection is not None:
+		raise TrackExtractError(rejection)
+
+	fields = await asyncio.to_thread(_cached_fields, query)
+	if fields is not None:
+		# Nothing was resolved, so the download resolves it instead.
+		return fields, None
+
+	try:
+		info = await extract_info(query, guild_id, bitrate)
+	except TrackRejected as error:
+		await asyncio.to_thread(_cache_rejection, query, error)
+		raise
+	fields = _track_fields(info, query)
+	await asyncio.to_thread(_cache_fields, query, fields)
+	return fields, _compact_source(info)
+
+
+async def extract_track(
+	query: str,
+	requester_id: int,
+	requester_name: str,
+	guild_id: int | None = None,
+	bitrate: int | None = None,
+) -> Track:
+	"""`bitrate` is the voice channel's, and caps the format the track is resolved to."""
+	fields, source = await _via_service(
+		lambda: SERVICE.extract(query, guild_id, bitrate),
+		lambda: _lookup(query, guild_id, bitrate),
+	)
 	return Track(
-		title=info.get('title') or 'Unknown',
-		webpage_url=_webpage_url(info, query),
-		duration=int(duration) if duration is not None else None,
+		**fields,
+		source=source,
 		requester_id=requester_id,
 		requester_name=requester_name,
 		query=query,
-		thumbnail=_thumbnail(info),
-		uploader=_uploader(info),
 	)
 
 
-async def download_audio(webpage_url: str, guild_id: int) -> Path:
-	loop = asyncio.get_running_loop()
+class _Flight:
+	"""One in-progress download that every caller wanting the same video waits on."""
+	__slots__ = ('task', 'ticket', 'waiters')
+
+	def __init__(self, task: asyncio.Task, ticket: Ticket):
+		self.task = task
+		self.ticket = ticket
+		self.waiters = 0
+
+
+# Keyed like AUDIO_CACHE. Only touched from the event loop.
+_IN_FLIGHT: dict[str, _Flight] = {}
+
+
+async def _fetch_audio(
+	webpage_url: str,
+	guild_id: int,
+	ticket: Ticket,
+	source: dict | None = None,
+	spec: str = YDL_OPTS['format'],
+	cap: int | None = None,
+) -> Path:
 	token = uuid.uuid4().hex[:8]
+	staging = CACHE_DIR
+	if not _is_fresh(source):
+		# A track from a flat search starts with a stream resolve; this waits for
+		# it rather than resolving the video a second time alongside.
+		source = await _resolving_source(webpage_url)
+	if source is not None:
+		# Retries resolve afresh but stay on this format when they can, so they
+		# resume its .part file.
+		retry_spec = f'{source["format_id"]}/{spec}'
+	else:
+		retry_spec = spec
+	# Set when this coroutine is cancelled, which stops the worker thread at its
+	# next chunk instead of letting it finish a file nobody will play.
+	abort = threading.Event()
 	last_error: Exception | None = None
-	for attempt in range(2):
-		try:
-			return await loop.run_in_executor(None, _download_audio, webpage_url, guild_id, token)
-		except Exception as error:
-			last_error = error
-			print(f' ERR > Download attempt {attempt + 1} failed for {webpage_url}: {error}')
+	try:
+		for attempt in range(DOWNLOAD_ATTEMPTS):
+			if attempt:
+				await asyncio.sleep(DOWNLOAD_BACKOFF * 2 ** (attempt - 1))
+			try:
+				downloaded_id, path = await EXECUTOR.run(
+					# A failure with the stored URLs may mean they were revoked early, so
+					# retries always resolve from scratch.
+					_download_audio if WORKERS is None else _download_in_worker, webpage_url, guild_id, token,
+					source if attempt == 0 else None,
+					spec if attempt == 0 else retry_spec,
+					abort,
+					staging,
+					ticket=ticket,
+					guild_id=guild_id,
+				)
+				return AUDIO_CACHE.add(cache_key(downloaded_id, cap), path)
+			except TrackRejected:
+				# Resolving again would only be refused again.
+				raise
+			except Exception as error:
+				last_error = error
+				print(f' ERR > Download attempt {attempt + 1} failed for {webpage_url}: {error}')
+	except asyncio.CancelledError:
+		abort.set()
+		# Covers a job withdrawn before it started and a cancel during the backoff;
+		# a worker that is mid-chunk cleans up after itself as well.
+		_remove_staged(guild_id, token, staging)
+		raise
 
+	_remove_staged(guild_id, token, staging)
 	raise last_error or ValueError(f'Could not download: {webpage_url}')
 
 
-def clear_cache():
-	"""Drop any audio left behind by a previous process. Safe to call at startup."""
-	if not CACHE_DIR.exists():
+def _join_flight(
+	key: str,
+	webpage_url: str,
+	guild_id: int,
+	ticket: Ticket,
+	source: dict | None,
+	spec: str,
+	cap: int | None,
+) -> _Flight:
+	flight = _IN_FLIGHT.get(key)
+	if flight is not None:
+		# Whoever needs it soonest sets the pace for everyone sharing it, now or
+		# once promoted later on.
+		flight.ticket.promote(ticket.lane)
+		ticket.on_promote(lambda: flight.ticket.promote(ticket.lane))
+		flight.waiters += 1
+		return flight
+
+	flight = _Flight(asyncio.create_task(_fetch_audio(webpage_url, guild_id, ticket, source, spec, cap)), ticket)
+	flight.waiters = 1
+	_IN_FLIGHT[key] = flight
+
+	def land(task: asyncio.Task):
+		if _IN_FLIGHT.get(key) is flight:
+			del _IN_FLIGHT[key]
+
+	flight.task.add_done_callback(land)
+	return flight
+
+
+def _leave_flight(flight: _Flight, ticket: Ticket):
+	"""Drop `ticket`'s waiter. The last one out hands back the flight's own reference."""
+	if ticket is not flight.ticket:
+		ticket.on_promote(lambda: None)
+	flight.waiters -= 1
+	if flight.waiters > 0:
 		return
 
-	removed = 0
-	for path in CACHE_DIR.iterdir():
-		if not path.is_file():
-			continue
-		try:
-			path.unlink()
-			removed += 1
-		except OSError as error:
-			print(f' ERR > Failed to delete stale cache file {path}: {error}')
+	if not flight.task.done():
+		# Nobody wants this video any more.
+		flight.task.cancel()
+	flight.task.add_done_callback(_release_flight)
+
+
+def _release_flight(task: asyncio.Task):
+	if task.cancelled() or task.exception() is not None:
+		return
+	AUDIO_CACHE.release(task.result())
+
+
+async def download_audio(
+	webpage_url: str,
+	guild_id: int,
+	ticket: Ticket | None = None,
+	source: dict | None = None,
+	bitrate: int | None = None,
+) -> Path:
+	"""A path to the audio for `webpage_url`. Pass it to release_audio() when done.
+
+	Concurrent calls for the same video share a single download; each caller
+	gets its own cache reference to the one resulting file. Without a ticket the
+	download runs in the playback lane. `source` is a Track's stored extraction
+	result; while its URLs are valid the video is not resolved again. `bitrate`
+	is the voice channel's and caps the format of a fresh resolve.
+	"""
+	ticket = ticket or Ticket(Lane.PLAYBACK)
+	return await _via_service(
+		lambda: SERVICE.download(webpage_url, guild_id, ticket, source, bitrate),
+		lambda: _download_here(webpage_url, guild_id, ticket, source, bitrate),
+	)
+
+
+async def _download_here(
+	webpage_url: str,
+	guild_id: int,
+	ticket: Ticket,
+	source: dict | None,
+	bitrate: int | None,
+) -> Path:
+	spec = audio_format(bitrate)
+	cap = bitrate_cap(bitrate)
+	video_id = _video_id(webpage_url)
+	if video_id is None:
+		return await _fetch_audio(webpage_url, guild_id, ticket, source, spec, cap)
+
+	keys = _usable_keys(video_id, cap)
+	for key in keys:
+		cached = AUDIO_CACHE.acquire(key)
+		if cached is not None:
+			return cached
+
+	flight = _join_flight(keys[0], webpage_url, guild_id, ticket, source, spec, cap)
+	try:
+		# Shielded: one caller giving up must not cancel it for the others.
+		path = await asyncio.shield(flight.task)
+		# The flight's own reference keeps the file from being evicted until every
+		# waiter has taken one of its own.
+		shared = AUDIO_CACHE.acquire(keys[0])
+		if shared is None:
+			raise ValueError(f'Download finished but the cached file is gone: {path}')
+		return shared
+	finally:
+		_leave_flight(flight, ticket)
+
+
+def release_audio(path: Path | None):
+	"""Hand back a path from download_audio(). Files the cache does not own are deleted."""
+	if path is None:
+		return
+	if SERVICE is not None and SERVICE.owns(path):
+		SERVICE.release(path)
+	else:
+		_release_here(path)
+
+
+def _release_here(path: Path):
+	if AUDIO_CACHE.release(path):
+		return
+
+	try:
+		path.unlink(missing_ok=True)
+	except OSError as error:
+		print(f' ERR > Failed to delete {path}: {error}')
+
+
+def configure_cache(max_bytes: int):
+	AUDIO_CACHE.max_bytes = max_bytes
+
+
+def configure_workers(enabled: bool):
+	"""Run extraction and downloads in worker processes rather than threads. Call at startup."""
+	global WORKERS
+	if enabled and WORKERS is None:
+		WORKERS = ProcessPool(initializer=_enter_worker)
+
+
+def configure_service(url: str | None, token: str | None = None):
+	"""Leave extraction and downloads to the worker service at `url`, if set. Call before load_cache()."""
+	global SERVICE, CACHE_DIR, AUDIO_CACHE
+	if not url:
+		SERVICE = None
+		return
+
+	SERVICE = WorkerClient(url, token)
+	if AUDIO_CACHE.root != FALLBACK_CACHE_DIR:
+		CACHE_DIR = FALLBACK_CACHE_DIR
+		AUDIO_CACHE = AudioCache(FALLBACK_CACHE_DIR, AUDIO_CACHE.max_bytes)
+
+
+def load_cache():
+	"""Re-index audio left by a previous process, dropping unfinished downloads. Safe to call at startup."""
+	AUDIO_CACHE.rebuild()
+	METADATA_CACHE.prune()
+
 
-	if removed:
-		print(f'LOG > Cleared {removed} stale music cache file(s)')
+def unload():
+	"""Close the metadata store and pooled yt-dlp handles. Call when the cog unloads."""
+	METADATA_CACHE.close()
+	EXECUTOR.shutdown()
+	_EXTRACT_POOL.close()
+	_DOWNLOAD_POOL.close()
+	_PLAYLIST_POOL.close()
+	if WORKERS is not None:
+		WORKERS.close()
+	if SERVICE is not None:
+		SERVICE.close()
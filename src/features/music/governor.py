@@ -0,0 +1,143 @@
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from src.core.process_pool import Host
+
+
+# Requests per second to YouTube, across every guild, while nothing pushes back.
+GOVERNOR_RATE = 2.0
+# Requests that may go out back to back after a quiet spell.
+GOVERNOR_BURST = 6
+# However hard YouTube pushes back, the rate never drops below this.
+GOVERNOR_MIN_RATE = 0.1
+# Each success wins back this fraction of the full rate.
+GOVERNOR_RECOVERY = 0.1
+# The pause after pushback, doubling with each one in a row up to the max.
+GOVERNOR_COOLDOWN = 5.0
+GOVERNOR_MAX_COOLDOWN = 120.0
+
+
+@dataclass(frozen=True, slots=True)
+class Budget:
+	rate: float
+	max_rate: float
+	tokens: float
+	burst: int
+	# Seconds until requests may go out again; 0 unless cooling down.
+	cooldown: float
+	backoffs: int
+
+
+class Governor:
+	"""A token bucket shared by every request to YouTube, which slows down when pushed back.
+
+	Pushback (a 429, or a download crawling along at a throttled rate) halves the
+	rate and pauses every request for a cooldown; successes win the rate back a
+	step at a time. acquire() blocks, so it is only called from worker threads.
+	"""
+
+	def __init__(
+		self,
+		rate: float = GOVERNOR_RATE,
+		burst: int = GOVERNOR_BURST,
+		*,
+		min_rate: float = GOVERNOR_MIN_RATE,
+		clock: Callable[[], float] = time.monotonic,
+	):
+		self.max_rate = rate
+		self.min_rate = min_rate
+		self.burst = burst
+		self._clock = clock
+		self._rate = rate
+		self._tokens = float(burst)
+		self._updated = clock()
+		self._paused_until = 0.0
+		self._strikes = 0
+		self._backoffs = 0
+		self._lock = threading.Lock()
+
+	def acquire(self, abort: threading.Event | None = None) -> bool:
+		"""Wait for a token. False, without taking one, if `abort` is set first."""
+		while True:
+			with self._lock:
+				now = self._refill()
+				if now < self._paused_until:
+					delay = self._paused_until - now
+				elif self._tokens >= 1:
+					self._tokens -= 1
+					return True
+				else:
+					delay = (1 - self._tokens) / self._rate
+
+			if abort is None:
+				time.sleep(delay)
+			elif abort.wait(delay):
+				return False
+
+	def back_off(self, reason: str):
+		"""YouTube pushed back: halve the rate and pause everything for a while."""
+		with self._lock:
+			now = self._refill()
+			self._rate = max(self.min_rate, self._rate / 2)
+			cooldown = min(GOVERNOR_MAX_COOLDOWN, GOVERNOR_COOLDOWN * 2 ** self._strikes)
+			self._paused_until = max(self._paused_until, now + cooldown)
+			self._tokens = 0.0
+			self._strikes += 1
+			self._backoffs += 1
+			rate = self._rate
+		print(f' ERR > YouTube pushed back ({reason}); pausing {cooldown:.0f}s, then {rate:.2f} requests/s')
+
+	def recover(self):
+		"""A request went through untroubled."""
+		with self._lock:
+			self._strikes = 0
+			throttled = self._rate < self.max_rate
+			self._rate = min(self.max_rate, self._rate + self.max_rate * GOVERNOR_RECOVERY)
+			restored = throttled and self._rate == self.max_rate
+			backoffs = self._backoffs
+		if restored:
+			print(f'LOG > YouTube requests back to {self.max_rate:.2f}/s after {backoffs} back-offs so far')
+
+	def budget(self) -> Budget:
+		with self._lock:
+			now = self._refill()
+			return Budget(
+				rate=self._rate,
+				max_rate=self.max_rate,
+				tokens=self._tokens,
+				burst=self.burst,
+				cooldown=max(0.0, self._paused_until - now),
+				backoffs=self._backoffs,
+			)
+
+	def _refill(self) -> float:
+		"""Caller must hold self._lock."""
+		now = self._clock()
+		# Nothing accrues during a cooldown.
+		since = max(self._updated, self._paused_until)
+		if now > since:
+			self._tokens = min(float(self.burst), self._tokens + (now - since) * self._rate)
+		self._updated = max(self._updated, now)
+		return now
+
+
+class RemoteGovernor:
+	"""The governor inside a worker process: every call is answered by the parent's.
+
+	Only the parent knows what every guild is asking for, so pacing cannot be
+	decided per process. The parent answers acquire() with its own abort event.
+	"""
+
+	def __init__(self, host: Host):
+		self._host = host
+
+	def acquire(self, abort: threading.Event | None = None) -> bool:
+		return self._host.ask('acquire')
+
+	def back_off(self, reason: str):
+		self._host.tell('back_off', reason)
+
+	def recover(self):
+		self._host.tell('recover')
@@ -33,6 +33,20 @@ def format_duration(seconds: float | int | None) -> str:
 	return f'{minutes}:{secs:02d}'
 
 
+def parse_timestamp(text: str) -> int | None:
+	"""Seconds from `90`, `1:30` or `1:02:03`, or None if `text` is not a time."""
+	parts = [part.strip() for part in text.strip().split(':')]
+	if len(parts) > 3 or not all(part.isdigit() for part in parts):
+		return None
+	if any(int(part) >= 60 for part in parts[1:]):
+		return None
+
+	seconds = 0
+	for part in parts:
+		seconds = seconds * 60 + int(part)
+	return seconds
+
+
 def truncate_title(title: str) -> str:
 	if len(title) <= TITLE_MAX_CHARS:
 		return title
@@ -162,6 +176,12 @@ def now_playing_embed(track: Track, elapsed: float, paused: bool) -> discord.Emb
 	return embed
 
 
+def seeked_embed(track: Track, position: float, paused: bool) -> discord.Embed:
+	embed = _track_embed('Paused' if paused else 'Seeked', track)
+	embed.description = format_progress(position, track.duration)
+	return embed
+
+
 def skipped_embed(skipped: Track, next_track: Track | None, remaining: int) -> discord.Embed:
 	embed = _track_embed('Skipped', skipped)
 	if next_track is None:
@@ -178,6 +198,18 @@ def skipped_embed(skipped: Track, next_track: Track | None, remaining: int) -> d
 	return embed
 
 
+def playlist_embed(added: int, stopped: str | None = None) -> discord.Embed:
+	noun = 'track' if added == 1 else 'tracks'
+	embed = discord.Embed(
+		description=f'Added **{added}** {noun} from the playlist.',
+		color=MUSIC_COLOR,
+	)
+	embed.set_author(name='Playlist Queued')
+	if stopped:
+		embed.add_field(name='Stopped early', value=stopped, inline=False)
+	return embed
+
+
 def paused_embed(track: Track) -> discord.Embed:
 	return _track_embed('Paused', track)
 
@@ -0,0 +1,150 @@
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable
+from pathlib import Path
+
+
+# Titles, durations and thumbnails of a video essentially never change.
+TRACK_TTL = 7 * 24 * 60 * 60
+# What a search resolves to drifts as new uploads appear, so trust it for less.
+LOOKUP_TTL = 24 * 60 * 60
+# A rejected query is answered from here for a while instead of resolved again.
+# Short, because a live stream ends and a search picks up new uploads.
+REJECTION_TTL = 10 * 60
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tracks (
+	video_id TEXT PRIMARY KEY,
+	fields TEXT NOT NULL,
+	expires REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lookups (
+	key TEXT PRIMARY KEY,
+	video_id TEXT NOT NULL,
+	expires REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rejections (
+	key TEXT PRIMARY KEY,
+	message TEXT NOT NULL,
+	expires REAL NOT NULL
+);
+'''
+
+
+class MetadataStore:
+	"""On-disk map from queries and video ids to the fields a Track needs.
+
+	Purely an accelerator: any database error is logged and treated as a miss, so
+	a broken or locked file can never stop /play from working.
+	"""
+
+	def __init__(self, path: Path):
+		self.path = path
+		self._db: sqlite3.Connection | None = None
+		self._lock = threading.Lock()
+
+	def get(self, key: str) -> dict | None:
+		"""The cached fields for a lookup key, or None if absent or expired."""
+		now = time.time()
+		try:
+			with self._lock:
+				db = self._connect()
+				row = db.execute(
+					'SELECT t.fields FROM lookups l JOIN tracks t ON t.video_id = l.video_id '
+					'WHERE l.key = ? AND l.expires > ? AND t.expires > ?',
+					(key, now, now),
+				).fetchone()
+		except (sqlite3.Error, OSError) as error:
+			print(f' ERR > Metadata cache read failed: {error}')
+			return None
+
+		return json.loads(row[0]) if row else None
+
+	def get_video(self, video_id: str) -> dict | None:
+		try:
+			with self._lock:
+				row = self._connect().execute(
+					'SELECT fields FROM tracks WHERE video_id = ? AND expires > ?',
+					(video_id, time.time()),
+				).fetchone()
+		except (sqlite3.Error, OSError) as error:
+			print(f' ERR > Metadata cache read failed: {error}')
+			return None
+
+		return json.loads(row[0]) if row else None
+
+	def put(self, video_id: str, fields: dict, keys: Iterable[str] = ()):
+		"""Store a video's fields and point each lookup key at it."""
+		now = time.time()
+		try:
+			with self._lock:
+				db = self._connect()
+				with db:
+					db.execute(
+						'INSERT OR REPLACE INTO tracks (video_id, fields, expires) VALUES (?, ?, ?)',
+						(video_id, json.dumps(fields), now + TRACK_TTL),
+					)
+					db.executemany(
+						'INSERT OR REPLACE INTO lookups (key, video_id, expires) VALUES (?, ?, ?)',
+						[(key, video_id, now + LOOKUP_TTL) for key in keys],
+					)
+		except (sqlite3.Error, OSError) as error:
+			print(f' ERR > Metadata cache write failed: {error}')
+
+	def get_rejection(self, key: str) -> str | None:
+		"""Why a lookup key was recently refused, or None."""
+		try:
+			with self._lock:
+				row = self._connect().execute(
+					'SELECT message FROM rejections WHERE key = ? AND expires > ?',
+					(key, time.time()),
+				).fetchone()
+		except (sqlite3.Error, OSError) as error:
+			print(f' ERR > Metadata cache read failed: {error}')
+			return None
+
+		return row[0] if row else None
+
+	def put_rejection(self, keys: Iterable[str], message: str):
+		"""Remember for REJECTION_TTL that each lookup key was refused with `message`."""
+		expires = time.time() + REJECTION_TTL
+		try:
+			with self._lock:
+				db = self._connect()
+				with db:
+					db.executemany(
+						'INSERT OR REPLACE INTO rejections (key, message, expires) VALUES (?, ?, ?)',
+						[(key, message, expires) for key in keys],
+					)
+		except (sqlite3.Error, OSError) as error:
+			print(f' ERR > Metadata cache write failed: {error}')
+
+	def prune(self):
+		"""Drop expired rows. Safe to call at startup."""
+		now = time.time()
+		try:
+			with self._lock:
+				db = self._connect()
+				with db:
+					db.execute('DELETE FROM lookups WHERE expires <= ?', (now,))
+					db.execute('DELETE FROM tracks WHERE expires <= ?', (now,))
+					db.execute('DELETE FROM rejections WHERE expires <= ?', (now,))
+		except (sqlite3.Error, OSError) as error:
+			print(f' ERR > Metadata cache prune failed: {error}')
+
+	def close(self):
+		with self._lock:
+			if self._db is not None:
+				self._db.close()
+				self._db = None
+
+	def _connect(self) -> sqlite3.Connection:
+		"""Caller must hold self._lock."""
+		if self._db is None:
+			self.path.parent.mkdir(parents=True, exist_ok=True)
+			db = sqlite3.connect(self.path, check_same_thread=False)
+			db.executescript(_SCHEMA)
+			self._db = db
+		return self._db
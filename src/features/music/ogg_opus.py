@@ -0,0 +1,202 @@
+import mmap
+import struct
+from bisect import bisect_right
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+import discord
+
+
+# Opus timestamps are always in 48 kHz samples, whatever the input rate was.
+SAMPLE_RATE = 48000
+# py-cord's AudioPlayer sends one packet every 20 ms, so every packet has to
+# hold exactly that much audio or playback drifts in speed.
+FRAME_SAMPLES = 960
+# Packets checked for 20 ms framing before a file is trusted.
+VALIDATE_PACKETS = 50
+
+# capture pattern, version, header type, granule position, serial, sequence, CRC, segment count
+_PAGE_HEADER = struct.Struct('<4sBBqIIIB')
+_CONTINUED = 0x01
+# Frame length in 48 kHz samples for each TOC config, per RFC 6716 section 3.1.
+_SILK_FRAMES = (480, 960, 1920, 2880)
+_HYBRID_FRAMES = (480, 960)
+_CELT_FRAMES = (120, 240, 480, 960)
+
+
+class OggOpusError(ValueError):
+	pass
+
+
+@dataclass(frozen=True, slots=True)
+class _Page:
+	granule: int
+	flags: int
+	lacing: int
+	segments: int
+	body: int
+
+
+def _index_pages(data: mmap.mmap) -> list[_Page]:
+	"""Every complete page in the file, found by hopping from header to header.
+
+	A truncated final page is dropped rather than treated as an error. Pages on
+	which no packet ends carry a granule of -1; they inherit the previous one so
+	the index stays sorted for seeking.
+	"""
+	pages: list[_Page] = []
+	serial = None
+	granule = 0
+	offset = 0
+	while offset + _PAGE_HEADER.size <= len(data):
+		capture, version, flags, page_granule, page_serial, _, _, segments = _PAGE_HEADER.unpack_from(data, offset)
+		if capture != b'OggS' or version != 0:
+			raise OggOpusError(f'No Ogg page at byte {offset}')
+		if serial is None:
+			serial = page_serial
+		elif page_serial != serial:
+			raise OggOpusError('Multiplexed Ogg streams are not supported')
+
+		lacing = offset + _PAGE_HEADER.size
+		body = lacing + segments
+		if body > len(data):
+			break
+		end = body + sum(data[lacing:body])
+		if end > len(data):
+			break
+
+		granule = max(granule, page_granule)
+		pages.append(_Page(granule, flags, lacing, segments, body))
+		offset = end
+	return pages
+
+
+def _packet_samples(packet: bytes) -> int:
+	"""Audio in a packet, in 48 kHz samples, from its TOC byte."""
+	if not packet:
+		return 0
+	toc = packet[0]
+	config = toc >> 3
+	if config < 12:
+		frame = _SILK_FRAMES[config & 3]
+	elif config < 16:
+		frame = _HYBRID_FRAMES[config & 1]
+	else:
+		frame = _CELT_FRAMES[config & 3]
+
+	code = toc & 3
+	if code == 0:
+		return frame
+	if code in (1, 2):
+		return frame * 2
+	return frame * (packet[1] & 0x3F) if len(packet) > 1 else 0
+
+
+class OggOpusSource(discord.AudioSource):
+	"""Plays an Ogg/Opus file without ffmpeg, sending its packets as they are stored.
+
+	The file is memory-mapped and indexed by page, so starting at an offset is a
+	binary search on granule positions. Playback starts at the page holding the
+	requested sample, which is within a fraction of a second of it. Raises
+	OggOpusError for anything py-cord could not send untouched.
+	"""
+
+	def __init__(self, path: Path, seek: float = 0.0):
+		self._file = open(path, 'rb')
+		try:
+			self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+		except ValueError as error:
+			self._file.close()
+			raise OggOpusError(f'Cannot map {path}: {error}') from None
+
+		try:
+			self._pages = _index_pages(self._data)
+			self._pre_skip = self._read_headers()
+			self._validate()
+		except Exception:
+			self.cleanup()
+			raise
+
+		self._packets = self._iter_packets(self._page_at(seek))
+
+	def read(self) -> bytes:
+		return next(self._packets, b'')
+
+	def is_opus(self) -> bool:
+		return True
+
+	def cleanup(self):
+		data = getattr(self, '_data', None)
+		if data is not None and not data.closed:
+			data.close()
+		self._file.close()
+
+	def _read_headers(self) -> int:
+		"""Check the identification and comment headers and return the pre-skip."""
+		packets = self._iter_packets(0)
+		head = next(packets, b'')
+		if len(head) < 19 or head[:8] != b'OpusHead':
+			raise OggOpusError('Missing OpusHead')
+		channels, pre_skip = head[9], int.from_bytes(head[10:12], 'little')
+		if not 1 <= channels <= 2 or head[18] != 0:
+			raise OggOpusError(f'Unsupported channel layout ({channels} channels, family {head[18]})')
+		if next(packets, b'')[:8] != b'OpusTags':
+			raise OggOpusError('Missing OpusTags')
+		return pre_skip
+
+	def _validate(self):
+		packets = self._iter_packets(self._first_audio_page())
+		for _, packet in zip(range(VALIDATE_PACKETS), packets):
+			samples = _packet_samples(packet)
+			if samples != FRAME_SAMPLES:
+				raise OggOpusError(f'Packets hold {samples / SAMPLE_RATE * 1000:g} ms of audio, not 20 ms')
+
+	def _first_audio_page(self) -> int:
+		# Both headers end on their own pages, so audio starts at the first page
+		# with a non-zero granule.
+		return bisect_right([page.granule for page in self._pages], 0)
+
+	def _page_at(self, seek: float) -> int:
+		first = self._first_audio_page()
+		if seek <= 0:
+			return first
+		target = self._pre_skip + int(seek * SAMPLE_RATE)
+		# A page's granule counts the samples finished by its end, so the target
+		# sample sits on the first page that has finished more than it.
+		granules = [page.granule for page in self._pages]
+		return max(first, bisect_right(granules, target))
+
+	def _iter_packets(self, first_page: int) -> Iterator[bytes]:
+		"""Whole packets from `first_page` on, skipping the tail of one that began earlier."""
+		data = self._data
+		carry: bytes | None = None
+		for page in self._pages[first_page:]:
+			continued = bool(page.flags & _CONTINUED)
+			if not continued:
+				carry = None
+			start = page.body
+			size = 0
+			head = True
+			for lace in data[page.lacing:page.lacing + page.segments]:
+				size += lace
+				if lace == 255:
+					continue
+				piece = data[start:start + size]
+				start += size
+				size = 0
+				if head and continued:
+					head = False
+					if carry is None:
+						continue
+					piece = carry + piece
+				head = False
+				carry = None
+				yield piece
+
+			if size:
+				piece = data[start:start + size]
+				if head and continued:
+					carry = carry + piece if carry is not None else None
+				else:
+					carry = piece
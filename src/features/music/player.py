@@ -1,18 +1,32 @@
 import asyncio
+import shlex
 import time
 from collections import deque
-from datetime import datetime
+from collections.abc import Coroutine
 from pathlib import Path
+from typing import Any
 
 import discord
 
 from src.core.bot import GuapishBot
-from src.features.music.extractor import download_audio
+from src.features.music.executor import Ticket
+from src.features.music.extractor import AudioStream, download_audio, release_audio, resolve_stream
 from src.features.music.helpers import disconnected_embed, playback_failed_embed, playing_embed
+from src.features.music.ogg_opus import OggOpusError, OggOpusSource
+from src.features.music.prefetch import PREFETCH_AHEAD, Prefetcher, discard
 from src.features.music.track import Track
+from src.features.music.transition import FRAME_SECONDS, GaplessSource
 
 
 FFMPEG_OPTIONS = '-vn'
+# Enough of a WebM or Ogg file to reach the codec id in its track header.
+OPUS_PROBE_BYTES = 16 * 1024
+# Start tracks that are not on disk yet straight from YouTube's media URL while
+# the download finishes in the background, instead of waiting for the whole file.
+STREAM_MODE = True
+STREAM_RESOLVE_TIMEOUT = 15
+# A long stream outlives individual HTTP connections; let ffmpeg pick it back up.
+STREAM_BEFORE_OPTIONS = '-reconnect 1 -reconnect_streamed 1 -reconnect_on_network_error 1 -reconnect_delay_max 5'
 IDLE_TIMEOUT = 60
 INSTANT_FAIL_SECONDS = 2
 # py-cord tears its own voice session down and re-joins on a voice server
@@ -23,8 +37,11 @@ INSTANT_FAIL_SECONDS = 2
 # normally land in well under a second.
 RECONNECT_GRACE = 15
 RECONNECT_POLL = 0.25
-# A wedged yt-dlp must never pin `current` forever; that is what leaves the bot
-# connected, silent, and answering every /play with 'queued at position N'.
+# How long a track with nothing to play yet waits on its download. A wedged
+# yt-dlp must never pin `current` forever; that is what leaves the bot connected,
+# silent, and answering every /play with 'queued at position N'. Downloads that
+# only feed the cache and seeks, behind a stream or ahead in the queue, are not
+# held to it.
 DOWNLOAD_TIMEOUT = 180
 # py-cord's disconnect() waits up to its connect timeout (60s) for the gateway to
 # echo the disconnect, so never let it block a command for that long.
@@ -45,16 +62,92 @@ VOICE_STALE_SECONDS = 14
 VOICE_WATCHDOG_POLL = 4
 # Rewind a little when resuming a rebuilt session so nothing is skipped.
 REVIVE_REWIND = 2.0
-
-
-def _unlink(path: Path | None):
-	if path is None:
-		return
-
+# Open the next track's file before the current one ends and play it on the
+# same voice_client.play(), so the switch lands on a frame boundary. Without it
+# every track waits for the driver to start it, and that is audible.
+GAPLESS = True
+# Mix this many seconds of one track's end into the next. Everything is then
+# decoded to PCM and encoded by py-cord, which costs CPU; 0 turns it off.
+CROSSFADE_SECONDS = 0
+# How long before a track ends the next one is opened and chained behind it, on
+# top of the crossfade. Only a next track that is already downloaded is chained.
+PRELOAD_SECONDS = 10
+# How often the chained track is checked against the head of the queue.
+PRELOAD_POLL = 0.5
+
+
+def configure_transitions(gapless: bool, crossfade_seconds: int = 0):
+	"""Set how one track gives way to the next. Call at startup."""
+	global GAPLESS, CROSSFADE_SECONDS
+	CROSSFADE_SECONDS = max(0, crossfade_seconds)
+	# A crossfade needs the next track chained just the same.
+	GAPLESS = gapless or CROSSFADE_SECONDS > 0
+
+
+def _is_opus_file(path: Path) -> bool:
+	"""Whether a downloaded file's audio is Opus, judged from its container header."""
 	try:
-		path.unlink(missing_ok=True)
-	except OSError as error:
-		print(f' ERR > Failed to delete {path}: {error}')
+		with open(path, 'rb') as file:
+			head = file.read(OPUS_PROBE_BYTES)
+	except OSError:
+		return False
+	# Matroska/WebM codec id, and the identification header Ogg and WebM both carry.
+	return b'A_OPUS' in head or b'OpusHead' in head
+
+
+def _audio_source(
+	path: Path | None,
+	stream: AudioStream | None,
+	seek: float,
+	bitrate: int | None = None,
+	*,
+	pcm: bool = False,
+) -> discord.AudioSource:
+	"""A source for the file or stream.
+
+	An Ogg/Opus file is read natively. Otherwise ffmpeg copies Opus through
+	untouched and re-encodes anything else at the channel's bitrate. With `pcm`,
+	ffmpeg decodes everything to PCM instead, for a crossfade to mix.
+	"""
+	passthrough = stream.codec == 'opus' if stream is not None else _is_opus_file(path)
+	if stream is None and path.suffix == '.opus' and not pcm:
+		try:
+			return OggOpusSource(path, seek)
+		except (OggOpusError, OSError) as error:
+			print(f' ERR > Cannot play {path.name} natively, re-encoding: {error}')
+			# Whatever was wrong with its packets would be copied straight through.
+			passthrough = False
+
+	before = []
+	if stream is not None:
+		before.append(STREAM_BEFORE_OPTIONS)
+		if stream.headers:
+			headers = ''.join(f'{key}: {value}\r\n' for key, value in stream.headers.items())
+			before.append(f'-headers {shlex.quote(headers)}')
+	if seek > 0:
+		before.append(f'-ss {seek:.3f}')
+
+	if pcm:
+		return discord.FFmpegPCMAudio(
+			stream.url if stream is not None else str(path),
+			options=FFMPEG_OPTIONS,
+			before_options=' '.join(before) or None,
+		)
+	return discord.FFmpegOpusAudio(
+		stream.url if stream is not None else str(path),
+		codec='copy' if passthrough else None,
+		bitrate=min(bitrate // 1000, 512) if bitrate and not passthrough else None,
+		options=FFMPEG_OPTIONS,
+		before_options=' '.join(before) or None,
+	)
+
+
+def _log_background_failure(task: asyncio.Task):
+	if task.cancelled():
+		return
+	error = task.exception()
+	if error is not None:
+		print(f' ERR > Background download failed: {error}')
 
 
 class GuildPlayer:
@@ -64,7 +157,6 @@ class GuildPlayer:
 		self.loop = asyncio.get_running_loop()
 		self.queue: deque[Track] = deque()
 		self.current: Track | None = None
-		self.started_at: datetime | None = None
 		self.elapsed_offset = 0.0
 		self.lock = asyncio.Lock()
 		self.request_lock = asyncio.Lock()
@@ -80,11 +172,23 @@ class GuildPlayer:
 		self._alone_gen = 0
 		self._confirm_gen = 0
 		self._watchdog_gen = 0
-		self._current_file: Path | None = None
+		# Owns the current track's file from the moment the driver takes it: it may
+		# still be downloading, and a skip or stop cancels it through
+		# prefetch.discard() instead of leaving it to finish for nobody.
+		self._current_download: asyncio.Task | None = None
 		# perf_counter, so it is directly comparable to the voice keep-alive clock.
 		self._alone_since: float | None = None
 		self._reviving = False
 		self._resume_at = 0.0
+		self._prefetch = Prefetcher(self._download, release_audio)
+		# The source everything plays through, set from the moment a track starts
+		# until playback stops, and the queued track chained behind it (GAPLESS).
+		# _chained can be a track whose source failed to open; it is not retried.
+		self._chain: GaplessSource | None = None
+		self._chained: Track | None = None
+		self._preload_task: asyncio.Task | None = None
+		# Playlists still being listed into the queue; /clear and /stop end them.
+		self._ingest_tasks: set[asyncio.Task] = set()
 
 	@property
 	def is_playing(self) -> bool:
@@ -98,12 +202,27 @@ class GuildPlayer:
 	def is_connected(self) -> bool:
 		return bool(self.voice_client and self.voice_client.is_connected())
 
+	@property
+	def _current_file(self) -> Path | None:
+		"""The current track's file, once it is fully on disk."""
+		task = self._current_download
+		if task is None or not task.done() or task.cancelled() or task.exception() is not None:
+			return None
+		return task.result()
+
+	def _channel_bitrate(self) -> int | None:
+		"""The bits per second the current voice channel carries, if known."""
+		return getattr(getattr(self.voice_client, 'channel', None), 'bitrate', None)
+
 	@property
 	def elapsed(self) -> float:
-		running = 0.0
-		if self.started_at is not None:
-			running = (datetime.now() - self.started_at).total_seconds()
-		return self.elapsed_offset + running
+		"""Seconds into the current track, counted in 20 ms frames handed to py-cord.
+
+		A pause, a stalled ffmpeg, a voice reconnect or a slow start sends nothing,
+		so unlike a wall clock it does not move on through them.
+		"""
+		frames = self._chain.frames if self._chain is not None else 0
+		return self.elapsed_offset + frames * FRAME_SECONDS
 
 	def _registered_voice_client(self) -> discord.VoiceClient | None:
 		"""The voice client py-cord holds for this guild, if any.
@@ -153,6 +272,7 @@ class GuildPlayer:
 			# Spawn the driver under the same lock acquisition as the append, so a
 			# queued track can never be left with nothing to advance it.
 			self._ensure_driver()
+			self._schedule_prefetch()
 			return should_start, len(self.queue)
 
 	def _ensure_driver(self, *, announce: bool = False):
@@ -182,9 +302,6 @@ class GuildPlayer:
 			return False
 
 		self.voice_client.pause()
-		if self.started_at is not None:
-			self.elapsed_offset += (datetime.now() - self.started_at).total_seconds()
-			self.started_at = None
 		return True
 
 	def resume(self) -> bool:
@@ -192,17 +309,55 @@ class GuildPlayer:
 			return False
 
 		self.voice_client.resume()
-		self.started_at = datetime.now()
 		return True
 
+	async def seek(self, position: float) -> tuple[float | None, str | None]:
+		"""Play the current track from `position` seconds, reading the file already on disk.
+
+		The new source takes over inside the running chain, the way a rebuilt
+		session resumes with `-ss`: the track keeps its place, its download and
+		whatever is chained behind it. Returns where it plays from, or why it cannot.
+		"""
+		async with self.lock:
+			self._settle_chain()
+			track = self.current
+			if track is None or self._chain is None:
+				return None, 'Nothing is playing.'
+			if track.duration is not None and position >= track.duration:
+				return None, 'That is past the end of the track.'
+			path = self._current_file
+			if path is None:
+				return None, 'This track is still downloading. Try again in a moment.'
+
+			position = max(0.0, position)
+			try:
+				source = _audio_source(path, None, position, self._channel_bitrate(), pcm=CROSSFADE_SECONDS > 0)
+			except Exception as error:
+				print(f' ERR > Cannot seek {track.title}: {error}')
+				return None, 'Could not seek this track.'
+
+			if not self._chain.replace(source):
+				source.cleanup()
+				self._settle_chain()
+				return None, 'That track has just ended.'
+
+			self.elapsed_offset = position
+			# Its wait for the end of the track was measured from the old position.
+			self._start_preload()
+			print(f'LOG > Seeked {track.title} to {position:.0f}s in guild {self.guild_id}')
+			return position, None
+
 	async def skip(self) -> tuple[Track, Track | None, int] | None:
 		async with self.lock:
+			# A switch the voice thread already made means the next track is the
+			# one playing, and the one being skipped.
+			self._settle_chain()
 			skipped = self.current
 			if skipped is not None:
 				self._play_gen += 1
 				self.current = None
-				self.started_at = None
 				self.elapsed_offset = 0.0
+				self._drop_chain()
 				self._cleanup_file()
 				if self.voice_client and (self.voice_client.is_playing() or self.voice_client.is_paused()):
 					self.voice_client.stop()
@@ -212,6 +367,8 @@ class GuildPlayer:
 				# 'nothing is playing' for the whole length of that download.
 				skipped = self.queue.popleft()
 				self._play_gen += 1
+				# Nothing plays, so _schedule_prefetch() would leave it downloading.
+				self._prefetch.discard(keep=list(self.queue)[:PREFETCH_AHEAD])
 			else:
 				return None
 
@@ -225,9 +382,19 @@ class GuildPlayer:
 
 		return skipped, next_track, remaining
 
+	def ingest(self, coro: Coroutine[Any, Any, None]) -> asyncio.Task:
+		"""Run something that keeps adding to the queue, such as a playlist, until clear() or stop()."""
+		task = asyncio.create_task(coro)
+		self._ingest_tasks.add(task)
+		task.add_done_callback(self._ingest_tasks.discard)
+		return task
+
 	def clear(self) -> int:
+		self._unchain()
+		self._cancel_ingest()
 		count = len(self.queue)
 		self.queue.clear()
+		self._prefetch.discard()
 		return count
 
 	async def stop(self):
@@ -249,10 +416,12 @@ class GuildPlayer:
 		self._play_gen += 1
 		self.queue.clear()
 		self.current = None
-		self.started_at = None
 		self.elapsed_offset = 0.0
 		self._resume_at = 0.0
+		self._drop_chain()
 		self._cleanup_file()
+		self._prefetch.discard()
+		self._cancel_ingest()
 		self._cancel_idle()
 		self._cancel_alone()
 		self._cancel_confirm()
@@ -383,12 +552,14 @@ class GuildPlayer:
 
 			self._reviving = True
 			self._play_gen += 1
+			self._settle_chain()
 			track = self.current
 			if track is not None:
 				self._resume_at = max(0.0, self.elapsed - REVIVE_REWIND)
 				self.queue.appendleft(track)
+				self._requeue_download(track)
+			self._drop_chain()
 			self.current = None
-			self.started_at = None
 			self.elapsed_offset = 0.0
 			self._cleanup_file()
 			self._cancel_confirm()
@@ -514,7 +685,6 @@ class GuildPlayer:
 
 				self._cleanup_file()
 				if not self.queue:
-					self.started_at = None
 					self.elapsed_offset = 0.0
 					# Only arm the idle timer if there is still a session to time out.
 					if self.is_connected:
@@ -523,28 +693,27 @@ class GuildPlayer:
 
 				track = self.queue.popleft()
 				self.current = track
-				self.started_at = None
 				self.elapsed_offset = 0.0
 				self._play_gen += 1
 				gen = self._play_gen
+				# Usually already finished: it was prefetched while the previous
+				# track played.
+				download = self._prefetch.take(track)
+				self._current_download = download
 
 			try:
-				# Bounded: an unbounded download pins `current` and silently kills the
-				# queue, which no amount of downstream recovery can detect.
-				path = await asyncio.wait_for(
-					download_audio(track.webpage_url, self.guild_id),
-					timeout=DOWNLOAD_TIMEOUT,
-				)
+				path, stream = await self._open_media(track, download)
 			except Exception as error:
-				print(f' ERR > Failed to start {track.title}: {error}')
 				async with self.lock:
 					superseded = gen != self._play_gen
-					if self.current is track:
+					if not superseded:
 						self.current = None
+						self._cleanup_file()
 				if superseded:
 					# Someone skipped/stopped us mid-download. Re-enter the loop so any
 					# remaining queue is still advanced rather than stranded.
 					continue
+				print(f' ERR > Failed to start {track.title}: {error}')
 				await self._notify(playback_failed_embed(track))
 				continue
 
@@ -552,16 +721,16 @@ class GuildPlayer:
 			started = False
 			async with self.lock:
 				if gen != self._play_gen:
-					_unlink(path)
+					# Whoever superseded us already cancelled or requeued the download.
 					continue
 
 				if not self.is_connected:
 					# Hold the track instead of dropping it: this is usually py-cord
 					# rebuilding a dropped session, and returning here is what used to
 					# strand the rest of the queue with nothing left to advance it.
-					_unlink(path)
+					# The download goes back with it, so the retry starts straight away.
+					self._requeue_download(track)
 					self.current = None
-					self.started_at = None
 					self.elapsed_offset = 0.0
 					self.queue.appendleft(track)
 					outage = True
@@ -570,23 +739,24 @@ class GuildPlayer:
 					# dead one left off rather than restarting the track.
 					seek, self._resume_at = self._resume_at, 0.0
 					try:
-						source = discord.FFmpegOpusAudio(
-							str(path),
-							options=FFMPEG_OPTIONS,
-							before_options=f'-ss {seek:.3f}' if seek > 0 else None,
-						)
+						source = _audio_source(path, stream, seek, self._channel_bitrate(), pcm=CROSSFADE_SECONDS > 0)
 					except Exception as error:
 						print(f' ERR > Failed to start {track.title}: {error}')
 						self.current = None
-						_unlink(path)
+						self._cleanup_file()
 					else:
-						self._current_file = path
+						self._drop_chain()
+						# Always through the chain: it is the clock, whether or not
+						# anything is chained behind it.
+						source = self._chain = self._open_chain(source)
 						self.elapsed_offset = seek
-						self.started_at = datetime.now()
 						self.voice_client.play(source, after=lambda err, gen=gen: self._after(err, gen))
 						resumed = f' from {seek:.0f}s' if seek > 0 else ''
-						print(f'LOG > Playing {track.title}{resumed} in guild {self.guild_id}')
+						streamed = ' (streaming)' if stream is not None else ''
+						print(f'LOG > Playing {track.title}{resumed}{streamed} in guild {self.guild_id}')
 						started = True
+						self._schedule_prefetch()
+						self._start_preload()
 
 			if outage:
 				outage_retries += 1
@@ -600,9 +770,9 @@ class GuildPlayer:
 					# non-empty queue that no driver owns.
 					self.queue.clear()
 					self.current = None
-					self.started_at = None
 					self.elapsed_offset = 0.0
 					self._cleanup_file()
+					self._prefetch.discard()
 				await self._notify(disconnected_embed())
 				return
 
@@ -613,6 +783,43 @@ class GuildPlayer:
 
 			await self._notify(playback_failed_embed(track))
 
+	async def _open_media(self, track: Track, download: asyncio.Task) -> tuple[Path | None, AudioStream | None]:
+		"""The file if it is already on disk, otherwise a stream to play while it downloads.
+
+		The download is left running either way: the file is what the cache, seeks
+		and voice rebuilds work from. Raises only if there is nothing to play.
+		"""
+		if STREAM_MODE and not download.done():
+			try:
+				stream = await asyncio.wait_for(
+					resolve_stream(
+						track.webpage_url,
+						self.guild_id,
+						source=track.source,
+						bitrate=self._channel_bitrate(),
+					),
+					timeout=STREAM_RESOLVE_TIMEOUT,
+				)
+			except Exception as error:
+				print(f' ERR > Could not stream {track.title}, waiting for the download: {error}')
+			else:
+				if stream.source is not None:
+					# Fresh, so a download of this track that has yet to resolve uses it.
+					track.source = stream.source
+				if not download.done():
+					download.add_done_callback(_log_background_failure)
+					return None, stream
+
+		# Not awaited directly: a skip cancels the download, and that must reach
+		# the driver as a failed start rather than cancel the driver itself.
+		await asyncio.wait((download,), timeout=DOWNLOAD_TIMEOUT)
+		if not download.done():
+			download.cancel()
+			raise TimeoutError(f'Download of {track.title} took longer than {DOWNLOAD_TIMEOUT}s')
+		if download.cancelled():
+			raise ValueError(f'Download of {track.title} was cancelled')
+		return download.result(), None
+
 	async def _await_reconnect(self, gen: int) -> bool:
 		"""Wait out a voice outage. False once it is clear the session is gone."""
 		print(f'LOG > Voice outage in guild {self.guild_id}, waiting for reconnect')
@@ -645,10 +852,12 @@ class GuildPlayer:
 				if gen != self._play_gen:
 					return
 
+				# The chain ran out; whatever it switched to last is what ended.
+				self._settle_chain()
 				track = self.current
 				failed = error is not None or self._looks_failed()
+				self._drop_chain()
 				self.current = None
-				self.started_at = None
 				self.elapsed_offset = 0.0
 				self._cleanup_file()
 				self._ensure_driver(announce=True)
@@ -659,6 +868,133 @@ class GuildPlayer:
 		except Exception as error:
 			print(f' ERR > track end: {error}')
 
+	def _open_chain(self, source: discord.AudioSource) -> GaplessSource:
+		chain = GaplessSource(
+			source,
+			fade_frames=round(CROSSFADE_SECONDS / FRAME_SECONDS),
+			on_switch=lambda: self._after_switch(chain),
+		)
+		return chain
+
+	def _after_switch(self, chain: GaplessSource):
+		# On the voice thread, like _after.
+		coro = self._on_switch(chain)
+		try:
+			asyncio.run_coroutine_threadsafe(coro, self.loop)
+		except Exception as schedule_error:
+			coro.close()
+			print(f' ERR > Failed to schedule track switch: {schedule_error}')
+
+	async def _on_switch(self, chain: GaplessSource):
+		try:
+			async with self.lock:
+				if chain is not self._chain:
+					return
+				track = self._settle_chain()
+
+			if track is not None:
+				await self._notify(playing_embed(track))
+		except Exception as error:
+			print(f' ERR > track switch: {error}')
+
+	def _settle_chain(self) -> Track | None:
+		"""Catch up with a switch the voice thread made to the chained track, and return that track.
+
+		Anything that changes `current` or the head of the queue calls this first,
+		so it never acts on a track that has already given way. Caller must hold
+		self.lock.
+		"""
+		track = self._chain.take_switch() if self._chain is not None else None
+		if track is None:
+			return None
+
+		self._chained = None
+		self._cleanup_file()
+		self._dequeue(track)
+		self.current = track
+		# Finished: that is what let it be chained.
+		self._current_download = self._prefetch.take(track)
+		self.elapsed_offset = 0.0
+		print(f'LOG > Playing {track.title} (gapless) in guild {self.guild_id}')
+		self._schedule_prefetch()
+		self._start_preload()
+		return track
+
+	def _unchain(self):
+		"""Withdraw the chained track before the queue changes under it. Caller must hold self.lock."""
+		if self._chain is None:
+			return
+		self._settle_chain()
+		self._chain.unchain()
+		self._chained = None
+
+	def _drop_chain(self):
+		"""Let go of the chain; stopping playback cleans it up. Caller must hold self.lock."""
+		self._cancel_preload()
+		chain, self._chain = self._chain, None
+		self._chained = None
+		if chain is not None:
+			chain.unchain()
+
+	def _dequeue(self, track: Track):
+		# By identity: the same video can be queued twice.
+		for index, queued in enumerate(self.queue):
+			if queued is track:
+				del self.queue[index]
+				return
+
+	def _start_preload(self):
+		"""Caller must hold self.lock."""
+		self._cancel_preload()
+		if not GAPLESS or self._chain is None or self.current is None or self.current.duration is None:
+			return
+		self._preload_task = asyncio.create_task(self._preload(self.current))
+
+	def _cancel_preload(self):
+		task = self._preload_task
+		self._preload_task = None
+		if task is not None and task is not asyncio.current_task() and not task.done():
+			task.cancel()
+
+	async def _preload(self, track: Track):
+		"""Keep the head of the queue chained behind `track` through its last seconds."""
+		lead = PRELOAD_SECONDS + CROSSFADE_SECONDS
+		try:
+			while self.current is track:
+				# elapsed stands still while paused, so this just comes round again.
+				wait = track.duration - self.elapsed - lead
+				if wait > 0:
+					await asyncio.sleep(wait)
+					continue
+
+				async with self.lock:
+					if self.current is not track or self._chain is None:
+						return
+					self._chain_next()
+				await asyncio.sleep(PRELOAD_POLL)
+		except asyncio.CancelledError:
+			return
+
+	def _chain_next(self):
+		"""Chain the head of the queue if it is downloaded and not chained yet. Caller must hold self.lock."""
+		head = self.queue[0] if self.queue else None
+		if head is self._chained:
+			return
+
+		self._chain.unchain()
+		self._chained = head
+		path = self._prefetch.ready(head) if head is not None else None
+		if path is None:
+			self._chained = None
+			return
+
+		try:
+			source = _audio_source(path, None, 0, self._channel_bitrate(), pcm=CROSSFADE_SECONDS > 0)
+		except Exception as error:
+			print(f' ERR > Cannot open {head.title} ahead of time: {error}')
+			return
+		self._chain.chain(source, head)
+
 	def _looks_failed(self) -> bool:
 		track = self.current
 		if track is None:
@@ -683,10 +1019,38 @@ class GuildPlayer:
 		except Exception as error:
 			print(f' ERR > notify: {error}')
 
+	async def _download(self, track: Track, ticket: Ticket) -> Path:
+		# Unbounded here: _open_media bounds the wait when playback depends on it.
+		return await download_audio(
+			track.webpage_url,
+			self.guild_id,
+			ticket=ticket,
+			source=track.source,
+			bitrate=self._channel_bitrate(),
+		)
+
+	def _schedule_prefetch(self):
+		"""Look ahead in the queue, but only once something is actually playing.
+
+		Before that the driver is downloading the head of the queue itself, and a
+		prefetch would only compete with it for bandwidth. Caller must hold self.lock.
+		"""
+		if self._chain is None:
+			return
+		self._prefetch.schedule(self.queue)
+
+	def _requeue_download(self, track: Track):
+		"""Move the current download to the prefetcher so `track` restarts from it. Caller must hold self.lock."""
+		task = self._current_download
+		self._current_download = None
+		if task is not None:
+			self._prefetch.put(track, task)
+
 	def _cleanup_file(self):
-		path = self._current_file
-		self._current_file = None
-		_unlink(path)
+		task = self._current_download
+		self._current_download = None
+		if task is not None:
+			discard(task, release_audio)
 
 	def _start_idle(self):
 		self._cancel_idle()
@@ -702,6 +1066,11 @@ class GuildPlayer:
 		if task is not None and task is not asyncio.current_task() and not task.done():
 			task.cancel()
 
+	def _cancel_ingest(self):
+		for task in list(self._ingest_tasks):
+			if task is not asyncio.current_task():
+				task.cancel()
+
 	async def _idle_disconnect(self, gen: int):
 		try:
 			await asyncio.sleep(IDLE_TIMEOUT)
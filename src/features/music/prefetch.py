@@ -0,0 +1,138 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Iterable
+from pathlib import Path
+
+from src.features.music.executor import Lane, Ticket
+from src.features.music.track import Track
+
+
+# How many upcoming tracks to download while the current one plays.
+PREFETCH_AHEAD = 2
+# Look-ahead downloads a single guild may have in flight at once. The track that
+# is about to play never waits on this.
+PREFETCH_PARALLEL = 1
+
+
+class _Entry:
+	__slots__ = ('track', 'ticket', 'task', 'started')
+
+	def __init__(self, track: Track):
+		self.track = track
+		self.ticket = Ticket(Lane.PREFETCH)
+		self.task: asyncio.Task | None = None
+		self.started = False
+
+
+class Prefetcher:
+	"""Background downloads for the tracks at the head of one guild's queue.
+
+	Entries are keyed by track identity, not equality: two requests for the same
+	video are separate queue entries and each one owns the file it is handed.
+	Every path this produces goes to exactly one place, either the driver via
+	take() or the release callback.
+	"""
+
+	def __init__(
+		self,
+		download: Callable[[Track, Ticket], Awaitable[Path]],
+		release: Callable[[Path | None], None],
+	):
+		self._download = download
+		self._release = release
+		self._slots = asyncio.Semaphore(PREFETCH_PARALLEL)
+		self._entries: dict[int, _Entry] = {}
+
+	def __contains__(self, track: Track) -> bool:
+		return id(track) in self._entries
+
+	def schedule(self, upcoming: Iterable[Track]):
+		"""Download the next few tracks and drop anything no longer among them."""
+		wanted: list[Track] = []
+		for track in upcoming:
+			if len(wanted) >= PREFETCH_AHEAD:
+				break
+			wanted.append(track)
+
+		self.discard(keep=wanted)
+		for track in wanted:
+			if id(track) in self._entries:
+				continue
+			entry = _Entry(track)
+			entry.task = asyncio.create_task(self._prefetch(entry))
+			self._entries[id(track)] = entry
+
+	def take(self, track: Track) -> asyncio.Task:
+		"""Hand the download for `track` to the caller, starting it if needed.
+
+		The track is about to play, so a look-ahead still in flight is promoted to
+		the playback lane, one still waiting for a slot is restarted unthrottled,
+		and one that failed gets a fresh attempt.
+		"""
+		entry = self._entries.pop(id(track), None)
+		if entry is not None and entry.started and not _failed(entry.task):
+			entry.ticket.promote(Lane.PLAYBACK)
+			return entry.task
+
+		if entry is not None:
+			self._drop(entry)
+		return asyncio.create_task(self._download(track, Ticket(Lane.PLAYBACK)))
+
+	def ready(self, track: Track) -> Path | None:
+		"""The file downloaded for `track`, if it has finished; it stays here until take()."""
+		entry = self._entries.get(id(track))
+		if entry is None or entry.task is None or not entry.task.done() or _failed(entry.task):
+			return None
+		return entry.task.result()
+
+	def put(self, track: Track, task: asyncio.Task):
+		"""Hand back the download of a track that is going back on the queue.
+
+		Used when playback is interrupted rather than finished, so restarting the
+		track picks up the file it already had instead of fetching it again.
+		"""
+		previous = self._entries.pop(id(track), None)
+		if previous is not None:
+			self._drop(previous)
+
+		entry = _Entry(track)
+		# It already holds whatever lane it was downloading in.
+		entry.ticket = Ticket(Lane.PLAYBACK)
+		entry.task = task
+		entry.started = True
+		self._entries[id(track)] = entry
+
+	def discard(self, keep: Iterable[Track] = ()):
+		"""Cancel and release every prefetched track not in `keep`."""
+		kept = {id(track) for track in keep}
+		for key in [key for key in self._entries if key not in kept]:
+			self._drop(self._entries.pop(key))
+
+	async def _prefetch(self, entry: _Entry) -> Path:
+		async with self._slots:
+			entry.started = True
+			return await self._download(entry.track, entry.ticket)
+
+	def _drop(self, entry: _Entry):
+		if entry.task is not None:
+			discard(entry.task, self._release)
+
+
+def discard(task: asyncio.Task, release: Callable[[Path | None], None]):
+	"""Cancel a download task and release whatever it produced.
+
+	A download can finish in the same tick it is cancelled, so the release waits
+	until the task has actually settled.
+	"""
+	if not task.done():
+		task.cancel()
+	task.add_done_callback(lambda done: _release_result(done, release))
+
+
+def _failed(task: asyncio.Task) -> bool:
+	return task.done() and (task.cancelled() or task.exception() is not None)
+
+
+def _release_result(task: asyncio.Task, release: Callable[[Path | None], None]):
+	if task.cancelled() or task.exception() is not None:
+		return
+	release(task.result())
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 
 @dataclass(slots=True)
@@ -11,3 +11,6 @@ class Track:
 	query: str
 	thumbnail: str | None = None
 	uploader: str | None = None
+	# Compact yt-dlp info from when the track was resolved, so the download can
+	# fetch bytes straight away instead of resolving the video a second time.
+	source: dict | None = field(default=None, repr=False, compare=False)
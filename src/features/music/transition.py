@@ -0,0 +1,228 @@
+import threading
+from array import array
+from collections import deque
+from collections.abc import Callable
+from typing import Any
+
+import discord
+
+
+# py-cord asks for one 20 ms frame per read().
+FRAME_SECONDS = 0.02
+# While crossfading, how many frames the look-ahead may read per read() to fill
+# up. More than one so it catches up; few enough that a slow pipe never stalls a
+# packet by much.
+_FILL_READS = 2
+
+
+def _mix(outgoing: bytes, incoming: bytes, gain: float) -> bytes:
+	"""One frame of 16-bit PCM: `outgoing` faded down to 1 - `gain`, `incoming` up to `gain`.
+
+	A fade lasts many frames, so a step of gain from one frame to the next is
+	too small to hear. Both sides are scaled down, so the sum cannot clip.
+	"""
+	out = array('h', outgoing)
+	into = array('h', incoming)
+	if len(into) < len(out):
+		into.extend(bytes(len(out) - len(into)))
+	elif len(out) < len(into):
+		out.extend(bytes(len(into) - len(out)))
+
+	keep = 1.0 - gain
+	return array('h', [int(a * keep + b * gain) for a, b in zip(out, into)]).tobytes()
+
+
+def _cleanup_later(source: discord.AudioSource):
+	# ffmpeg's cleanup can wait on the process; the voice thread has the next
+	# packet to send.
+	threading.Thread(target=source.cleanup, name='music-source-cleanup', daemon=True).start()
+
+
+class GaplessSource(discord.AudioSource):
+	"""One voice_client.play() for a run of tracks.
+
+	The player queues the next track's source with chain() before the current one
+	ends. When the current source runs dry, read() carries straight on with the
+	next within the same 20 ms frame, so there is no gap while the player starts
+	over, and `on_switch` is called on the voice thread. The player collects the
+	switch with take_switch().
+
+	It also counts the frames of the current track handed to py-cord, which only
+	asks for one when it is about to send it. That makes it the player's clock.
+
+	Only the voice thread reads the sources, and never under the lock: a stalled
+	stream must not block the event loop's chain(), replace() or take_switch().
+	Those only leave their change under the lock for the next read() to act on.
+
+	With `fade_frames`, a PCM source is read that many frames ahead, so its end is
+	known while its last frames are still to be sent; those are mixed with the
+	start of the next PCM source. Opus sources cannot be mixed and switch without
+	a fade.
+	"""
+
+	def __init__(
+		self,
+		source: discord.AudioSource,
+		*,
+		fade_frames: int = 0,
+		on_switch: Callable[[], None] | None = None,
+	):
+		self._source = source
+		self._fade_frames = fade_frames
+		self._on_switch = on_switch
+		self._lock = threading.Lock()
+		self._next: discord.AudioSource | None = None
+		self._next_tag: Any = None
+		self._switched: Any = None
+		# Set by replace(), for read() to swap in.
+		self._replacement: discord.AudioSource | None = None
+		# Frames of the current source read ahead of playback, when crossfading.
+		self._ahead: deque[bytes] = deque()
+		self._ended = False
+		# The previous track's last frames, fading out under the current one.
+		self._fading: deque[bytes] = deque()
+		self._fade_length = 0
+		self._frames = 0
+
+	@property
+	def frames(self) -> int:
+		"""Frames of the current track read so far, any fade into it included."""
+		return self._frames
+
+	def chain(self, source: discord.AudioSource, tag: Any):
+		"""Play `source` straight after the current one. `tag` comes back from take_switch()."""
+		with self._lock:
+			previous, self._next = self._next, source
+			self._next_tag = tag
+		if previous is not None:
+			_cleanup_later(previous)
+
+	def unchain(self):
+		"""Withdraw whatever chain() queued, unless it is already playing."""
+		with self._lock:
+			previous, self._next = self._next, None
+			self._next_tag = None
+		if previous is not None:
+			_cleanup_later(previous)
+
+	def replace(self, source: discord.AudioSource) -> bool:
+		"""Carry on from `source` in place of the current track, at the next read.
+
+		Whatever is chained stays chained. False, and nothing replaced, if playback
+		has switched to the chained source since take_switch() last collected it:
+		the track meant to be replaced is over.
+		"""
+		with self._lock:
+			if self._switched is not None:
+				return False
+			previous, self._replacement = self._replacement, source
+			self._frames = 0
+		if previous is not None:
+			_cleanup_later(previous)
+		return True
+
+	def take_switch(self) -> Any:
+		"""The tag of the source playback moved on to, once; None if it has not."""
+		with self._lock:
+			tag, self._switched = self._switched, None
+			return tag
+
+	def read(self) -> bytes:
+		self._take_replacement()
+		switched = False
+		if not self._fading:
+			self._fill()
+			with self._lock:
+				if self._ended and self._replacement is None and self._next is not None and self._can_fade():
+					# The look-ahead holds the end of this track: fade it into the next.
+					self._fading, self._ahead = self._ahead, deque()
+					self._fade_length = len(self._fading)
+					self._switch()
+					switched = True
+
+		if self._fading:
+			# Counting this frame, so the last one is all next track.
+			done = self._fade_length - len(self._fading) + 1
+			frame = _mix(self._fading.popleft(), self._pull(), done / (self._fade_length + 1))
+		else:
+			frame = self._pull()
+			if not frame:
+				with self._lock:
+					replaced = self._replacement is not None
+					if not replaced and self._next is not None:
+						self._switch()
+						switched = True
+				if replaced:
+					# Replaced while it ran dry: carry on from the replacement.
+					self._take_replacement()
+				if replaced or switched:
+					frame = self._pull()
+
+		with self._lock:
+			# A frame of a track replaced meanwhile does not count towards its replacement.
+			if frame and self._replacement is None:
+				self._frames += 1
+
+		if switched and self._on_switch is not None:
+			self._on_switch()
+		return frame
+
+	def is_opus(self) -> bool:
+		# Anything read ahead or mixed is PCM, whatever comes next.
+		if self._fading or self._ahead:
+			return False
+		return self._source.is_opus()
+
+	def cleanup(self):
+		with self._lock:
+			sources = [self._source, self._next, self._replacement]
+			self._next = self._replacement = None
+		for source in sources:
+			if source is not None:
+				source.cleanup()
+
+	def _can_fade(self) -> bool:
+		"""Caller must hold self._lock."""
+		return bool(self._ahead) and not self._next.is_opus()
+
+	def _take_replacement(self):
+		with self._lock:
+			replacement, self._replacement = self._replacement, None
+		if replacement is None:
+			return
+		_cleanup_later(self._source)
+		self._source = replacement
+		self._ahead.clear()
+		self._fading.clear()
+		self._ended = False
+
+	def _switch(self):
+		"""Caller must hold self._lock."""
+		_cleanup_later(self._source)
+		self._source, self._next = self._next, None
+		self._switched, self._next_tag = self._next_tag, None
+		self._ended = False
+		self._frames = 0
+
+	def _reads_ahead(self) -> bool:
+		return bool(self._fade_frames) and not self._source.is_opus()
+
+	def _fill(self):
+		"""Read the current source up to `fade_frames` ahead of playback, if it can be mixed."""
+		if not self._reads_ahead():
+			return
+		reads = 0
+		while not self._ended and len(self._ahead) <= self._fade_frames and reads < _FILL_READS:
+			frame = self._source.read()
+			reads += 1
+			if not frame:
+				self._ended = True
+				break
+			self._ahead.append(frame)
+
+	def _pull(self) -> bytes:
+		"""The current source's next frame."""
+		if not self._reads_ahead():
+			return self._source.read()
+		self._fill()
+		return self._ahead.popleft() if self._ahead else b''
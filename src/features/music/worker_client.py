@@ -0,0 +1,144 @@
+import asyncio
+import uuid
+from collections import Counter
+from pathlib import Path
+
+import aiohttp
+
+from src.features.music.executor import Ticket
+
+
+# How long the worker service gets to accept a connection before the job runs
+# in this process instead.
+SERVICE_CONNECT_TIMEOUT = 5.0
+# A lookup or stream resolve the service has not answered by then has failed.
+# Downloads take as long as they take.
+SERVICE_LOOKUP_TIMEOUT = 90.0
+
+
+class ServiceUnavailable(Exception):
+	"""The worker service could not be reached, or went away mid-job."""
+
+
+class ServiceError(Exception):
+	"""The worker service ran the job, and it failed."""
+
+	def __init__(self, payload: dict):
+		super().__init__(payload.get('error') or 'Music worker service failed')
+		self.kind = payload.get('kind')
+		self.video_id = payload.get('video_id')
+
+
+class WorkerClient:
+	"""The bot's side of the music worker service (see worker_service).
+
+	`url` is `http://host:port`, or `unix:/path/to/socket`. Paths the service
+	returns are in its audio cache, so it must share a filesystem with the bot.
+	`token` is sent with every call, for a service started with one.
+	"""
+
+	def __init__(self, url: str, token: str | None = None):
+		if url.startswith('unix:'):
+			self._socket = '/' + url.removeprefix('unix:').lstrip('/')
+			self._base = 'http://music-worker'
+		else:
+			self._socket = None
+			self._base = url.rstrip('/')
+		self._headers = {'Authorization': f'Bearer {token}'} if token else {}
+		self._session: aiohttp.ClientSession | None = None
+		# References the bot holds to files in the service's cache.
+		self._paths: Counter[Path] = Counter()
+		self._tasks: set[asyncio.Task] = set()
+
+	async def extract(self, query: str, guild_id: int | None, bitrate: int | None) -> tuple[dict, dict | None]:
+		"""Track fields and the stored extraction result for `query`, as extract_track() builds them."""
+		body = await self._post('extract', {
+			'query': query,
+			'guild_id': guild_id,
+			'bitrate': bitrate,
+		}, timeout=SERVICE_LOOKUP_TIMEOUT)
+		return body['fields'], body['source']
+
+	async def download(
+		self,
+		webpage_url: str,
+		guild_id: int,
+		ticket: Ticket,
+		source: dict | None,
+		bitrate: int | None,
+	) -> Path:
+		job = uuid.uuid4().hex
+		# A look-ahead that becomes the next track jumps the service's queue too.
+		ticket.on_promote(lambda: self._spawn(self._post('promote', {'job': job, 'lane': ticket.lane.name})))
+		try:
+			body = await self._post('download', {
+				'job': job,
+				'webpage_url': webpage_url,
+				'guild_id': guild_id,
+				'lane': ticket.lane.name,
+				'source': source,
+				'bitrate': bitrate,
+			}, timeout=None)
+		finally:
+			ticket.on_promote(lambda: None)
+		path = Path(body['path'])
+		self._paths[path] += 1
+		return path
+
+	async def stream(self, webpage_url: str, guild_id: int | None, bitrate: int | None) -> dict:
+		"""AudioStream fields for `webpage_url`, freshly resolved."""
+		return await self._post('stream', {
+			'webpage_url': webpage_url,
+			'guild_id': guild_id,
+			'bitrate': bitrate,
+		}, timeout=SERVICE_LOOKUP_TIMEOUT)
+
+	def owns(self, path: Path) -> bool:
+		return self._paths[path] > 0
+
+	def release(self, path: Path):
+		"""Hand a downloaded path back to the service. Returns at once."""
+		self._paths[path] -= 1
+		if self._paths[path] <= 0:
+			del self._paths[path]
+		self._spawn(self._post('release', {'path': str(path)}))
+
+	def close(self):
+		session, self._session = self._session, None
+		if session is not None and not session.closed:
+			self._spawn(session.close())
+
+	def _spawn(self, coro):
+		try:
+			task = asyncio.get_running_loop().create_task(coro)
+		except RuntimeError:
+			coro.close()
+			return
+		self._tasks.add(task)
+		task.add_done_callback(self._settle)
+
+	def _settle(self, task: asyncio.Task):
+		self._tasks.discard(task)
+		if not task.cancelled() and task.exception() is not None:
+			print(f' ERR > Music worker service call failed: {task.exception()}')
+
+	async def _post(self, endpoint: str, payload: dict, *, timeout: float | None = None) -> dict:
+		if self._session is None or self._session.closed:
+			connector = aiohttp.UnixConnector(path=self._socket) if self._socket else None
+			self._session = aiohttp.ClientSession(connector=connector, headers=self._headers)
+
+		try:
+			async with self._session.post(
+				f'{self._base}/{endpoint}',
+				json=payload,
+				timeout=aiohttp.ClientTimeout(total=timeout, sock_connect=SERVICE_CONNECT_TIMEOUT),
+			) as response:
+				if response.content_type != 'application/json':
+					raise ServiceError({'error': f'Music worker service answered HTTP {response.status}'})
+				body = await response.json()
+		except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as error:
+			raise ServiceUnavailable(str(error) or type(error).__name__) from error
+
+		if response.status >= 400:
+			raise ServiceError(body)
+		return body
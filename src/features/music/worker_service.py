@@ -0,0 +1,180 @@
+"""The music extractor as a service of its own, for the bot to reach with MUSIC_WORKER_URL.
+
+	python -m src.features.music.worker_service --socket /run/guapish/music.sock
+	python -m src.features.music.worker_service --host 127.0.0.1 --port 8750
+
+yt-dlp crashing or leaking in here never takes the Discord connection down, and
+downloads can run on another machine as long as it shares the audio cache
+directory with the bot. It reads the same MUSIC_* settings as the bot. Listening
+on anything but loopback takes MUSIC_WORKER_TOKEN, which the bot must send too.
+"""
+import argparse
+import asyncio
+import hmac
+import ipaddress
+from collections import Counter
+from dataclasses import asdict
+from pathlib import Path
+
+from aiohttp import web
+
+from src.core.config import AppConfig
+from src.features.music import extractor
+from src.features.music.executor import Lane, Ticket
+from src.features.music.extractor import TrackExtractError, TrackRejected
+
+
+def _failure(error: Exception) -> web.Response:
+	if isinstance(error, TrackRejected):
+		return web.json_response({'error': str(error), 'kind': 'rejected', 'video_id': error.video_id}, status=422)
+	if isinstance(error, TrackExtractError):
+		return web.json_response({'error': str(error), 'kind': 'refused'}, status=422)
+	print(f' ERR > Music worker job failed: {error}')
+	return web.json_response({'error': str(error) or type(error).__name__, 'kind': 'failed'}, status=500)
+
+
+def _is_loopback(host: str) -> bool:
+	if host == 'localhost':
+		return True
+	try:
+		return ipaddress.ip_address(host).is_loopback
+	except ValueError:
+		return False
+
+
+def create_app(token: str | None = None) -> web.Application:
+	"""The service's routes. With `token`, every request must carry it as a bearer token."""
+	# Downloads still running, by the job id the bot sent, so it can promote them.
+	tickets: dict[str, Ticket] = {}
+	# Files handed out that the cache does not own, such as downloads of a URL
+	# with no video id. Releasing the last reference deletes them; nothing else a
+	# client names is ever deleted.
+	loose: Counter[Path] = Counter()
+
+	@web.middleware
+	async def authenticate(request: web.Request, handler):
+		expected = f'Bearer {token}'
+		if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), expected.encode()):
+			return web.json_response({'error': 'Unauthorized', 'kind': 'failed'}, status=401)
+		return await handler(request)
+
+	async def extract(request: web.Request) -> web.Response:
+		body = await request.json()
+		try:
+			fields, source = await extractor._lookup(body['query'], body.get('guild_id'), body.get('bitrate'))
+		except Exception as error:
+			return _failure(error)
+		return web.json_response({'fields': fields, 'source': source})
+
+	async def download(request: web.Request) -> web.Response:
+		body = await request.json()
+		ticket = Ticket(Lane[body.get('lane', 'PLAYBACK')])
+		job = body.get('job')
+		if job:
+			tickets[job] = ticket
+		try:
+			path = await extractor._download_here(
+				body['webpage_url'], body['guild_id'], ticket, body.get('source'), body.get('bitrate'),
+			)
+		except Exception as error:
+			return _failure(error)
+		finally:
+			tickets.pop(job, None)
+		if not extractor.AUDIO_CACHE.owns(path):
+			loose[path] += 1
+		return web.json_response({'path': str(path)})
+
+	async def stream(request: web.Request) -> web.Response:
+		body = await request.json()
+		try:
+			audio = await extractor._resolve_here(body['webpage_url'], body.get('guild_id'), body.get('bitrate'))
+		except Exception as error:
+			return _failure(error)
+		return web.json_response({
+			'url': audio.url, 'headers': audio.headers, 'codec': audio.codec, 'source': audio.source,
+		})
+
+	async def release(request: web.Request) -> web.Response:
+		body = await request.json()
+		path = Path(body['path'])
+		if extractor.AUDIO_CACHE.release(path) or path not in loose:
+			return web.json_response({})
+		loose[path] -= 1
+		if loose[path] <= 0:
+			del loose[path]
+			extractor._release_here(path)
+		return web.json_response({})
+
+	async def promote(request: web.Request) -> web.Response:
+		body = await request.json()
+		ticket = tickets.get(body['job'])
+		if ticket is not None:
+			ticket.promote(Lane[body['lane']])
+		return web.json_response({})
+
+	async def health(request: web.Request) -> web.Response:
+		return web.json_response({
+			'pending': extractor.EXECUTOR.pending(),
+			'governor': asdict(extractor.GOVERNOR.budget()),
+		})
+
+	app = web.Application(middlewares=[authenticate] if token else [])
+	app.add_routes([
+		web.post('/extract', extract),
+		web.post('/download', download),
+		web.post('/stream', stream),
+		web.post('/release', release),
+		web.post('/promote', promote),
+		web.get('/health', health),
+	])
+	return app
+
+
+async def serve(
+	*,
+	socket: str | None = None,
+	host: str = '127.0.0.1',
+	port: int = 8750,
+	token: str | None = None,
+) -> web.AppRunner:
+	"""Start the service and return its runner; cleanup() stops it.
+
+	Raises ValueError for a TCP address off loopback without a `token`: anyone who
+	can reach it could otherwise make it download whatever they like.
+	"""
+	if not socket and not token and not _is_loopback(host):
+		raise ValueError(f'Set MUSIC_WORKER_TOKEN to listen on {host}; only loopback may go without one')
+	# A bot that gives up on a download (a skip) disconnects, which cancels the
+	# handler and with it the download.
+	runner = web.AppRunner(create_app(token), handler_cancellation=True)
+	await runner.setup()
+	site = web.UnixSite(runner, socket) if socket else web.TCPSite(runner, host, port)
+	await site.start()
+	print(f'LOG > Music worker service listening on {socket or f"{host}:{port}"}')
+	return runner
+
+
+async def _main(args: argparse.Namespace):
+	config = AppConfig()
+	extractor.configure_cache(config.music_cache_mb * 1024 * 1024)
+	extractor.configure_workers(config.music_worker_processes)
+	extractor.load_cache()
+	runner = await serve(socket=args.socket, host=args.host, port=args.port, token=config.music_worker_token)
+	if config.music_warmup:
+		await extractor.warm_up()
+	try:
+		await asyncio.Event().wait()
+	finally:
+		await runner.cleanup()
+		extractor.unload()
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Run the music extractor as a service.')
+	parser.add_argument('--socket', help='listen on this UNIX socket instead of TCP')
+	parser.add_argument('--host', default='127.0.0.1')
+	parser.add_argument('--port', type=int, default=8750)
+	try:
+		asyncio.run(_main(parser.parse_args()))
+	except KeyboardInterrupt:
+		print('LOG > CTRL+C detected, exiting...')
@@ -0,0 +1,91 @@
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import yt_dlp
+
+
+# A handle is rebuilt after this many jobs so cookies, caches and any state
+# yt-dlp accumulates per instance cannot grow without bound.
+YDL_MAX_USES = 50
+
+
+class _Handle:
+	__slots__ = ('ydl', 'uses')
+
+	def __init__(self, ydl: yt_dlp.YoutubeDL):
+		self.ydl = ydl
+		self.uses = 0
+
+
+class YdlPool:
+	"""Warm YoutubeDL instances, one per worker thread.
+
+	Building a YoutubeDL sets up the extractor registry, the curl_cffi
+	impersonation session and the cookie jar; reusing one keeps its HTTP
+	connections alive between calls. YoutubeDL is not thread-safe, so a handle is
+	only ever used by the thread that created it. An exception retires the
+	handle, since it may have been left mid-request, unless it is one of
+	`clean_errors`: raised between requests, or by an aborted download that
+	yt-dlp has already wound down.
+	"""
+
+	def __init__(
+		self,
+		opts: dict,
+		*,
+		max_uses: int = YDL_MAX_USES,
+		clean_errors: tuple[type[BaseException], ...] = (),
+	):
+		self.opts = opts
+		self.max_uses = max_uses
+		self.clean_errors = (yt_dlp.utils.DownloadCancelled, *clean_errors)
+		self._local = threading.local()
+		self._handles: set[_Handle] = set()
+		self._lock = threading.Lock()
+
+	@contextmanager
+	def checkout(self) -> Iterator[yt_dlp.YoutubeDL]:
+		handle = getattr(self._local, 'handle', None)
+		if handle is None:
+			handle = _Handle(yt_dlp.YoutubeDL(dict(self.opts)))
+			self._local.handle = handle
+			with self._lock:
+				self._handles.add(handle)
+
+		try:
+			yield handle.ydl
+		except self.clean_errors:
+			self._used(handle)
+			raise
+		except BaseException:
+			self._retire(handle)
+			raise
+		self._used(handle)
+
+	def close(self):
+		"""Close every handle. Threads build fresh ones on their next checkout."""
+		with self._lock:
+			handles, self._handles = self._handles, set()
+		for handle in handles:
+			_close(handle)
+		self._local = threading.local()
+
+	def _used(self, handle: _Handle):
+		handle.uses += 1
+		if handle.uses >= self.max_uses:
+			self._retire(handle)
+
+	def _retire(self, handle: _Handle):
+		if getattr(self._local, 'handle', None) is handle:
+			self._local.handle = None
+		with self._lock:
+			self._handles.discard(handle)
+		_close(handle)
+
+
+def _close(handle: _Handle):
+	try:
+		handle.ydl.close()
+	except Exception as error:
+		print(f' ERR > Failed to close YoutubeDL: {error}')
@@ -44,10 +44,40 @@ import discord  # noqa: E402
 from src.features.music.track import Track  # noqa: E402
 
 
+class StubAudioSource:
+	"""Never read: the fake voice clients do not play anything."""
+
+	def cleanup(self):
+		pass
+
+
 @pytest.fixture(autouse=True)
 def fake_audio_source(monkeypatch):
 	"""FFmpegOpusAudio would try to spawn ffmpeg against a fake file."""
-	monkeypatch.setattr(discord, 'FFmpegOpusAudio', lambda *a, **k: object())
+	monkeypatch.setattr(discord, 'FFmpegOpusAudio', lambda *a, **k: StubAudioSource())
+
+
+@pytest.fixture(autouse=True)
+def isolated_metadata_cache(monkeypatch, tmp_path):
+	"""Never read or write the real on-disk metadata cache."""
+	from src.features.music import extractor
+	from src.features.music.metadata_store import MetadataStore
+
+	store = MetadataStore(tmp_path / 'state' / 'metadata.sqlite3')
+	monkeypatch.setattr(extractor, 'METADATA_CACHE', store)
+	yield store
+	store.close()
+
+
+@pytest.fixture(autouse=True)
+def isolated_governor(monkeypatch):
+	"""A fresh, unhurried governor per test: pacing is tested on its own, not in every download."""
+	from src.features.music import extractor
+	from src.features.music.governor import Governor
+
+	governor = Governor(rate=1000, burst=1000)
+	monkeypatch.setattr(extractor, 'GOVERNOR', governor)
+	return governor
 
 
 @pytest.fixture
@@ -161,17 +191,30 @@ def make_player(monkeypatch, audio_file):
 	"""Build a GuildPlayer wired to a fake voice client and fake downloader."""
 	from src.features.music import player as player_module
 
-	def _make(*, download_delay: float = 0.0, fail_on=(), connected: bool = True):
+	def _make(
+		*,
+		download_delay: float = 0.0,
+		fail_on=(),
+		connected: bool = True,
+		stream_delay: float | None = None,
+	):
+		"""stream_delay enables streaming starts, resolving a stream after that long."""
 		import asyncio
 
-		async def fake_download(webpage_url, guild_id):
+		async def fake_download(webpage_url, guild_id, ticket=None, source=None, bitrate=None):
 			if any(marker in webpage_url for marker in fail_on):
 				raise RuntimeError(f'download failed: {webpage_url}')
 			if download_delay:
 				await asyncio.sleep(download_delay)
 			return audio_file
 
+		async def fake_resolve_stream(webpage_url, guild_id=None, source=None, bitrate=None):
+			await asyncio.sleep(stream_delay)
+			return player_module.AudioStream(url=f'https://media.example/{webpage_url.rsplit("/", 1)[-1]}')
+
 		monkeypatch.setattr(player_module, 'download_audio', fake_download)
+		monkeypatch.setattr(player_module, 'resolve_stream', fake_resolve_stream)
+		monkeypatch.setattr(player_module, 'STREAM_MODE', stream_delay is not None)
 
 		player = player_module.GuildPlayer(bot=None, guild_id=1)
 		player.voice_client = ThreadedVoiceClient()
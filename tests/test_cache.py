@@ -0,0 +1,128 @@
+"""The shared audio cache: content addressing, LRU eviction, reference counts."""
+import os
+
+import pytest
+
+from src.features.music.cache import AudioCache, cache_key
+
+
+def staged(tmp_path, name: str, size: int = 10):
+	path = tmp_path / name
+	path.write_bytes(b'\x00' * size)
+	return path
+
+
+@pytest.fixture
+def cache(tmp_path):
+	return AudioCache(tmp_path / 'cache', max_bytes=25)
+
+
+def test_add_moves_the_download_to_its_video_id(cache, tmp_path):
+	path = cache.add('aaaaaaaaaaa', staged(tmp_path, '1-tok-aaaaaaaaaaa.webm'))
+
+	assert path == cache.root / 'aaaaaaaaaaa.webm'
+	assert path.exists()
+	assert not (tmp_path / '1-tok-aaaaaaaaaaa.webm').exists()
+
+
+def test_same_video_is_shared_not_downloaded_twice(cache, tmp_path):
+	first = cache.add('aaaaaaaaaaa', staged(tmp_path, 'one.webm'))
+	second = cache.add('aaaaaaaaaaa', staged(tmp_path, 'two.webm'))
+
+	assert first == second
+	assert not (tmp_path / 'two.webm').exists()
+	assert cache.acquire('aaaaaaaaaaa') == first
+
+
+def test_least_recently_used_file_is_evicted_over_budget(cache, tmp_path):
+	a = cache.add('aaaaaaaaaaa', staged(tmp_path, 'a.webm'))
+	b = cache.add('bbbbbbbbbbb', staged(tmp_path, 'b.webm'))
+	cache.release(a)
+	cache.release(b)
+	cache.release(cache.acquire('aaaaaaaaaaa'))     # a is now the most recent
+
+	c = cache.add('ccccccccccc', staged(tmp_path, 'c.webm'))
+
+	assert a.exists() and c.exists()
+	assert not b.exists()
+	assert cache.acquire('bbbbbbbbbbb') is None
+	assert cache.size == 20
+
+
+def test_files_in_use_are_never_evicted(cache, tmp_path):
+	a = cache.add('aaaaaaaaaaa', staged(tmp_path, 'a.webm'))
+	b = cache.add('bbbbbbbbbbb', staged(tmp_path, 'b.webm'))
+	c = cache.add('ccccccccccc', staged(tmp_path, 'c.webm'))
+
+	assert a.exists() and b.exists() and c.exists()
+
+	cache.release(b)
+	assert not b.exists()
+	assert a.exists()
+
+
+def test_shared_file_survives_until_its_last_reference_is_released(cache, tmp_path):
+	cache.max_bytes = 0
+	path = cache.add('aaaaaaaaaaa', staged(tmp_path, 'a.webm'))
+	assert cache.acquire('aaaaaaaaaaa') == path
+
+	cache.release(path)
+	assert path.exists()
+	cache.release(path)
+	assert not path.exists()
+
+
+def test_release_of_a_foreign_path_is_refused(cache, tmp_path):
+	assert cache.release(tmp_path / 'elsewhere.webm') is False
+
+
+def test_rebuild_keeps_finished_files_and_drops_partials(cache, tmp_path):
+	cache.root.mkdir()
+	old = staged(cache.root, 'aaaaaaaaaaa.webm')
+	new = staged(cache.root, 'bbbbbbbbbbb.m4a')
+	os.utime(old, (1, 1))
+	capped = staged(cache.root, 'bbbbbbbbbbb.64k.webm', size=1)
+	staged(cache.root, 'ccccccccccc.webm.part')
+	staged(cache.root, '7-deadbeef-ddddddddddd.webm')
+	(cache.root / 'nested').mkdir()
+
+	cache.rebuild()
+
+	assert sorted(p.name for p in cache.root.iterdir()) == [
+		'aaaaaaaaaaa.webm', 'bbbbbbbbbbb.64k.webm', 'bbbbbbbbbbb.m4a', 'nested',
+	]
+	assert cache.acquire('bbbbbbbbbbb') == new
+	assert cache.acquire(cache_key('bbbbbbbbbbb', 64)) == capped
+	cache.release(new)
+	cache.release(capped)
+
+	# Oldest mtime goes first once the budget is exceeded.
+	cache.add('eeeeeeeeeee', staged(tmp_path, 'e.webm'))
+	assert not old.exists()
+	assert new.exists()
+
+
+def test_rebuild_enforces_the_budget(cache):
+	cache.root.mkdir()
+	for name in ('aaaaaaaaaaa', 'bbbbbbbbbbb', 'ccccccccccc'):
+		staged(cache.root, f'{name}.webm')
+
+	cache.rebuild()
+
+	assert len(cache) == 2
+	assert cache.size == 20
+
+
+def test_rebuild_is_safe_when_directory_is_absent(tmp_path):
+	cache = AudioCache(tmp_path / 'does-not-exist')
+	cache.rebuild()
+	assert len(cache) == 0
+
+
+def test_acquire_forgets_files_deleted_behind_its_back(cache, tmp_path):
+	path = cache.add('aaaaaaaaaaa', staged(tmp_path, 'a.webm'))
+	cache.release(path)
+	path.unlink()
+
+	assert cache.acquire('aaaaaaaaaaa') is None
+	assert cache.size == 0
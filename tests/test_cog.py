@@ -19,6 +19,7 @@ class FakeContext:
 	def __init__(self, user_id: int = 1, channel_id: int = 9):
 		self.sent = []
 		self.ephemeral = []
+		self.embeds = []
 		self.guild = types.SimpleNamespace(id=1)
 		self.channel = None
 		self.author = types.SimpleNamespace(
@@ -32,7 +33,10 @@ class FakeContext:
 	async def defer(self, *a, **k):
 		pass
 
-	async def respond(self, message, **kwargs):
+	async def respond(self, message=None, **kwargs):
+		if message is None:
+			self.embeds.append(kwargs.get('embed'))
+			return
 		self.sent.append(message)
 		if kwargs.get('ephemeral'):
 			self.ephemeral.append(message)
@@ -78,7 +82,7 @@ async def test_per_user_cap_does_not_block_other_users(cog_with_player, make_tra
 
 	reached = {}
 
-	async def fake_extract(query, requester_id, requester_name):
+	async def fake_extract(query, requester_id, requester_name, guild_id=None, bitrate=None):
 		reached['yes'] = True
 		raise music_cog.TrackExtractError('stubbed')
 
@@ -215,6 +219,86 @@ async def test_bot_leaving_does_not_tear_down_immediately(make_player, make_trac
 	player._cancel_confirm()
 
 
+def fake_playlist(monkeypatch, make_track, count: int, delay: float = 0.0):
+	"""Stand in for extract_playlist; the returned dict records how it ended."""
+	import asyncio
+	state = {'listed': 0, 'closed': False}
+
+	async def listing(url, requester_id, requester_name, guild_id=None):
+		try:
+			for i in range(count):
+				if delay:
+					await asyncio.sleep(delay)
+				state['listed'] += 1
+				yield make_track(f'p{i}', requester_id=requester_id)
+		finally:
+			state['closed'] = True
+
+	monkeypatch.setattr(music_cog, 'extract_playlist', listing)
+	return state
+
+
+@pytest.fixture
+async def playlist_cog(make_player):
+	cog = make_cog()
+	player = make_player()
+	cog.players[1] = player
+	ctx = FakeContext(user_id=1)
+	channel = player.voice_client.channel
+	channel.members = [types.SimpleNamespace(bot=False)]
+	ctx.author.voice.channel = channel
+	yield cog, player, ctx
+	await player.stop()
+
+
+PLAYLIST_URL = 'https://www.youtube.com/playlist?list=PL123'
+
+
+async def test_playlist_is_queued_as_it_is_listed_within_the_user_cap(playlist_cog, make_track, monkeypatch):
+	import asyncio
+	cog, player, ctx = playlist_cog
+	state = fake_playlist(monkeypatch, make_track, count=music_cog.MAX_TRACKS_PER_USER + 5)
+
+	await music_cog.MusicCog.play.callback(cog, ctx, PLAYLIST_URL)
+	await asyncio.sleep(0.05)
+
+	assert player.current.title == 'p0'
+	assert len(player.queue) == music_cog.MAX_TRACKS_PER_USER
+	assert state['closed']
+	assert ctx.embeds[0].author.name == 'Now Playing'
+	summary = ctx.embeds[-1]
+	assert summary.author.name == 'Playlist Queued'
+	assert f'**{music_cog.MAX_TRACKS_PER_USER + 1}**' in summary.description
+	assert 'already have' in summary.fields[0].value
+
+
+async def test_clear_stops_a_playlist_that_is_still_being_listed(playlist_cog, make_track, monkeypatch):
+	import asyncio
+	cog, player, ctx = playlist_cog
+	state = fake_playlist(monkeypatch, make_track, count=music_cog.MAX_TRACKS_PER_USER, delay=0.02)
+
+	await music_cog.MusicCog.play.callback(cog, ctx, PLAYLIST_URL)
+	await asyncio.sleep(0.05)
+	player.clear()
+	await asyncio.sleep(0.01)
+	listed = state['listed']
+	await asyncio.sleep(0.1)
+
+	assert state['closed']
+	assert state['listed'] == listed < music_cog.MAX_TRACKS_PER_USER
+	assert not player.queue
+
+
+async def test_empty_playlist_is_reported(playlist_cog, make_track, monkeypatch):
+	cog, player, ctx = playlist_cog
+	fake_playlist(monkeypatch, make_track, count=0)
+
+	await music_cog.MusicCog.play.callback(cog, ctx, PLAYLIST_URL)
+
+	assert any('no playable tracks' in m for m in ctx.sent)
+	assert player.current is None
+
+
 class ErrorContext:
 	def __init__(self, already_responded: bool, followup_fails: bool = False):
 		self.command = 'testcmd'
@@ -264,3 +348,54 @@ async def test_error_handler_swallows_secondary_failure():
 	ctx = ErrorContext(already_responded=True, followup_fails=True)
 
 	await core.on_application_command_error(ctx, ValueError('boom'))
+
+
+@pytest.mark.parametrize('enabled', [True, False])
+async def test_ready_warms_yt_dlp_up_once(monkeypatch, enabled):
+	import asyncio
+	warmups = []
+
+	async def fake_warm_up():
+		warmups.append(True)
+		return True
+
+	monkeypatch.setattr(music_cog, 'warm_up', fake_warm_up)
+	cog = make_cog()
+	cog.bot.app_config = types.SimpleNamespace(music_warmup=enabled, music_worker_url=None)
+	cog._warmup = None
+
+	await cog.on_ready()
+	await cog.on_ready()
+	await asyncio.sleep(0)
+
+	assert warmups == ([True] if enabled else [])
+
+
+async def test_forward_seeks_from_the_current_position(make_player, make_track, monkeypatch):
+	cog = make_cog()
+	player = make_player()
+	cog.players[1] = player
+	ctx = FakeContext()
+	player.current = make_track('song')
+	player.elapsed_offset = 40
+	seeks = []
+
+	async def seek(position):
+		seeks.append(position)
+		return position, None
+
+	monkeypatch.setattr(player, 'seek', seek)
+	await music_cog.MusicCog.forward.callback(cog, ctx, 15)
+
+	assert seeks == [55]
+	assert ctx.embeds[0].author.name == 'Seeked'
+
+
+async def test_seek_rejects_something_that_is_not_a_time(make_player):
+	cog = make_cog()
+	cog.players[1] = make_player()
+	ctx = FakeContext()
+
+	await music_cog.MusicCog.seek.callback(cog, ctx, 'the chorus')
+
+	assert ctx.ephemeral == ['Give a time like 90, 1:30 or 1:02:03.']
@@ -46,3 +46,18 @@ def test_env_list_of_empty_value_is_empty():
 	config.dev_mode = True
 	config.env = lambda key, default=None: ''
 	assert config.env_list('ANYTHING') == []
+
+
+def test_env_int_parses_and_defaults():
+	config = AppConfig.__new__(AppConfig)
+	config.env = lambda key, default=None: ' 512 '
+	assert config.env_int('ANYTHING', 7) == 512
+	config.env = lambda key, default=None: None
+	assert config.env_int('ANYTHING', 7) == 7
+
+
+def test_env_int_rejects_garbage():
+	config = AppConfig.__new__(AppConfig)
+	config.env = lambda key, default=None: '2GB'
+	with pytest.raises(ValueError):
+		config.env_int('MUSIC_CACHE_MB', 7)
@@ -9,6 +9,7 @@ from src.features.music.helpers import (
 	cleared_embed,
 	format_progress,
 	now_playing_embed,
+	parse_timestamp,
 	playing_embed,
 	queued_embed,
 	render_queue_page,
@@ -70,6 +71,14 @@ def test_progress_bar_is_empty_at_start_and_full_at_end():
 	assert '▱' not in format_progress(100, 100).split('\n')[0]
 
 
+def test_timestamps_parse_as_seconds_or_clock_times():
+	assert [parse_timestamp(text) for text in ('90', '1:30', ' 1:02:03 ', '0:05')] == [90, 90, 3723, 5]
+
+
+def test_malformed_timestamps_are_rejected():
+	assert [parse_timestamp(text) for text in ('', 'soon', '1:75', '-5', '1:2:3:4', '1.5')] == [None] * 6
+
+
 def test_skip_card_variants():
 	skipped = make_track('Old')
 	nxt = make_track('New', thumbnail='https://example.com/new.jpg')
@@ -0,0 +1,144 @@
+"""The yt-dlp executor: lane priority, per-guild fairness, queue-depth limits."""
+import asyncio
+import threading
+
+import pytest
+
+from src.features.music.executor import ExecutorBusy, Lane, PriorityExecutor, Ticket
+
+
+@pytest.fixture
+def executor():
+	executor = PriorityExecutor(workers=1, max_prefetch_workers=1, max_pending_per_guild=3)
+	yield executor
+	executor.shutdown()
+
+
+def block(executor: PriorityExecutor) -> threading.Event:
+	"""Occupy the executor's only worker until the returned event is set."""
+	release = threading.Event()
+	started = threading.Event()
+
+	def hold():
+		started.set()
+		release.wait(5)
+
+	executor.submit(hold, ticket=Ticket(Lane.PLAYBACK), guild_id=0)
+	assert started.wait(5)
+	return release
+
+
+def run_all(futures, timeout: float = 5):
+	for future in futures:
+		future.result(timeout)
+
+
+def test_lanes_run_in_priority_order(executor):
+	order = []
+	release = block(executor)
+	futures = [
+		executor.submit(order.append, 'prefetch', ticket=Ticket(Lane.PREFETCH), guild_id=1),
+		executor.submit(order.append, 'search', ticket=Ticket(Lane.INTERACTIVE), guild_id=1),
+		executor.submit(order.append, 'playback', ticket=Ticket(Lane.PLAYBACK), guild_id=1),
+	]
+	release.set()
+	run_all(futures)
+
+	assert order == ['playback', 'search', 'prefetch']
+
+
+def test_a_busy_guild_cannot_starve_another(executor):
+	executor.max_pending_per_guild = 10
+	order = []
+	release = block(executor)
+	futures = [
+		executor.submit(order.append, f'a{i}', ticket=Ticket(Lane.INTERACTIVE), guild_id=1)
+		for i in range(4)
+	]
+	futures.append(executor.submit(order.append, 'b0', ticket=Ticket(Lane.INTERACTIVE), guild_id=2))
+	release.set()
+	run_all(futures)
+
+	assert order.index('b0') <= 1, order
+
+
+def test_queue_depth_is_limited_per_guild_outside_playback(executor):
+	release = block(executor)
+	for _ in range(3):
+		executor.submit(lambda: None, ticket=Ticket(Lane.PREFETCH), guild_id=1)
+
+	with pytest.raises(ExecutorBusy):
+		executor.submit(lambda: None, ticket=Ticket(Lane.INTERACTIVE), guild_id=1)
+	# Other guilds and the track about to play are never refused.
+	executor.submit(lambda: None, ticket=Ticket(Lane.INTERACTIVE), guild_id=2)
+	executor.submit(lambda: None, ticket=Ticket(Lane.PLAYBACK), guild_id=1)
+	release.set()
+
+
+def test_promoted_job_overtakes_waiting_searches(executor):
+	order = []
+	release = block(executor)
+	ticket = Ticket(Lane.PREFETCH)
+	futures = [
+		executor.submit(order.append, 'search', ticket=Ticket(Lane.INTERACTIVE), guild_id=2),
+		executor.submit(order.append, 'prefetch', ticket=ticket, guild_id=1),
+	]
+	ticket.promote(Lane.PLAYBACK)
+	release.set()
+	run_all(futures)
+
+	assert order == ['prefetch', 'search']
+
+
+def test_prefetch_never_takes_every_worker():
+	executor = PriorityExecutor(workers=2, max_prefetch_workers=1)
+	release = threading.Event()
+	running = []
+
+	def prefetch(name):
+		running.append(name)
+		release.wait(5)
+
+	try:
+		executor.submit(prefetch, 'p1', ticket=Ticket(Lane.PREFETCH), guild_id=1)
+		executor.submit(prefetch, 'p2', ticket=Ticket(Lane.PREFETCH), guild_id=1)
+		search = executor.submit(lambda: 'found', ticket=Ticket(Lane.INTERACTIVE), guild_id=2)
+
+		assert search.result(5) == 'found'
+		assert running == ['p1']
+	finally:
+		release.set()
+		executor.shutdown()
+
+
+async def test_cancelled_caller_withdraws_a_waiting_job(executor):
+	release = block(executor)
+	ran = []
+	task = asyncio.create_task(executor.run(ran.append, 'x', ticket=Ticket(Lane.INTERACTIVE), guild_id=1))
+	await asyncio.sleep(0.01)
+	assert executor.pending(1) == 1
+
+	task.cancel()
+	with pytest.raises(asyncio.CancelledError):
+		await task
+	await asyncio.sleep(0.01)
+
+	assert executor.pending(1) == 0
+	release.set()
+	await asyncio.sleep(0.05)
+	assert ran == []
+
+
+async def test_run_returns_results_and_raises_errors(executor):
+	assert await executor.run(lambda a, b: a + b, 2, 3, ticket=Ticket(Lane.INTERACTIVE)) == 5
+
+	def boom():
+		raise ValueError('nope')
+
+	with pytest.raises(ValueError):
+		await executor.run(boom, ticket=Ticket(Lane.INTERACTIVE))
+
+
+def test_executor_keeps_working_after_shutdown(executor):
+	executor.shutdown()
+	assert executor.submit(lambda: 'again', ticket=Ticket(Lane.PLAYBACK)).result(5) == 'again'
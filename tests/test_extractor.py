@@ -1,11 +1,19 @@
-"""Source restrictions and temp-file handling in the music extractor."""
+"""Source restrictions and cache handling in the music extractor."""
 import asyncio
+import time
+from pathlib import Path
 
 import pytest
 
 from src.features.music import extractor as ex
 
 
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+	"""Retries would otherwise wait real seconds between attempts."""
+	monkeypatch.setattr(ex, 'DOWNLOAD_BACKOFF', 0)
+
+
 @pytest.mark.parametrize('url', [
 	'https://youtube.com/watch?v=abc',
 	'https://www.youtube.com/watch?v=abc',
@@ -28,10 +36,33 @@ def test_non_youtube_urls_are_rejected(url):
 		ex._search_query(url)
 
 
+@pytest.mark.parametrize(('query', 'ie_key'), [
+	('https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'Youtube'),
+	('https://music.youtube.com/watch?v=dQw4w9WgXcQ', 'Youtube'),
+	('https://youtu.be/dQw4w9WgXcQ', 'Youtube'),
+	('ytsearch1:never gonna give you up', 'YoutubeSearch'),
+	('https://www.youtube.com/playlist?list=PLx0sYbCqOb8TBPRdmBHs5Iftvv9TPboYG', 'YoutubeTab'),
+	('https://vimeo.com/1234', None),
+])
+def test_only_youtube_extractors_are_loaded(query, ie_key):
+	import yt_dlp
+
+	ydl = yt_dlp.YoutubeDL({**ex.PLAYLIST_OPTS, 'impersonate': None})
+	matched = next((key for key, ie in ydl._ies.items() if ie.suitable(query)), None)
+
+	assert len(ydl._ies) == len(ex.YOUTUBE_EXTRACTORS)
+	assert matched == ie_key
+
+
 def test_plain_text_becomes_a_search():
 	assert ex._search_query('some song name') == 'ytsearch1:some song name'
 
 
+def test_a_search_keeps_the_words_the_cache_key_ignores():
+	assert ex._search_query('  Some Song (Official Audio) lyrics ') == 'ytsearch1:Some Song (Official Audio) lyrics'
+	assert ex._lookup_key('Some Song (Official Audio) lyrics') == 'q:some song'
+
+
 def test_live_streams_are_rejected():
 	with pytest.raises(ex.TrackExtractError):
 		ex._validate_info({'extractor_key': 'Youtube', 'duration': 60, 'is_live': True})
@@ -58,48 +89,643 @@ def test_non_youtube_extractor_is_rejected():
 		ex._validate_info({'extractor_key': 'Vimeo', 'duration': 200})
 
 
-async def test_concurrent_downloads_of_same_video_use_distinct_paths(monkeypatch):
-	"""Same guild + same video must not have two writers on one path."""
-	seen = set()
+async def test_retries_of_one_download_reuse_its_staging_path(monkeypatch):
+	"""A retry must land on the same staged name; distinct downloads must not."""
+	seen = []
 
 	class SpyYoutubeDL:
 		def __init__(self, opts):
-			seen.add(opts['outtmpl'])
+			self.params = {**opts, 'outtmpl': {'default': 'unset'}}
 
-		def __enter__(self):
-			return self
+		def close(self):
+			pass
 
-		def __exit__(self, *exc):
-			return False
+		def build_format_selector(self, spec):
+			return spec
 
 		def extract_info(self, *a, **k):
+			seen.append(self.params['outtmpl']['default'])
 			raise RuntimeError('stop before downloading')
 
 	monkeypatch.setattr(ex.yt_dlp, 'YoutubeDL', SpyYoutubeDL)
+	monkeypatch.setattr(ex, '_DOWNLOAD_POOL', ex.YdlPool(ex.DOWNLOAD_OPTS))
+
+	for video_id in ('aaaaaaaaaaa', 'bbbbbbbbbbb'):
+		with pytest.raises(RuntimeError):
+			await ex.download_audio(f'https://youtu.be/{video_id}', 7)
+
+	attempts = ex.DOWNLOAD_ATTEMPTS
+	assert len(seen) == 2 * attempts
+	assert len(set(seen[:attempts])) == 1
+	assert len(set(seen[attempts:])) == 1
+	assert seen[0] != seen[attempts]
+
+
+# --- reusing the extraction result ---------------------------------------
+
+
+def youtube_info(expire: float) -> dict:
+	audio = {
+		'format_id': '251', 'url': f'https://rr1.googlevideo.com/videoplayback?expire={int(expire)}&itag=251',
+		'protocol': 'https', 'ext': 'webm', 'acodec': 'opus', 'vcodec': 'none', 'abr': 130,
+		'http_headers': {'User-Agent': 'ua'}, 'downloader_options': {'http_chunk_size': 10485760},
+		'fragments': None, 'preference': None,
+	}
+	return {
+		**SONG_INFO,
+		'id': 'abcdefghijk',
+		'extractor_key': 'Youtube',
+		'format_id': '251',
+		'url': audio['url'],
+		'description': 'x' * 10_000,
+		'formats': [
+			{**audio, 'format_id': '249', 'abr': 50},
+			{'format_id': '18', 'url': 'https://rr1.googlevideo.com/v18', 'protocol': 'https', 'vcodec': 'avc1', 'acodec': 'mp4a'},
+			{'format_id': '233', 'url': 'https://manifest.googlevideo.com/x.m3u8', 'protocol': 'm3u8_native', 'vcodec': 'none'},
+			audio,
+		],
+	}
+
+
+def test_compact_source_keeps_only_what_a_download_needs():
+	import json
+	import time
+	expire = time.time() + 3600
+	source = ex._compact_source(youtube_info(expire))
+
+	assert [fmt['format_id'] for fmt in source['formats']] == ['249', '251']
+	assert 'description' not in source and 'fragments' not in source['formats'][1]
+	assert source['format_id'] == '251'
+	assert source['expires'] == int(expire)
+	assert json.loads(json.dumps(source)) == source
+
+
+def test_source_is_not_kept_when_the_chosen_format_cannot_be_fetched_directly():
+	info = youtube_info(0)
+	info['format_id'] = '233'
+	assert ex._compact_source(info) is None
+
+
+class SourceSpyYoutubeDL:
+	calls: list
+
+	def __init__(self, opts):
+		self.params = {**opts, 'outtmpl': {'default': 'unset'}}
+
+	def close(self):
+		pass
+
+	def build_format_selector(self, spec):
+		return spec
+
+	def extract_info(self, url, download=True, process=True):
+		self.calls.append(('extract', url))
+		info = {'id': 'abcdefghijk', 'ext': 'webm', 'duration': 90, 'extractor_key': 'Youtube'}
+		return self._finish(info) if process else info
+
+	def process_ie_result(self, info, download=True):
+		self.calls.append(('process', info['id']))
+		info['mutated'] = True
+		return self._finish(info)
+
+	def _finish(self, info):
+		path = Path(self.params['outtmpl']['default'].replace('%(id)s', info['id']).replace('%(ext)s', 'webm'))
+		path.write_text('x')
+		return {**info, 'requested_downloads': [{'filepath': str(path)}]}
+
+
+@pytest.fixture
+def source_spy(monkeypatch, tmp_path):
+	SourceSpyYoutubeDL.calls = []
+	monkeypatch.setattr(ex.yt_dlp, 'YoutubeDL', SourceSpyYoutubeDL)
+	monkeypatch.setattr(ex, '_DOWNLOAD_POOL', ex.YdlPool(ex.DOWNLOAD_OPTS))
+	monkeypatch.setattr(ex, 'CACHE_DIR', tmp_path / 'staging')
+	monkeypatch.setattr(ex, 'AUDIO_CACHE', ex.AudioCache(tmp_path / 'cache'))
+	return SourceSpyYoutubeDL.calls
+
+
+async def test_download_reuses_a_fresh_source_without_resolving_again(source_spy):
+	import time
+	source = ex._compact_source(youtube_info(time.time() + 3600))
+
+	path = await ex.download_audio(SONG_INFO['webpage_url'], 7, source=source)
+
+	assert source_spy == [('process', 'abcdefghijk')]
+	assert path.name == 'abcdefghijk.webm'
+	assert 'mutated' not in source
+
+
+async def test_expired_source_is_resolved_again(source_spy):
+	import time
+	source = ex._compact_source(youtube_info(time.time() + ex.SOURCE_EXPIRY_MARGIN / 2))
+
+	await ex.download_audio(SONG_INFO['webpage_url'], 7, source=source)
+
+	assert source_spy == [('extract', SONG_INFO['webpage_url']), ('process', 'abcdefghijk')]
+
+
+async def test_a_failed_download_from_the_source_retries_with_a_full_resolve(source_spy, monkeypatch):
+	import time
 
-	async def attempt():
-		with pytest.raises(Exception):
-			await ex.download_audio('https://youtu.be/same', 7)
+	original = SourceSpyYoutubeDL.process_ie_result
 
-	await asyncio.gather(attempt(), attempt(), attempt())
-	assert len(seen) == 3
+	def revoked(self, info, download=True):
+		if 'formats' not in info:
+			return original(self, info, download)
+		source_spy.append(('process', info['id']))
+		raise RuntimeError('HTTP Error 403: Forbidden')
 
+	monkeypatch.setattr(SourceSpyYoutubeDL, 'process_ie_result', revoked)
+	source = ex._compact_source(youtube_info(time.time() + 3600))
 
-def test_clear_cache_removes_stale_files_only(monkeypatch, tmp_path):
+	await ex.download_audio(SONG_INFO['webpage_url'], 7, source=source)
+
+	assert source_spy == [
+		('process', 'abcdefghijk'),
+		('extract', SONG_INFO['webpage_url']),
+		('process', 'abcdefghijk'),
+	]
+
+
+async def test_a_retry_resumes_the_partial_file_of_the_same_format(source_spy, monkeypatch):
+	import time
+	resumed = []
+
+	def staged(ydl, ext):
+		return Path(ydl.params['outtmpl']['default'] % {'id': 'abcdefghijk', 'format_id': '251', 'ext': ext})
+
+	def download(self, info, download=True):
+		if 'formats' in info:
+			# From the stored source: cut off part-way.
+			staged(self, 'webm.part').write_bytes(b'x' * 900)
+			raise RuntimeError('Connection reset by peer')
+		resumed.append((self.params['format'], staged(self, 'webm.part').stat().st_size))
+		return self._finish(info)
+
+	monkeypatch.setattr(SourceSpyYoutubeDL, 'process_ie_result', download)
+	source = ex._compact_source(youtube_info(time.time() + 3600))
+
+	await ex.download_audio(SONG_INFO['webpage_url'], 7, source=source, bitrate=96000)
+
+	spec, size = resumed[0]
+	assert spec.startswith('251/')
+	assert size == 900
+	assert ex.DOWNLOAD_OPTS['continuedl'] and not ex.DOWNLOAD_OPTS['overwrites']
+
+
+async def test_retries_back_off_exponentially_and_clean_up_after_the_last(monkeypatch, tmp_path):
+	import time
+	monkeypatch.setattr(ex, 'DOWNLOAD_BACKOFF', 0.05)
 	monkeypatch.setattr(ex, 'CACHE_DIR', tmp_path)
-	(tmp_path / '1-aaa-vid.m4a').write_text('x')
-	(tmp_path / '2-bbb-vid.webm').write_text('x')
-	nested = tmp_path / 'nested'
-	nested.mkdir()
+	started = []
+
+	def flaky(webpage_url, guild_id, token, source=None, spec=None, abort=None, staging=None):
+		started.append(time.monotonic())
+		(tmp_path / f'{guild_id}-{token}-abcdefghijk.251.webm.part').write_bytes(b'x')
+		raise RuntimeError('HTTP Error 503')
+
+	monkeypatch.setattr(ex, '_download_audio', flaky)
+
+	with pytest.raises(RuntimeError):
+		await ex.download_audio('https://youtu.be/abcdefghijk', 7)
+
+	gaps = [later - earlier for earlier, later in zip(started, started[1:])]
+	assert len(started) == ex.DOWNLOAD_ATTEMPTS
+	assert gaps[0] >= 0.05 and gaps[1] >= 0.1
+	assert list(tmp_path.iterdir()) == []
+
+
+async def test_stream_comes_straight_from_a_fresh_source(monkeypatch):
+	import time
+
+	def explode(*a, **k):
+		raise AssertionError('resolved a stream that was already known')
+
+	monkeypatch.setattr(ex.EXECUTOR, 'submit', explode)
+	source = ex._compact_source(youtube_info(time.time() + 3600))
+
+	stream = await ex.resolve_stream(SONG_INFO['webpage_url'], 7, source=source)
+
+	assert stream.url == source['formats'][1]['url']
+	assert stream.headers == {'User-Agent': 'ua'}
+
+
+async def test_a_download_takes_the_source_of_a_stream_resolve_under_way(source_spy, monkeypatch):
+	import time
+	info = youtube_info(time.time() + 3600)
+
+	def resolve(webpage_url, spec):
+		time.sleep(0.05)
+		return ex.AudioStream(url=info['url'], source=ex._compact_source(info))
+
+	monkeypatch.setattr(ex, '_resolve_stream', resolve)
+
+	streaming = asyncio.create_task(ex.resolve_stream(SONG_INFO['webpage_url'], 7))
+	await asyncio.sleep(0)
+	await ex.download_audio(SONG_INFO['webpage_url'], 7)
+	stream = await streaming
+
+	assert stream.source is not None
+	assert source_spy == [('process', 'abcdefghijk')]
+	assert ex._RESOLVING == {}
+
+
+async def test_extract_track_carries_the_source_only_when_it_resolved(monkeypatch):
+	import time
+	counting_extract(monkeypatch, youtube_info(time.time() + 3600))
+
+	resolved = await ex.extract_track('some song', 1, 'a')
+	cached = await ex.extract_track('some song', 1, 'a')
+
+	assert resolved.source['format_id'] == '251'
+	assert cached.source is None
+	assert resolved == cached
+
+
+# --- playlists -------------------------------------------------------------
+
+
+@pytest.mark.parametrize(('url', 'expected'), [
+	('https://www.youtube.com/playlist?list=PL123', True),
+	('https://music.youtube.com/playlist?list=PL123', True),
+	('https://www.youtube.com/watch?v=abcdefghijk&list=PL123', False),
+	('https://www.youtube.com/playlist', False),
+	('https://evil.com/playlist?list=PL123', False),
+	('some playlist', False),
+])
+def test_playlist_urls_are_recognised(url, expected):
+	assert ex.is_playlist_url(url) is expected
+
+
+def test_unplayable_playlist_entries_are_dropped():
+	assert ex._entry_fields({'id': 'abcdefghijk', 'title': '[Private video]', 'duration': None}) is None
+	assert ex._entry_fields({'id': 'abcdefghijk', 'duration': 60, 'live_status': 'is_live'}) is None
+	assert ex._entry_fields({'id': 'abcdefghijk', 'duration': ex.MAX_DURATION_SECONDS + 1}) is None
+
+	fields = ex._entry_fields({'id': 'abcdefghijk', 'title': 'Song', 'duration': 60.0, 'channel': 'Band'})
+	assert fields['webpage_url'] == 'https://www.youtube.com/watch?v=abcdefghijk'
+	assert (fields['duration'], fields['uploader']) == (60, 'Band')
+	assert fields['thumbnail'] == 'https://i.ytimg.com/vi/abcdefghijk/hqdefault.jpg'
+
+
+async def test_playlist_tracks_arrive_while_it_is_still_being_listed(monkeypatch):
+	import threading
+	more = threading.Event()
+
+	def listing(url, emit, stop):
+		emit({'id': 'aaaaaaaaaaa', 'title': 'first', 'duration': 60})
+		more.wait(2)
+		emit({'id': 'bbbbbbbbbbb', 'title': 'private', 'duration': None})
+		emit({'id': 'ccccccccccc', 'title': 'second', 'duration': 60})
+
+	monkeypatch.setattr(ex, '_list_playlist', listing)
+	tracks = ex.extract_playlist('https://www.youtube.com/playlist?list=PL1', 7, 'a', 1)
+
+	first = await asyncio.wait_for(anext(tracks), 1)
+	more.set()
+	rest = [track async for track in tracks]
+
+	assert first.title == 'first'
+	assert [track.title for track in rest] == ['second']
+	assert (first.requester_id, first.source) == (7, None)
+
+
+async def test_closing_a_playlist_stops_the_listing(monkeypatch):
+	import threading
+	stopped = threading.Event()
+
+	def endless(url, emit, stop):
+		count = 0
+		while not stop.wait(0.005):
+			count += 1
+			emit({'id': f'{count:011d}', 'title': str(count), 'duration': 60})
+		stopped.set()
+
+	monkeypatch.setattr(ex, '_list_playlist', endless)
+	tracks = ex.extract_playlist('https://www.youtube.com/playlist?list=PL1', 7, 'a', 1)
+
+	await anext(tracks)
+	await tracks.aclose()
+
+	assert await asyncio.to_thread(stopped.wait, 1)
+
+
+async def test_a_failed_listing_surfaces_after_the_entries_it_produced(monkeypatch):
+	def broken(url, emit, stop):
+		emit({'id': 'aaaaaaaaaaa', 'title': 'first', 'duration': 60})
+		raise RuntimeError('page 2 failed')
+
+	monkeypatch.setattr(ex, '_list_playlist', broken)
+	tracks = ex.extract_playlist('https://www.youtube.com/playlist?list=PL1', 7, 'a', 1)
+
+	assert (await anext(tracks)).title == 'first'
+	with pytest.raises(RuntimeError, match='page 2'):
+		await anext(tracks)
+
+
+# --- format policy -----------------------------------------------------------
+
+
+def audio_formats(*formats) -> dict:
+	return {
+		'id': 'abcdefghijk', 'title': 'Song', 'duration': 90, 'extractor': 'youtube', 'extractor_key': 'Youtube',
+		'formats': [
+			{'format_id': format_id, 'url': f'https://media.example/{format_id}', 'protocol': 'https',
+			 'ext': ext, 'acodec': acodec, 'vcodec': 'none', 'abr': abr}
+			for format_id, ext, acodec, abr in formats
+		],
+	}
+
+
+OPUS_AND_AAC = audio_formats(
+	('249', 'webm', 'opus', 50),
+	('250', 'webm', 'opus', 70),
+	('140', 'm4a', 'mp4a.40.2', 129),
+	('251', 'webm', 'opus', 160),
+)
+
+
+@pytest.mark.parametrize(('info', 'bitrate', 'chosen'), [
+	(OPUS_AND_AAC, None, '251'),
+	(OPUS_AND_AAC, 384000, '251'),
+	(OPUS_AND_AAC, 96000, '250'),
+	(OPUS_AND_AAC, 64000, '249'),
+	(OPUS_AND_AAC, 128000, '251'),
+	(OPUS_AND_AAC, 8000, '249'),
+	(audio_formats(('139', 'm4a', 'mp4a.40.5', 48), ('140', 'm4a', 'mp4a.40.2', 129)), 64000, '139'),
+	(audio_formats(('139', 'm4a', 'mp4a.40.5', 48), ('140', 'm4a', 'mp4a.40.2', 129)), None, '140'),
+])
+def test_format_policy_prefers_opus_within_the_channel_bitrate(info, bitrate, chosen):
+	import copy
+	with ex.yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True}) as ydl:
+		ex._use_format(ydl, ex.audio_format(bitrate))
+		result = ydl.process_ie_result(copy.deepcopy(info), download=False)
+
+	assert result['format_id'] == chosen
+
+
+async def test_download_from_a_source_keeps_the_format_chosen_at_play_time(source_spy, monkeypatch):
+	import time
+	formats = []
+	original = SourceSpyYoutubeDL.process_ie_result
+
+	def spy(self, info, download=True):
+		formats.append(self.params['format'])
+		return original(self, info, download)
+
+	monkeypatch.setattr(SourceSpyYoutubeDL, 'process_ie_result', spy)
+	source = ex._compact_source(youtube_info(time.time() + 3600))
+
+	await ex.download_audio(SONG_INFO['webpage_url'], 7, source=source, bitrate=64000)
+
+	assert formats == ['251']
+
+
+def fake_downloads(monkeypatch, tmp_path, delay: float = 0.05):
+	import time
+	calls = []
+
+	def download(webpage_url, guild_id, token, source=None, spec=None, abort=None, staging=None):
+		calls.append(webpage_url)
+		time.sleep(delay)
+		video_id = ex._video_id(webpage_url)
+		path = tmp_path / f'{guild_id}-{token}-{video_id}.webm'
+		path.write_text('x')
+		return video_id, path
+
+	monkeypatch.setattr(ex, '_download_audio', download)
+	monkeypatch.setattr(ex, 'AUDIO_CACHE', ex.AudioCache(tmp_path / 'cache'))
+	return calls
+
+
+async def test_concurrent_requests_for_one_video_share_a_download(monkeypatch, tmp_path):
+	calls = fake_downloads(monkeypatch, tmp_path)
+	url = 'https://www.youtube.com/watch?v=abcdefghijk'
+
+	paths = await asyncio.gather(*[ex.download_audio(url, guild_id) for guild_id in (1, 2, 3)])
+
+	assert calls == [url]
+	assert len(set(paths)) == 1
+	assert ex._IN_FLIGHT == {}
+
+	# Each waiter holds its own reference; the file outlives all but the last.
+	ex.AUDIO_CACHE.max_bytes = 0
+	for path in paths[:-1]:
+		ex.release_audio(path)
+		assert path.exists()
+	ex.release_audio(paths[-1])
+	assert not paths[-1].exists()
+
+
+async def test_audio_for_a_poorer_channel_is_not_served_to_a_richer_one(monkeypatch, tmp_path):
+	calls = fake_downloads(monkeypatch, tmp_path)
+	url = 'https://www.youtube.com/watch?v=abcdefghijk'
+
+	low = await ex.download_audio(url, 1, bitrate=64000)
+	high = await ex.download_audio(url, 2, bitrate=384000)
+	reused = await ex.download_audio(url, 3, bitrate=96000)
+
+	assert calls == [url, url]
+	assert (low.name, high.name) == ('abcdefghijk.64k.webm', 'abcdefghijk.webm')
+	assert reused == high
+
+
+async def test_one_waiter_giving_up_does_not_cancel_the_shared_download(monkeypatch, tmp_path):
+	calls = fake_downloads(monkeypatch, tmp_path, delay=0.1)
+	url = 'https://www.youtube.com/watch?v=abcdefghijk'
+
+	quitter = asyncio.create_task(ex.download_audio(url, 1))
+	stayer = asyncio.create_task(ex.download_audio(url, 2))
+	await asyncio.sleep(0.02)
+	quitter.cancel()
+
+	path = await stayer
+	assert path.exists()
+	assert calls == [url]
+
+
+async def test_a_waiter_promoted_after_joining_speeds_up_the_shared_download(monkeypatch, tmp_path):
+	fake_downloads(monkeypatch, tmp_path, delay=0.1)
+	url = 'https://www.youtube.com/watch?v=abcdefghijk'
+	first, joiner = ex.Ticket(ex.Lane.PREFETCH), ex.Ticket(ex.Lane.PREFETCH)
+
+	owner = asyncio.create_task(ex.download_audio(url, 1, first))
+	await asyncio.sleep(0)
+	waiter = asyncio.create_task(ex.download_audio(url, 2, joiner))
+	await asyncio.sleep(0.02)
+	joiner.promote(ex.Lane.PLAYBACK)
+
+	assert first.lane == ex.Lane.PLAYBACK
+	for path in await asyncio.gather(owner, waiter):
+		ex.release_audio(path)
+
+
+async def test_a_waiter_that_left_no_longer_promotes_the_download(monkeypatch, tmp_path):
+	fake_downloads(monkeypatch, tmp_path, delay=0.1)
+	url = 'https://www.youtube.com/watch?v=abcdefghijk'
+	first, joiner = ex.Ticket(ex.Lane.PREFETCH), ex.Ticket(ex.Lane.PREFETCH)
+
+	owner = asyncio.create_task(ex.download_audio(url, 1, first))
+	await asyncio.sleep(0)
+	waiter = asyncio.create_task(ex.download_audio(url, 2, joiner))
+	await asyncio.sleep(0.02)
+	waiter.cancel()
+	await asyncio.sleep(0)
+	joiner.promote(ex.Lane.PLAYBACK)
+
+	assert first.lane == ex.Lane.PREFETCH
+	ex.release_audio(await owner)
+
+
+async def test_download_is_abandoned_when_every_waiter_gives_up(monkeypatch, tmp_path):
+	fake_downloads(monkeypatch, tmp_path, delay=0.1)
+	url = 'https://www.youtube.com/watch?v=abcdefghijk'
+
+	waiter = asyncio.create_task(ex.download_audio(url, 1))
+	await asyncio.sleep(0.02)
+	flight = ex._IN_FLIGHT['abcdefghijk']
+	waiter.cancel()
+	await asyncio.sleep(0.01)
+
+	assert flight.task.cancelled()
+	assert ex._IN_FLIGHT == {}
+
+
+async def test_an_abandoned_download_stops_its_worker_and_removes_the_partial_file(monkeypatch, tmp_path):
+	import threading
+	import time
+	stopped = threading.Event()
+	chunks = []
+
+	class ChunkedYoutubeDL(SourceSpyYoutubeDL):
+		def extract_info(self, url, download=True, process=True):
+			part = Path(self.params['outtmpl']['default'].replace('%(id)s', 'abcdefghijk').replace('%(ext)s', 'webm.part'))
+			try:
+				for _ in range(500):
+					with part.open('ab') as file:
+						file.write(b'x' * 1024)
+					chunks.append(part)
+					for hook in self.params['progress_hooks']:
+						hook({'status': 'downloading'})
+					time.sleep(0.01)
+			finally:
+				stopped.set()
+			return self._finish({'id': 'abcdefghijk', 'ext': 'webm'})
+
+	monkeypatch.setattr(ex.yt_dlp, 'YoutubeDL', ChunkedYoutubeDL)
+	monkeypatch.setattr(ex, '_DOWNLOAD_POOL', ex.YdlPool(ex.DOWNLOAD_OPTS))
+	monkeypatch.setattr(ex, 'CACHE_DIR', tmp_path / 'staging')
+
+	waiter = asyncio.create_task(ex.download_audio('https://youtu.be/abcdefghijk', 7))
+	while not chunks:
+		await asyncio.sleep(0.01)
+	waiter.cancel()
+
+	assert await asyncio.to_thread(stopped.wait, 1)
+	assert len(chunks) < 100
+	await asyncio.sleep(0.05)
+	assert list((tmp_path / 'staging').iterdir()) == []
+
+
+def test_load_cache_keeps_cached_audio_and_drops_unfinished_downloads(monkeypatch, tmp_path):
+	root = tmp_path / 'audio'
+	root.mkdir()
+	monkeypatch.setattr(ex, 'AUDIO_CACHE', ex.AudioCache(root))
+	(root / '1-aaa-vid.m4a').write_text('x')
+	(root / 'abcdefghijk.webm').write_text('x')
+	(root / 'nested').mkdir()
+
+	ex.load_cache()
+
+	assert sorted(p.name for p in root.iterdir()) == ['abcdefghijk.webm', 'nested']
+
+
+def test_load_cache_is_safe_when_directory_is_absent(monkeypatch, tmp_path):
+	monkeypatch.setattr(ex, 'AUDIO_CACHE', ex.AudioCache(tmp_path / 'does-not-exist'))
+	ex.load_cache()
+
+
+async def test_cached_video_is_not_downloaded_again(monkeypatch, tmp_path):
+	cache = ex.AudioCache(tmp_path)
+	monkeypatch.setattr(ex, 'AUDIO_CACHE', cache)
+	staged = tmp_path / 'staged.webm'
+	staged.write_text('x')
+	cached = cache.add('abcdefghijk', staged)
+	cache.release(cached)
+
+	def explode(*a, **k):
+		raise AssertionError('yt-dlp ran for a cached video')
+
+	monkeypatch.setattr(ex, '_download_audio', explode)
+
+	path = await ex.download_audio('https://www.youtube.com/watch?v=abcdefghijk', 7)
+	assert path == cached
+	ex.release_audio(path)
+	assert path.exists()
+
+
+def test_release_audio_deletes_files_the_cache_does_not_own(monkeypatch, tmp_path):
+	monkeypatch.setattr(ex, 'AUDIO_CACHE', ex.AudioCache(tmp_path / 'cache'))
+	stray = tmp_path / 'stray.webm'
+	stray.write_text('x')
+
+	ex.release_audio(stray)
+
+	assert not stray.exists()
 
-	ex.clear_cache()
 
-	assert [p.name for p in tmp_path.iterdir()] == ['nested']
+@pytest.mark.parametrize(('url', 'video_id'), [
+	('https://www.youtube.com/watch?v=abcdefghijk', 'abcdefghijk'),
+	('https://youtu.be/abcdefghijk', 'abcdefghijk'),
+	('https://music.youtube.com/watch?v=abcdefghijk&list=x', 'abcdefghijk'),
+	('https://youtu.be/abcdefghijk?si=share&t=42', 'abcdefghijk'),
+	('https://m.youtube.com/shorts/abcdefghijk?feature=share', 'abcdefghijk'),
+	('https://www.youtube.com/embed/abcdefghijk', 'abcdefghijk'),
+	('https://www.youtube.com/live/abcdefghijk', 'abcdefghijk'),
+	('https://www.youtube.com/', None),
+	('https://www.youtube.com/watch?v=short', None),
+	('https://example.com/watch?v=abcdefghijk', None),
+])
+def test_video_id_is_read_from_the_url(url, video_id):
+	assert ex._video_id(url) == video_id
+
+
+@pytest.mark.parametrize(('query', 'canonical'), [
+	('  Never  Gonna Give You Up ', 'never gonna give you up'),
+	('never gonna give you up (Official Music Video)', 'never gonna give you up'),
+	('Never Gonna Give You Up - Official Audio', 'never gonna give you up'),
+	('never gonna give you up lyrics [HD]', 'never gonna give you up'),
+	('Ｎｅｖｅｒ gonna give you up', 'never gonna give you up'),
+	('lyrics', 'lyrics'),
+	('magiclyrics', 'magiclyrics'),
+	('video games', 'video games'),
+	('https://youtu.be/abcdefghijk?t=42', 'https://www.youtube.com/watch?v=abcdefghijk'),
+	('https://www.youtube.com/watch?v=abcdefghijk&list=PL1&index=3', 'https://www.youtube.com/watch?v=abcdefghijk'),
+	('https://www.youtube.com/playlist?list=PL1', 'https://www.youtube.com/playlist?list=PL1'),
+])
+def test_queries_are_canonicalized(query, canonical):
+	assert ex._canonical_query(query) == canonical
+
 
+@pytest.mark.parametrize('query', [
+	'song' + ' (hd)' * 25 + ' x',
+	'song' + ' - lyrics' * 60 + ' x',
+	'song' + ' ' * 5000 + '(hd)' * 2000,
+], ids=['bracketed', 'dashed', 'long'])
+def test_pathological_queries_are_canonicalized_quickly(query):
+	started = time.perf_counter()
+	ex._canonical_query(query)
+	assert time.perf_counter() - started < 0.1
 
-def test_clear_cache_is_safe_when_directory_is_absent(monkeypatch, tmp_path):
-	monkeypatch.setattr(ex, 'CACHE_DIR', tmp_path / 'does-not-exist')
-	ex.clear_cache()
+
+def test_stacked_noise_is_stripped_a_few_suffixes_at_most():
+	assert ex._canonical_query('song (hd) [lyrics] - official audio') == 'song'
+	assert ex._canonical_query('song' + ' (hd)' * 6) == 'song (hd) (hd)'
+
+
+def test_overlong_searches_are_refused():
+	with pytest.raises(ex.TrackExtractError, match='too long'):
+		ex._search_query('a' * (ex.MAX_QUERY_CHARS + 1))
 
 
 def test_thumbnail_prefers_explicit_then_last_list_then_id():
@@ -119,7 +745,7 @@ def test_uploader_prefers_artist_then_uploader_then_channel():
 
 
 async def test_extract_track_maps_card_fields(monkeypatch):
-	async def fake_info(query):
+	async def fake_info(query, guild_id=None, bitrate=None):
 		return {
 			'title': 'Song',
 			'webpage_url': 'https://youtu.be/xyz',
@@ -134,3 +760,450 @@ async def test_extract_track_maps_card_fields(monkeypatch):
 	assert track.thumbnail == 'https://img/song.jpg'
 	assert track.uploader == 'Band'
 	assert track.title == 'Song'
+
+
+# --- metadata cache --------------------------------------------------------
+
+
+def counting_extract(monkeypatch, info):
+	calls = []
+
+	async def fake_info(query, guild_id=None, bitrate=None):
+		calls.append(query)
+		return info
+
+	monkeypatch.setattr(ex, 'extract_info', fake_info)
+	return calls
+
+
+SONG_INFO = {
+	'title': 'Song',
+	'webpage_url': 'https://www.youtube.com/watch?v=abcdefghijk',
+	'duration': 90,
+	'thumbnail': 'https://img/song.jpg',
+	'uploader': 'Band',
+}
+
+
+async def test_repeat_search_is_served_from_the_metadata_cache(monkeypatch):
+	calls = counting_extract(monkeypatch, SONG_INFO)
+
+	first = await ex.extract_track('Some  Song', 1, 'a')
+	second = await ex.extract_track('some song', 2, 'b')
+
+	assert calls == ['Some  Song']
+	assert second.title == first.title == 'Song'
+	assert second.webpage_url == SONG_INFO['webpage_url']
+	assert (second.requester_id, second.query) == (2, 'some song')
+
+
+async def test_video_url_hits_the_cache_filled_by_a_search(monkeypatch):
+	calls = counting_extract(monkeypatch, SONG_INFO)
+
+	await ex.extract_track('some song', 1, 'a')
+	track = await ex.extract_track('https://youtu.be/abcdefghijk', 1, 'a')
+
+	assert calls == ['some song']
+	assert track.duration == 90
+
+
+async def test_spellings_of_one_song_share_a_cache_entry(monkeypatch):
+	calls = counting_extract(monkeypatch, SONG_INFO)
+
+	await ex.extract_track('Song (Official Audio)', 1, 'a')
+	await ex.extract_track('song lyrics', 1, 'a')
+	await ex.extract_track('https://youtu.be/abcdefghijk?si=x&t=30', 1, 'a')
+	await ex.extract_track('https://m.youtube.com/shorts/abcdefghijk', 1, 'a')
+
+	assert calls == ['Song (Official Audio)']
+
+
+async def test_expired_metadata_is_resolved_again(monkeypatch):
+	from src.features.music import metadata_store
+	calls = counting_extract(monkeypatch, SONG_INFO)
+	monkeypatch.setattr(metadata_store, 'LOOKUP_TTL', -1)
+
+	await ex.extract_track('some song', 1, 'a')
+	await ex.extract_track('some song', 1, 'a')
+
+	assert calls == ['some song', 'some song']
+
+
+async def test_the_metadata_store_is_used_off_the_event_loop(monkeypatch):
+	import threading
+	counting_extract(monkeypatch, SONG_INFO)
+	store = ex.METADATA_CACHE
+	loop_thread = threading.get_ident()
+	threads = []
+
+	class Recording:
+		def __getattr__(self, name):
+			method = getattr(store, name)
+
+			def record(*args):
+				threads.append(threading.get_ident())
+				return method(*args)
+			return record
+
+	monkeypatch.setattr(ex, 'METADATA_CACHE', Recording())
+
+	await ex.extract_track('some song', 1, 'a')
+
+	assert len(threads) == 3
+	assert loop_thread not in threads
+
+
+async def test_broken_metadata_cache_never_blocks_play(monkeypatch, tmp_path):
+	blocker = tmp_path / 'not-a-dir'
+	blocker.write_text('x')
+	monkeypatch.setattr(ex, 'METADATA_CACHE', ex.MetadataStore(blocker / 'metadata.sqlite3'))
+	calls = counting_extract(monkeypatch, SONG_INFO)
+
+	track = await ex.extract_track('some song', 1, 'a')
+
+	assert track.title == 'Song'
+	assert calls == ['some song']
+
+
+def rejecting_extract(monkeypatch, error):
+	calls = []
+
+	async def fake_info(query, guild_id=None, bitrate=None):
+		calls.append(query)
+		raise error
+
+	monkeypatch.setattr(ex, 'extract_info', fake_info)
+	return calls
+
+
+async def test_a_rejected_query_is_refused_again_without_resolving(monkeypatch):
+	calls = rejecting_extract(monkeypatch, ex.TrackRejected('Live streams are not supported.', 'abcdefghijk'))
+
+	for query in ('lofi radio', 'LoFi  Radio', 'https://www.youtube.com/watch?v=abcdefghijk'):
+		with pytest.raises(ex.TrackExtractError, match='Live streams are not supported.'):
+			await ex.extract_track(query, 1, 'a')
+
+	assert calls == ['lofi radio']
+
+
+async def test_a_search_with_no_results_is_remembered(monkeypatch):
+	class EmptySearchYoutubeDL(SourceSpyYoutubeDL):
+		def extract_info(self, url, download=True):
+			self.calls.append(('extract', url))
+			return {'entries': []}
+
+	SourceSpyYoutubeDL.calls = []
+	monkeypatch.setattr(ex.yt_dlp, 'YoutubeDL', EmptySearchYoutubeDL)
+	monkeypatch.setattr(ex, '_EXTRACT_POOL', ex.YdlPool(ex.YDL_OPTS))
+	monkeypatch.setattr(ex, '_PLAYLIST_POOL', ex.YdlPool(ex.PLAYLIST_OPTS))
+
+	for _ in range(2):
+		with pytest.raises(ex.TrackExtractError, match='Could not find that track.'):
+			await ex.extract_track('asdkjhasd', 1, 'a')
+
+	assert SourceSpyYoutubeDL.calls == [('extract', 'ytsearch1:asdkjhasd')]
+
+
+async def test_an_expired_rejection_is_resolved_again(monkeypatch):
+	from src.features.music import metadata_store
+	calls = rejecting_extract(monkeypatch, ex.TrackRejected('That track has no known duration.'))
+	monkeypatch.setattr(metadata_store, 'REJECTION_TTL', -1)
+
+	for _ in range(2):
+		with pytest.raises(ex.TrackExtractError):
+			await ex.extract_track('some song', 1, 'a')
+
+	assert calls == ['some song', 'some song']
+
+
+async def test_a_busy_refusal_is_not_remembered(monkeypatch):
+	calls = rejecting_extract(monkeypatch, ex.TrackExtractError(ex._BUSY_MESSAGE))
+
+	for _ in range(2):
+		with pytest.raises(ex.TrackExtractError):
+			await ex.extract_track('some song', 1, 'a')
+
+	assert calls == ['some song', 'some song']
+
+
+async def test_a_saturated_guild_gets_a_clear_error(monkeypatch):
+	def busy(*a, **k):
+		raise ex.ExecutorBusy('full')
+
+	monkeypatch.setattr(ex.EXECUTOR, 'submit', busy)
+
+	with pytest.raises(ex.TrackExtractError, match='Too many requests'):
+		await ex.extract_info('some song', 1)
+
+
+# --- pacing ------------------------------------------------------------------
+
+
+def test_a_429_from_youtube_backs_the_governor_off(monkeypatch, isolated_governor):
+	class RateLimitedYoutubeDL(SourceSpyYoutubeDL):
+		def extract_info(self, url, download=True):
+			raise ex.yt_dlp.utils.DownloadError('ERROR: [youtube] abc: HTTP Error 429: Too Many Requests')
+
+	monkeypatch.setattr(ex.yt_dlp, 'YoutubeDL', RateLimitedYoutubeDL)
+	monkeypatch.setattr(ex, '_EXTRACT_POOL', ex.YdlPool(ex.YDL_OPTS))
+	monkeypatch.setattr(ex, '_PLAYLIST_POOL', ex.YdlPool(ex.PLAYLIST_OPTS))
+
+	with pytest.raises(ex.yt_dlp.utils.DownloadError):
+		ex._extract_info('some song', ex.audio_format())
+
+	budget = isolated_governor.budget()
+	assert budget.backoffs == 1
+	assert budget.rate < budget.max_rate
+
+
+def test_other_failures_do_not_count_as_pushback(monkeypatch, isolated_governor):
+	class BrokenYoutubeDL(SourceSpyYoutubeDL):
+		def extract_info(self, url, download=True):
+			raise ex.yt_dlp.utils.DownloadError('ERROR: [youtube] abc: Video unavailable')
+
+	monkeypatch.setattr(ex.yt_dlp, 'YoutubeDL', BrokenYoutubeDL)
+	monkeypatch.setattr(ex, '_EXTRACT_POOL', ex.YdlPool(ex.YDL_OPTS))
+	monkeypatch.setattr(ex, '_PLAYLIST_POOL', ex.YdlPool(ex.PLAYLIST_OPTS))
+
+	with pytest.raises(ex.yt_dlp.utils.DownloadError):
+		ex._extract_info('some song', ex.audio_format())
+
+	assert isolated_governor.budget().backoffs == 0
+
+
+@pytest.mark.parametrize('kib_per_second, backoffs', [(16, 1), (512, 0)])
+def test_a_throttled_download_is_reported_once(isolated_governor, kib_per_second, backoffs):
+	elapsed = ex.THROTTLE_GRACE + 5
+	status = {'status': 'downloading', 'elapsed': elapsed, 'downloaded_bytes': int(elapsed * kib_per_second * 1024)}
+	try:
+		ex._JOB.throttled = False
+		for _ in range(3):
+			ex._on_progress(status)
+	finally:
+		ex._JOB.throttled = False
+
+	assert isolated_governor.budget().backoffs == backoffs
+
+
+# --- flat search -------------------------------------------------------------
+
+
+FLAT_HIT = {
+	'_type': 'url', 'ie_key': 'Youtube', 'id': 'abcdefghijk',
+	'url': 'https://www.youtube.com/watch?v=abcdefghijk',
+	'title': 'Song', 'duration': 90.0, 'channel': 'Band',
+	'thumbnails': [{'url': 'https://img/small.jpg'}, {'url': 'https://img/song.jpg'}],
+}
+
+
+class FlatSearchYoutubeDL(SourceSpyYoutubeDL):
+	"""Lists from the flat handles, resolves from the full ones."""
+	hit: dict
+	resolved: dict
+
+	def extract_info(self, url, download=True, process=True):
+		if self.params.get('extract_flat'):
+			self.calls.append(('search', url))
+			return {'_type': 'playlist', 'entries': [dict(self.hit)]}
+		self.calls.append(('resolve', url))
+		return dict(self.resolved)
+
+
+@pytest.fixture
+def flat_search(monkeypatch):
+	FlatSearchYoutubeDL.calls = []
+	FlatSearchYoutubeDL.hit = FLAT_HIT
+	FlatSearchYoutubeDL.resolved = {**SONG_INFO, 'id': 'abcdefghijk', 'extractor_key': 'Youtube'}
+	monkeypatch.setattr(ex.yt_dlp, 'YoutubeDL', FlatSearchYoutubeDL)
+	monkeypatch.setattr(ex, '_EXTRACT_POOL', ex.YdlPool(ex.YDL_OPTS))
+	monkeypatch.setattr(ex, '_PLAYLIST_POOL', ex.YdlPool(ex.PLAYLIST_OPTS))
+	return FlatSearchYoutubeDL
+
+
+async def test_a_search_is_answered_from_the_results_page_alone(flat_search):
+	track = await ex.extract_track('some song', 1, 'a')
+
+	assert flat_search.calls == [('search', 'ytsearch1:some song')]
+	assert (track.title, track.duration, track.uploader) == ('Song', 90, 'Band')
+	assert track.webpage_url == 'https://www.youtube.com/watch?v=abcdefghijk'
+	assert track.thumbnail == 'https://img/song.jpg'
+	# Nothing was resolved, so the download does that.
+	assert track.source is None
+
+
+async def test_a_hit_without_a_duration_resolves_only_that_video(flat_search):
+	flat_search.hit = {**FLAT_HIT, 'duration': None}
+
+	track = await ex.extract_track('some song', 1, 'a')
+
+	assert flat_search.calls == [('search', 'ytsearch1:some song'), ('resolve', FLAT_HIT['url'])]
+	assert track.duration == 90
+
+
+async def test_a_live_hit_is_refused_from_the_results_page(flat_search):
+	flat_search.hit = {**FLAT_HIT, 'duration': None, 'live_status': 'is_live'}
+
+	with pytest.raises(ex.TrackRejected, match='Live streams'):
+		await ex.extract_track('lofi radio', 1, 'a')
+
+	assert flat_search.calls == [('search', 'ytsearch1:lofi radio')]
+
+
+async def test_url_queries_are_still_resolved_in_full(flat_search):
+	await ex.extract_track('https://youtu.be/abcdefghijk', 1, 'a')
+
+	assert flat_search.calls == [('resolve', 'https://www.youtube.com/watch?v=abcdefghijk')]
+
+
+async def test_the_download_refuses_a_video_the_results_page_misjudged(source_spy, monkeypatch):
+	def overlong(self, url, download=True, process=True):
+		source_spy.append(('extract', url))
+		return {'id': 'abcdefghijk', 'extractor_key': 'Youtube', 'duration': ex.MAX_DURATION_SECONDS * 2}
+
+	monkeypatch.setattr(SourceSpyYoutubeDL, 'extract_info', overlong)
+
+	with pytest.raises(ex.TrackRejected):
+		await ex.download_audio(SONG_INFO['webpage_url'], 7)
+
+	# Refused before anything was fetched, and not retried.
+	assert source_spy == [('extract', SONG_INFO['webpage_url'])]
+
+
+# --- warm-up -------------------------------------------------------------------
+
+
+def test_yt_dlp_keeps_its_player_cache_with_the_bot_state():
+	for opts in (ex.YDL_OPTS, ex.PLAYLIST_OPTS, ex.DOWNLOAD_OPTS):
+		assert opts['cachedir'] == str(ex.STATE_DIR / 'yt-dlp')
+	assert not ex.YTDLP_CACHE_DIR.is_relative_to(ex.CACHE_DIR)
+
+
+async def test_warm_up_resolves_one_video(monkeypatch):
+	class ResolvingYoutubeDL(SourceSpyYoutubeDL):
+		def extract_info(self, url, download=True, process=True):
+			self.calls.append(('extract', url, self.params['cachedir']))
+			return {'id': 'abcdefghijk', 'duration': 19, 'extractor_key': 'Youtube'}
+
+	SourceSpyYoutubeDL.calls = []
+	monkeypatch.setattr(ex.yt_dlp, 'YoutubeDL', ResolvingYoutubeDL)
+	monkeypatch.setattr(ex, '_EXTRACT_POOL', ex.YdlPool(ex.YDL_OPTS))
+
+	assert await ex.warm_up('https://www.youtube.com/watch?v=abcdefghijk')
+	assert SourceSpyYoutubeDL.calls == [
+		('extract', 'https://www.youtube.com/watch?v=abcdefghijk', str(ex.YTDLP_CACHE_DIR)),
+	]
+
+
+async def test_a_failed_warm_up_is_only_logged(monkeypatch, capsys):
+	class BrokenYoutubeDL(SourceSpyYoutubeDL):
+		def extract_info(self, url, download=True, process=True):
+			raise ex.yt_dlp.utils.DownloadError('ERROR: [youtube] abc: Video unavailable')
+
+	monkeypatch.setattr(ex.yt_dlp, 'YoutubeDL', BrokenYoutubeDL)
+	monkeypatch.setattr(ex, '_EXTRACT_POOL', ex.YdlPool(ex.YDL_OPTS))
+
+	assert not await ex.warm_up('https://www.youtube.com/watch?v=abcdefghijk')
+	assert 'warm-up failed' in capsys.readouterr().out
+
+
+# --- worker processes ----------------------------------------------------------
+
+
+class FakeWorkers:
+	"""Runs jobs in the calling thread, or fails them the way a worker process would."""
+
+	def __init__(self, failure: BaseException | None = None):
+		self.failure = failure
+		self.calls = []
+
+	def call(self, fn, *args, timeout, abort=None, serve=None):
+		self.calls.append((fn.__name__, timeout))
+		if self.failure is not None:
+			raise self.failure
+		return fn(*args)
+
+
+def test_a_worker_sends_back_only_what_extract_track_reads():
+	import pickle
+	import time
+	info = youtube_info(time.time() + 3600)
+
+	slim = ex._slim_info(info)
+
+	assert ex._track_fields(slim, 'q') == ex._track_fields(info, 'q')
+	assert ex._compact_source(slim) == ex._compact_source(info)
+	assert len(pickle.dumps(slim)) * 4 < len(pickle.dumps(info))
+
+
+async def test_extraction_in_a_worker_is_slimmed(monkeypatch):
+	import time
+	workers = FakeWorkers()
+	monkeypatch.setattr(ex, 'WORKERS', workers)
+	monkeypatch.setattr(ex, '_extract_info', lambda query, spec: youtube_info(time.time() + 3600))
+
+	info = await ex.extract_info('some song')
+
+	assert workers.calls == [('_extract_slim', ex.EXTRACT_TIMEOUT)]
+	assert 'description' not in info
+
+
+async def test_an_extraction_that_times_out_is_reported(monkeypatch):
+	from src.core.process_pool import JobTimeout
+	monkeypatch.setattr(ex, 'WORKERS', FakeWorkers(JobTimeout('_extract_slim took longer than 60s')))
+
+	with pytest.raises(ex.TrackExtractError, match='took too long'):
+		await ex.extract_info('some song')
+
+
+def test_an_aborted_worker_download_leaves_nothing_behind(monkeypatch, tmp_path):
+	import threading
+	from src.core.process_pool import JobAborted
+	monkeypatch.setattr(ex, 'WORKERS', FakeWorkers(JobAborted('_download_audio aborted')))
+	monkeypatch.setattr(ex, 'CACHE_DIR', tmp_path)
+	staged = tmp_path / '7-token-abcdefghijk.251.webm.part'
+	staged.write_bytes(b'x' * 10)
+
+	with pytest.raises(ex.yt_dlp.utils.DownloadCancelled):
+		ex._download_in_worker('https://youtu.be/abcdefghijk', 7, 'token', None, 'bestaudio', threading.Event(), tmp_path)
+
+	assert not staged.exists()
+
+
+async def test_a_worker_stages_downloads_where_the_parent_looks(source_spy, monkeypatch, tmp_path):
+	class FreshWorkers(FakeWorkers):
+		# A spawned worker never sees the parent rebinding CACHE_DIR.
+		def call(self, fn, *args, **kwargs):
+			monkeypatch.setattr(ex, 'CACHE_DIR', tmp_path / 'default')
+			try:
+				return super().call(fn, *args, **kwargs)
+			finally:
+				monkeypatch.setattr(ex, 'CACHE_DIR', tmp_path / 'staging')
+
+	monkeypatch.setattr(ex, 'WORKERS', FreshWorkers())
+
+	path = await ex.download_audio(SONG_INFO['webpage_url'], 7)
+
+	assert path.name == 'abcdefghijk.webm'
+	assert not (tmp_path / 'default').exists()
+
+
+def test_a_worker_is_paced_by_the_parent_governor(isolated_governor):
+	import threading
+	from src.features.music.governor import RemoteGovernor
+	abort = threading.Event()
+	serve = ex._governed(abort)
+
+	class LoopbackHost:
+		def ask(self, name, *args):
+			return serve(name, *args)
+
+		tell = ask
+
+	remote = RemoteGovernor(LoopbackHost())
+	assert remote.acquire()
+	remote.back_off('HTTP 429')
+	assert isolated_governor.budget().backoffs == 1
+
+	# The parent's abort, not the worker's, decides when to stop waiting.
+	abort.set()
+	assert not remote.acquire()
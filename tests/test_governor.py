@@ -0,0 +1,99 @@
+"""The process-wide request governor: pacing, backing off and winning the rate back."""
+import threading
+import time
+
+from src.features.music import governor as gov
+from src.features.music.governor import Governor
+
+
+class FakeClock:
+	def __init__(self):
+		self.now = 1000.0
+
+	def __call__(self) -> float:
+		return self.now
+
+
+def test_a_burst_goes_straight_out_and_the_rest_is_paced():
+	governor = Governor(rate=50, burst=2)
+
+	started = time.monotonic()
+	for _ in range(6):
+		assert governor.acquire()
+	taken = time.monotonic() - started
+
+	# Two from the bucket, four more at 50 per second.
+	assert 4 / 50 * 0.9 <= taken < 0.5
+
+
+def test_pushback_halves_the_rate_and_pauses_for_longer_each_time():
+	clock = FakeClock()
+	governor = Governor(rate=2, burst=4, clock=clock)
+
+	governor.back_off('HTTP 429')
+	first = governor.budget()
+	governor.back_off('HTTP 429')
+	second = governor.budget()
+
+	assert (first.rate, first.cooldown, first.tokens) == (1.0, gov.GOVERNOR_COOLDOWN, 0)
+	assert (second.rate, second.cooldown) == (0.5, gov.GOVERNOR_COOLDOWN * 2)
+	assert second.backoffs == 2
+
+
+def test_nothing_accrues_until_the_cooldown_is_over():
+	clock = FakeClock()
+	governor = Governor(rate=2, burst=4, clock=clock)
+	governor.back_off('HTTP 429')
+
+	clock.now += gov.GOVERNOR_COOLDOWN
+	assert governor.budget().tokens == 0
+
+	clock.now += 2
+	assert governor.budget().tokens == 2.0
+
+
+def test_successes_win_the_rate_back_and_reset_the_cooldown():
+	clock = FakeClock()
+	governor = Governor(rate=2, burst=4, clock=clock)
+	governor.back_off('HTTP 429')
+	governor.back_off('HTTP 429')
+	clock.now += 60
+
+	for _ in range(20):
+		governor.recover()
+	assert governor.budget().rate == 2
+
+	governor.back_off('HTTP 429')
+	assert governor.budget().cooldown == gov.GOVERNOR_COOLDOWN
+
+
+def test_winning_the_full_rate_back_is_logged_once(capsys):
+	governor = Governor(rate=2, burst=4, clock=FakeClock())
+	governor.back_off('HTTP 429')
+	capsys.readouterr()
+
+	for _ in range(20):
+		governor.recover()
+
+	assert capsys.readouterr().out.count('back to 2.00/s after 1 back-offs') == 1
+
+
+def test_the_rate_never_drops_below_the_floor():
+	governor = Governor(rate=1, min_rate=0.25, clock=FakeClock())
+
+	for _ in range(10):
+		governor.back_off('HTTP 429')
+
+	assert governor.budget().rate == 0.25
+	assert governor.budget().cooldown == gov.GOVERNOR_MAX_COOLDOWN
+
+
+def test_an_aborted_wait_gives_up_without_a_token():
+	governor = Governor(rate=1, burst=1)
+	governor.back_off('HTTP 429')
+	abort = threading.Event()
+	threading.Timer(0.05, abort.set).start()
+
+	started = time.monotonic()
+	assert not governor.acquire(abort)
+	assert time.monotonic() - started < 1
@@ -0,0 +1,159 @@
+"""The ffmpeg-free Ogg/Opus source: packet framing, seeking and rejection."""
+import struct
+
+import pytest
+
+from src.features.music.ogg_opus import FRAME_SAMPLES, OggOpusError, OggOpusSource, _packet_samples
+
+
+PRE_SKIP = 312
+# TOC byte for one 20 ms CELT fullband frame.
+TOC_20MS = 0xF8
+
+
+def opus_head(channels: int = 2, family: int = 0) -> bytes:
+	return (
+		b'OpusHead' + bytes([1, channels]) + PRE_SKIP.to_bytes(2, 'little')
+		+ (48000).to_bytes(4, 'little') + b'\x00\x00' + bytes([family])
+	)
+
+
+def ogg_page(flags: int, granule: int, pieces: list[bytes], seq: int) -> bytes:
+	header = struct.pack('<4sBBqIIIB', b'OggS', 0, flags, granule, 1, seq, 0, len(pieces))
+	return header + bytes(len(piece) for piece in pieces) + b''.join(pieces)
+
+
+def write_ogg(path, packets, *, max_segments: int = 8, head: bytes | None = None):
+	"""Lay packets out the way libogg would, splitting them across pages as they fill."""
+	pages = [
+		ogg_page(0x02, 0, [head or opus_head()], 0),
+		ogg_page(0, 0, [b'OpusTags' + b'\x00' * 8], 1),
+	]
+
+	segments = []
+	for packet in packets:
+		pieces = [packet[i:i + 255] for i in range(0, len(packet), 255)]
+		if len(packet) % 255 == 0:
+			pieces.append(b'')
+		for index, piece in enumerate(pieces):
+			segments.append((piece, index == len(pieces) - 1, _packet_samples(packet)))
+
+	granule = PRE_SKIP
+	ended = True
+	for start in range(0, len(segments), max_segments):
+		chunk = segments[start:start + max_segments]
+		page_granule = -1
+		for _, ends, samples in chunk:
+			if ends:
+				granule += samples
+				page_granule = granule
+		pages.append(ogg_page(0 if ended else 0x01, page_granule, [piece for piece, _, _ in chunk], len(pages)))
+		ended = chunk[-1][1]
+
+	path.write_bytes(b''.join(pages))
+	return path
+
+
+def packet(number: int, size: int = 40, toc: int = TOC_20MS) -> bytes:
+	return bytes([toc]) + number.to_bytes(2, 'big') + b'\x55' * (size - 3)
+
+
+def read_all(source: OggOpusSource) -> list[bytes]:
+	packets = []
+	while data := source.read():
+		packets.append(data)
+	source.cleanup()
+	return packets
+
+
+def test_packets_come_back_whole_across_page_boundaries(tmp_path):
+	packets = [packet(i, size) for i, size in enumerate([40, 300, 600, 255, 510, 90])]
+	path = write_ogg(tmp_path / 'a.opus', packets, max_segments=3)
+
+	source = OggOpusSource(path)
+
+	assert source.is_opus()
+	assert read_all(source) == packets
+
+
+def test_seek_starts_at_the_page_holding_the_target(tmp_path):
+	packets = [packet(i) for i in range(500)]
+	path = write_ogg(tmp_path / 'a.opus', packets, max_segments=10)
+
+	first = read_all(OggOpusSource(path, seek=5.0))[0]
+	number = int.from_bytes(first[1:3], 'big')
+
+	# Ten 20 ms packets per page: the page that holds 5.0s starts at most 0.2s earlier.
+	assert 5.0 - 0.2 < number * FRAME_SAMPLES / 48000 <= 5.0
+
+
+def test_seek_past_the_end_plays_nothing(tmp_path):
+	path = write_ogg(tmp_path / 'a.opus', [packet(i) for i in range(50)])
+
+	assert read_all(OggOpusSource(path, seek=60)) == []
+
+
+def test_a_truncated_download_plays_what_is_complete(tmp_path):
+	packets = [packet(i) for i in range(40)]
+	path = write_ogg(tmp_path / 'a.opus', packets, max_segments=10)
+	path.write_bytes(path.read_bytes()[:-15])
+
+	assert read_all(OggOpusSource(path)) == packets[:30]
+
+
+@pytest.mark.parametrize('toc', [
+	0xF9,       # two 20 ms frames
+	0x18,       # one 60 ms SILK frame
+	0xE8,       # one 10 ms CELT frame
+])
+def test_packets_that_are_not_20ms_are_rejected(tmp_path, toc):
+	path = write_ogg(tmp_path / 'a.opus', [packet(i, toc=toc) for i in range(10)])
+
+	with pytest.raises(OggOpusError, match='not 20 ms'):
+		OggOpusSource(path)
+
+
+def test_surround_layouts_are_rejected(tmp_path):
+	path = write_ogg(tmp_path / 'a.opus', [packet(0)], head=opus_head(channels=6, family=1))
+
+	with pytest.raises(OggOpusError, match='channel layout'):
+		OggOpusSource(path)
+
+
+@pytest.mark.parametrize('content', [b'', b'\x1aE\xdf\xa3' + b'\x00' * 64, b'OggS' + b'\x00' * 10])
+def test_files_that_are_not_ogg_opus_are_rejected(tmp_path, content):
+	path = tmp_path / 'a.opus'
+	path.write_bytes(content)
+
+	with pytest.raises(OggOpusError):
+		OggOpusSource(path)
+
+
+def test_player_reads_ogg_opus_without_ffmpeg(monkeypatch, tmp_path):
+	import discord
+
+	from src.features.music import player as player_module
+
+	def no_ffmpeg(*a, **k):
+		raise AssertionError('spawned ffmpeg for an Ogg/Opus file')
+
+	monkeypatch.setattr(discord, 'FFmpegOpusAudio', no_ffmpeg)
+	path = write_ogg(tmp_path / 'abcdefghijk.opus', [packet(i) for i in range(10)])
+
+	source = player_module._audio_source(path, None, 0.1)
+
+	assert isinstance(source, OggOpusSource)
+	source.cleanup()
+
+
+def test_player_reencodes_an_ogg_opus_file_it_cannot_pass_through(monkeypatch, tmp_path):
+	import discord
+
+	from src.features.music import player as player_module
+	calls = []
+	monkeypatch.setattr(discord, 'FFmpegOpusAudio', lambda source, **kwargs: calls.append(kwargs))
+	path = write_ogg(tmp_path / 'abcdefghijk.opus', [packet(i, toc=0xF9) for i in range(10)])
+
+	player_module._audio_source(path, None, 0)
+
+	assert calls[0]['codec'] is None
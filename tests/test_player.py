@@ -91,7 +91,6 @@ async def test_track_end_chains_to_next_track(make_player, make_track):
 	assert player.current is first
 
 	# Look like a completed play rather than an instant failure.
-	player.started_at = None
 	player.elapsed_offset = 99
 	await player._on_track_end(player._play_gen, None)
 	await settle(0.05)
@@ -109,7 +108,6 @@ async def test_natural_advance_announces_now_playing(make_player, make_track):
 	await settle(0.05)
 	assert channel.sent == []
 
-	player.started_at = None
 	player.elapsed_offset = 99
 	await player._on_track_end(player._play_gen, None)
 	await settle(0.05)
@@ -300,7 +298,6 @@ async def test_finished_track_is_never_replayed(make_player, make_track):
 	assert player.current is first
 	assert player.voice_client.plays == 1
 
-	player.started_at = None
 	player.elapsed_offset = 99
 	player.voice_client.finish()        # after() lands ~5ms later
 	await player.enqueue(second)        # ...right inside the window
@@ -419,7 +416,7 @@ async def test_hung_download_cannot_pin_the_current_track(make_player, make_trac
 	from src.features.music import player as player_module
 	monkeypatch.setattr(player_module, 'DOWNLOAD_TIMEOUT', 0.05)
 
-	async def hang(webpage_url, guild_id):
+	async def hang(webpage_url, guild_id, ticket=None, source=None, bitrate=None):
 		await asyncio.sleep(30)
 
 	player = make_player()      # installs its own fake download; override it after
@@ -430,6 +427,19 @@ async def test_hung_download_cannot_pin_the_current_track(make_player, make_trac
 	assert player.current is None, 'a wedged download pinned current; /play would only queue'
 
 
+async def test_a_download_behind_a_stream_outlives_the_start_timeout(make_player, make_track, monkeypatch):
+	from src.features.music import player as player_module
+	player = make_player(download_delay=0.2, stream_delay=0.01)
+	monkeypatch.setattr(player_module, 'DOWNLOAD_TIMEOUT', 0.05)
+	await player.enqueue(make_track('t1'))
+	await player.wait_for_start()
+	download = player._current_download
+	await settle(0.3)
+
+	assert download.done() and not download.cancelled()
+	assert player.current.title == 't1'
+
+
 # --- Discord orphaning the voice session when the channel empties -----------
 #
 # Real log timeline from a live repro:
@@ -565,3 +575,555 @@ async def test_teardown_stops_the_watchdog(make_player):
 
 	assert player._watchdog_task is None
 	assert task.cancelled() or task.done()
+
+
+# --- look-ahead downloads --------------------------------------------------
+
+
+def record_downloads(monkeypatch, tmp_path, delay: float = 0.0):
+	"""Swap in a downloader that hands out a distinct file per call and logs it."""
+	from src.features.music import player as player_module
+	calls = []
+
+	async def fake_download(webpage_url, guild_id, ticket=None, source=None, bitrate=None):
+		calls.append(webpage_url)
+		if delay:
+			await asyncio.sleep(delay)
+		path = tmp_path / f'{len(calls)}-{webpage_url.rsplit("/", 1)[-1]}.webm'
+		path.write_bytes(b'\x00')
+		return path
+
+	monkeypatch.setattr(player_module, 'download_audio', fake_download)
+	return calls
+
+
+async def test_upcoming_tracks_are_downloaded_while_current_plays(make_player, make_track, monkeypatch, tmp_path):
+	player = make_player()
+	calls = record_downloads(monkeypatch, tmp_path)
+	for i in range(4):
+		await player.enqueue(make_track(f't{i}'))
+	await settle(0.1)
+
+	assert player.current.title == 't0'
+	# The current track plus PREFETCH_AHEAD look-aheads, and nothing further.
+	assert [url.rsplit('/', 1)[-1] for url in calls] == ['t0', 't1', 't2']
+
+	player.elapsed_offset = 99
+	await player._on_track_end(player._play_gen, None)
+	await settle(0.1)
+
+	assert player.current.title == 't1'
+	assert [url.rsplit('/', 1)[-1] for url in calls] == ['t0', 't1', 't2', 't3'], 't1 was downloaded twice'
+
+
+async def test_prefetch_waits_for_the_current_track_to_start(make_player, make_track, monkeypatch, tmp_path):
+	player = make_player()
+	calls = record_downloads(monkeypatch, tmp_path, delay=0.1)
+	await player.enqueue(make_track('t0'))
+	await player.enqueue(make_track('t1'))
+	await asyncio.sleep(0.05)
+
+	assert [url.rsplit('/', 1)[-1] for url in calls] == ['t0']
+	await settle(0.2)
+	assert [url.rsplit('/', 1)[-1] for url in calls] == ['t0', 't1']
+
+
+async def test_prefetch_parallelism_is_capped_per_guild(make_player, make_track, monkeypatch, tmp_path):
+	player = make_player()
+	calls = record_downloads(monkeypatch, tmp_path, delay=0.1)
+	for i in range(3):
+		await player.enqueue(make_track(f't{i}'))
+	await settle(0.15)     # t0 is playing, t1 is mid-prefetch
+
+	assert [url.rsplit('/', 1)[-1] for url in calls] == ['t0', 't1']
+	await settle(0.1)
+	assert [url.rsplit('/', 1)[-1] for url in calls] == ['t0', 't1', 't2']
+
+
+async def test_cleared_prefetches_are_deleted(make_player, make_track, monkeypatch, tmp_path):
+	player = make_player()
+	record_downloads(monkeypatch, tmp_path)
+	for i in range(3):
+		await player.enqueue(make_track(f't{i}'))
+	await settle(0.1)
+	prefetched = sorted(p.name for p in tmp_path.glob('*.webm') if not p.name.endswith('t0.webm'))
+	assert len(prefetched) == 2
+
+	player.clear()
+	await settle(0.05)
+
+	assert sorted(p.name for p in tmp_path.glob('*.webm')) == ['1-t0.webm']
+
+
+async def test_skipping_an_upcoming_track_drops_its_prefetch(make_player, make_track, monkeypatch, tmp_path):
+	player = make_player()
+	first = make_track('t1')
+	player.queue.extend([first, make_track('t2')])
+	calls = record_downloads(monkeypatch, tmp_path)
+	# Look-aheads from the track before, which is over: nothing is playing now.
+	player._prefetch.schedule(player.queue)
+	await settle(0.05)
+
+	await player.skip()         # nothing current: drops t1 off the queue
+	assert first not in player._prefetch, 'not even until the next track starts'
+	await settle(0.05)
+
+	assert not any(p.name.endswith('t1.webm') for p in tmp_path.iterdir())
+	assert [url.rsplit('/', 1)[-1] for url in calls] == ['t1', 't2']
+	player._prefetch.discard()
+
+
+# --- streaming starts ------------------------------------------------------
+
+
+def record_sources(monkeypatch):
+	import discord
+	sources = []
+
+	def fake_source(source, **kwargs):
+		sources.append((source, kwargs))
+		return types.SimpleNamespace(cleanup=lambda: None)
+
+	monkeypatch.setattr(discord, 'FFmpegOpusAudio', fake_source)
+	return sources
+
+
+async def test_slow_download_starts_from_the_stream(make_player, make_track, monkeypatch, audio_file):
+	player = make_player(download_delay=0.3, stream_delay=0.01)
+	sources = record_sources(monkeypatch)
+
+	await player.enqueue(make_track('t1'))
+	await player.wait_for_start()
+
+	assert player.current.title == 't1'
+	assert sources[0][0] == 'https://media.example/t1'
+	assert '-reconnect 1' in sources[0][1]['before_options']
+	assert player._current_file is None, 'the file cannot be ready yet'
+
+	await settle(0.4)
+	assert player._current_file == audio_file, 'the background download was dropped'
+
+
+async def test_downloaded_track_plays_from_disk_not_the_stream(make_player, make_track, monkeypatch, audio_file):
+	player = make_player(stream_delay=0.01)
+	sources = record_sources(monkeypatch)
+
+	await player.enqueue(make_track('t1'))
+	await settle()
+
+	assert sources == [(str(audio_file), {'codec': None, 'bitrate': None, 'options': '-vn', 'before_options': None})]
+
+
+async def test_unresolvable_stream_falls_back_to_the_download(make_player, make_track, monkeypatch, audio_file):
+	from src.features.music import player as player_module
+	player = make_player(download_delay=0.05, stream_delay=0.01)
+	sources = record_sources(monkeypatch)
+
+	async def no_stream(webpage_url, guild_id=None, source=None, bitrate=None):
+		raise RuntimeError('no formats')
+
+	monkeypatch.setattr(player_module, 'resolve_stream', no_stream)
+	await player.enqueue(make_track('t1'))
+	await settle()
+
+	assert player.current.title == 't1'
+	assert sources[0][0] == str(audio_file)
+
+
+async def test_a_resolved_stream_leaves_its_source_on_the_track(make_player, make_track, monkeypatch):
+	from src.features.music import player as player_module
+	player = make_player(download_delay=0.3, stream_delay=0.01)
+	record_sources(monkeypatch)
+	resolved = {'format_id': '251', 'formats': [], 'expires': None}
+
+	async def resolve(webpage_url, guild_id=None, source=None, bitrate=None):
+		return player_module.AudioStream(url='https://media.example/t1', source=resolved)
+
+	monkeypatch.setattr(player_module, 'resolve_stream', resolve)
+	track = make_track('t1')
+	await player.enqueue(track)
+	await player.wait_for_start()
+
+	assert track.source is resolved
+
+
+async def test_skipping_a_streamed_track_abandons_its_download(make_player, make_track, monkeypatch):
+	player = make_player(download_delay=5, stream_delay=0.01)
+	await player.enqueue(make_track('t1'))
+	await player.wait_for_start()
+	download = player._current_download
+	assert not download.done()
+
+	await player.skip()
+	await settle(0.05)
+
+	assert download.cancelled()
+
+
+async def test_skipping_during_a_download_cancels_it_and_moves_on(make_player, make_track, monkeypatch, tmp_path):
+	from src.features.music import player as player_module
+	started = asyncio.Event()
+	cancelled = []
+
+	async def slow_download(webpage_url, guild_id, ticket=None, source=None, bitrate=None):
+		if webpage_url.endswith('t2'):
+			return audio
+		started.set()
+		try:
+			await asyncio.sleep(5)
+		except asyncio.CancelledError:
+			cancelled.append(webpage_url)
+			raise
+
+	player = make_player()
+	audio = tmp_path / 'audio.webm'
+	audio.write_bytes(b'\x00')
+	monkeypatch.setattr(player_module, 'download_audio', slow_download)
+	await player.enqueue(make_track('t1'))
+	await player.enqueue(make_track('t2'))
+	await started.wait()
+
+	skipped, _, _ = await player.skip()
+	await settle(0.05)
+
+	assert skipped.title == 't1'
+	assert cancelled == ['https://youtu.be/t1']
+	assert player.current.title == 't2'
+	assert player.voice_client.is_playing()
+
+
+def test_stream_source_sends_youtube_headers_and_seeks(monkeypatch):
+	from src.features.music import player as player_module
+	sources = record_sources(monkeypatch)
+
+	stream = player_module.AudioStream(url='https://media.example/x', headers={'User-Agent': 'Mozilla/5.0 (X11)'})
+	player_module._audio_source(None, stream, 12.5)
+
+	source, kwargs = sources[0]
+	assert source == 'https://media.example/x'
+	assert "-headers 'User-Agent: Mozilla/5.0 (X11)\r\n'" in kwargs['before_options']
+	assert kwargs['before_options'].endswith('-ss 12.500')
+
+
+# --- passthrough -------------------------------------------------------------
+
+
+def test_opus_file_is_copied_through_without_reencoding(monkeypatch, tmp_path):
+	from src.features.music import player as player_module
+	sources = record_sources(monkeypatch)
+	webm = tmp_path / 'abcdefghijk.webm'
+	webm.write_bytes(b'\x1aE\xdf\xa3' + b'\x00' * 64 + b'\x86\x86A_OPUS' + b'\x00' * 64)
+
+	player_module._audio_source(webm, None, 0, bitrate=96000)
+
+	assert sources[0][1]['codec'] == 'copy'
+	assert sources[0][1]['bitrate'] is None
+
+
+def test_other_codecs_are_encoded_at_the_channel_bitrate(monkeypatch, tmp_path, audio_file):
+	from src.features.music import player as player_module
+	sources = record_sources(monkeypatch)
+
+	player_module._audio_source(audio_file, None, 0, bitrate=96000)
+	player_module._audio_source(None, player_module.AudioStream(url='https://m/x', codec='mp4a.40.2'), 0)
+
+	assert [kwargs['codec'] for _, kwargs in sources] == [None, None]
+	assert [kwargs['bitrate'] for _, kwargs in sources] == [96, None]
+
+
+def test_opus_stream_is_copied_through(monkeypatch):
+	from src.features.music import player as player_module
+	sources = record_sources(monkeypatch)
+
+	player_module._audio_source(None, player_module.AudioStream(url='https://m/x', codec='opus'), 12.5)
+
+	assert sources[0][1]['codec'] == 'copy'
+	assert '-ss 12.500' in sources[0][1]['before_options']
+
+
+# --- recovery keeps the file -------------------------------------------------
+
+
+async def test_voice_rebuild_resumes_from_the_file_it_already_had(make_player, make_track, monkeypatch, tmp_path):
+	player = make_player()
+	calls = record_downloads(monkeypatch, tmp_path)
+	track = make_track('t1')
+	await player.enqueue(track)
+	await settle()
+	path = player._current_file
+	player.elapsed_offset = 30
+
+	assert await player.revive_voice('test')
+	await settle()
+
+	assert player.current is track
+	assert calls == [track.webpage_url], 'the rebuild downloaded the track again'
+	assert player._current_file == path
+	assert player.elapsed_offset == pytest.approx(30 - 2.0, abs=0.5)
+	player._cancel_watchdog()
+
+
+async def test_outage_retry_reuses_the_download(make_player, make_track, monkeypatch, tmp_path):
+	from src.features.music import player as player_module
+	monkeypatch.setattr(player_module, 'RECONNECT_POLL', 0.02)
+	player = make_player()
+	calls = record_downloads(monkeypatch, tmp_path)
+	player.voice_client.connected = False
+	track = make_track('t1')
+
+	await player.enqueue(track)
+	await settle(0.1)
+	assert track in player._prefetch
+	player.voice_client.connected = True
+	await settle(0.2)
+
+	assert player.current is track
+	assert calls == [track.webpage_url]
+	assert player._current_file.exists()
+
+
+async def test_a_requeued_download_is_released_when_the_queue_is_cleared(make_player, make_track, monkeypatch, tmp_path):
+	from src.features.music import player as player_module
+	monkeypatch.setattr(player_module, 'RECONNECT_POLL', 0.02)
+	player = make_player()
+	record_downloads(monkeypatch, tmp_path)
+	released = []
+	monkeypatch.setattr(player._prefetch, '_release', released.append)
+	player.voice_client.connected = False
+
+	await player.enqueue(make_track('t1'))
+	await settle(0.1)
+	player.clear()
+	await settle()
+
+	assert len(released) == 1
+
+
+# --- gapless transitions -----------------------------------------------------
+
+
+class FrameSource:
+	"""A few frames named after the file they came from."""
+
+	def __init__(self, path, frames: int = 2, seek: float = 0):
+		self.name = path.name
+		self.frames = frames
+		self.seek = seek
+		self.cleaned = False
+
+	def read(self) -> bytes:
+		if not self.frames:
+			return b''
+		self.frames -= 1
+		return self.name.encode()
+
+	def is_opus(self) -> bool:
+		return True
+
+	def cleanup(self):
+		self.cleaned = True
+
+
+def open_frame_sources(monkeypatch, frames: int = 2) -> list[FrameSource]:
+	"""Chain the next track as soon as the current one starts, from sources that can be read."""
+	from src.features.music import player as player_module
+	opened = []
+
+	def frame_source(path, stream, seek, bitrate=None, *, pcm=False):
+		opened.append(FrameSource(path, frames, seek))
+		return opened[-1]
+
+	monkeypatch.setattr(player_module, '_audio_source', frame_source)
+	monkeypatch.setattr(player_module, 'GAPLESS', True)
+	monkeypatch.setattr(player_module, 'PRELOAD_SECONDS', 1000)
+	monkeypatch.setattr(player_module, 'PRELOAD_POLL', 0.01)
+	return opened
+
+
+async def play_out(chain) -> list[bytes]:
+	"""Read the chain the way py-cord's voice thread does, until it runs dry."""
+	def read_all():
+		frames = []
+		while frame := chain.read():
+			frames.append(frame)
+		return frames
+
+	return await asyncio.to_thread(read_all)
+
+
+async def test_the_next_track_follows_on_the_same_voice_stream(make_player, make_track, monkeypatch, tmp_path):
+	opened = open_frame_sources(monkeypatch)
+	player = make_player()
+	channel = FakeTextChannel()
+	player.text_channel = channel
+	record_downloads(monkeypatch, tmp_path)
+	first, second = make_track('t1'), make_track('t2')
+	await player.enqueue(first)
+	await player.enqueue(second)
+	await settle()
+	assert player._chained is second
+
+	frames = await play_out(player._chain)
+	await settle(0.05)
+
+	assert frames == [b'1-t1.webm'] * 2 + [b'2-t2.webm'] * 2
+	assert player.current is second
+	assert list(player.queue) == []
+	assert player.voice_client.plays == 1
+	assert player._current_file.name == '2-t2.webm'
+	assert opened[0].cleaned
+	assert [embed.title for embed in channel.sent] == ['t2']
+
+
+async def test_clearing_the_queue_withdraws_the_chained_track(make_player, make_track, monkeypatch, tmp_path):
+	opened = open_frame_sources(monkeypatch)
+	player = make_player()
+	record_downloads(monkeypatch, tmp_path)
+	first = make_track('t1')
+	await player.enqueue(first)
+	await player.enqueue(make_track('t2'))
+	await settle()
+	chain = player._chain
+
+	player.clear()
+	frames = await play_out(chain)
+	await settle(0.05)
+
+	assert frames == [b'1-t1.webm'] * 2
+	assert player.current is first
+	assert opened[1].cleaned
+
+
+async def test_a_track_queued_in_the_last_seconds_is_still_chained(make_player, make_track, monkeypatch, tmp_path):
+	open_frame_sources(monkeypatch)
+	player = make_player()
+	record_downloads(monkeypatch, tmp_path)
+	await player.enqueue(make_track('t1'))
+	await settle()
+	assert player._chained is None
+
+	late = make_track('t2')
+	await player.enqueue(late)
+	await settle()
+
+	assert player._chained is late
+
+
+async def test_a_skip_at_the_switch_skips_the_track_now_playing(make_player, make_track, monkeypatch, tmp_path):
+	open_frame_sources(monkeypatch)
+	player = make_player()
+	record_downloads(monkeypatch, tmp_path)
+	first, second, third = make_track('t1'), make_track('t2'), make_track('t3')
+	for track in (first, second, third):
+		await player.enqueue(track)
+	await settle()
+
+	# The voice thread has switched; the loop has not caught up yet.
+	while player._chain.read() != b'2-t2.webm':
+		pass
+	skipped, next_track, _ = await player.skip()
+
+	assert skipped is second
+	assert next_track is third
+
+
+# --- playback clock ----------------------------------------------------------
+
+
+async def test_the_clock_counts_frames_sent_not_wall_time(make_player, make_track, monkeypatch, tmp_path):
+	open_frame_sources(monkeypatch, frames=2000)
+	player = make_player()
+	record_downloads(monkeypatch, tmp_path)
+	await player.enqueue(make_track('t1'))
+	await settle()
+	assert player.elapsed == 0, 'nothing has been sent yet'
+
+	for _ in range(1500):
+		player._chain.read()
+	await settle(0.1)
+
+	assert player.elapsed == pytest.approx(30)
+
+
+async def test_a_rebuilt_session_resumes_from_what_was_sent(make_player, make_track, monkeypatch, tmp_path):
+	open_frame_sources(monkeypatch, frames=2000)
+	player = make_player()
+	record_downloads(monkeypatch, tmp_path)
+	await player.enqueue(make_track('t1'))
+	await settle()
+	for _ in range(1500):
+		player._chain.read()
+
+	assert await player.revive_voice('test')
+	await settle()
+
+	assert player.elapsed_offset == pytest.approx(30 - 2.0)
+	assert player.elapsed == pytest.approx(30 - 2.0)
+
+
+async def test_the_clock_restarts_with_the_next_track(make_player, make_track, monkeypatch, tmp_path):
+	open_frame_sources(monkeypatch, frames=50)
+	player = make_player()
+	record_downloads(monkeypatch, tmp_path)
+	await player.enqueue(make_track('t1'))
+	await player.enqueue(make_track('t2'))
+	await settle()
+
+	for _ in range(60):
+		player._chain.read()
+	await settle(0.05)
+
+	assert player.current.title == 't2'
+	assert player.elapsed == pytest.approx(10 * 0.02)
+
+
+# --- seeking -----------------------------------------------------------------
+
+
+async def test_seeking_restarts_the_track_from_its_file_in_place(make_player, make_track, monkeypatch, tmp_path):
+	opened = open_frame_sources(monkeypatch, frames=2000)
+	player = make_player()
+	calls = record_downloads(monkeypatch, tmp_path)
+	track, upcoming = make_track('t1'), make_track('t2')
+	await player.enqueue(track)
+	await player.enqueue(upcoming)
+	await settle()
+	chain = player._chain
+	for _ in range(100):
+		chain.read()
+
+	position, error = await player.seek(75)
+	await settle(0.05)
+
+	assert (position, error) == (75, None)
+	assert (opened[-1].name, opened[-1].seek) == ('1-t1.webm', 75)
+	assert player.current is track and list(player.queue) == [upcoming]
+	assert player._chain is chain and player.voice_client.plays == 1
+	assert calls == [track.webpage_url, upcoming.webpage_url], 'nothing was fetched again'
+	assert player.elapsed == 75
+	chain.read()
+	assert player.elapsed == pytest.approx(75.02)
+	# The voice thread lets go of the old file once it has moved on from it.
+	await settle(0.05)
+	assert opened[0].cleaned
+
+
+async def test_seeking_a_track_that_is_still_streaming_is_refused(make_player, make_track, monkeypatch):
+	player = make_player(download_delay=5, stream_delay=0.01)
+	await player.enqueue(make_track('t1'))
+	await player.wait_for_start()
+
+	position, error = await player.seek(30)
+
+	assert position is None
+	assert 'still downloading' in error
+
+
+async def test_seeking_past_the_end_is_refused(make_player, make_track, monkeypatch, tmp_path):
+	open_frame_sources(monkeypatch)
+	player = make_player()
+	record_downloads(monkeypatch, tmp_path)
+	await player.enqueue(make_track('t1', duration=60))
+	await settle()
+
+	assert await player.seek(60) == (None, 'That is past the end of the track.')
@@ -0,0 +1,140 @@
+"""Worker processes: per-thread ownership, recycling, timeouts, aborts and calls back to the parent."""
+import os
+import threading
+import time
+
+import pytest
+
+from src.core.process_pool import Host, JobAborted, JobFailed, JobTimeout, ProcessPool
+
+
+# Jobs run in a spawned process, so they must be importable module-level functions.
+
+def pid() -> int:
+	return os.getpid()
+
+
+def nap(seconds: float) -> int:
+	time.sleep(seconds)
+	return os.getpid()
+
+
+def refuse(message: str):
+	raise LookupError(message)
+
+
+def unpicklable_error():
+	error = RuntimeError('HTTP Error 429: Too Many Requests')
+	error.handle = threading.Lock()
+	raise error
+
+
+def die():
+	os._exit(3)
+
+
+_HOST: Host | None = None
+
+
+def remember_host(host: Host):
+	global _HOST
+	_HOST = host
+
+
+def ask_twice() -> list:
+	_HOST.tell('note', 'started')
+	return [_HOST.ask('double', 2), _HOST.ask('double', 5)]
+
+
+@pytest.fixture
+def pool():
+	pool = ProcessPool(initializer=remember_host)
+	yield pool
+	pool.close()
+
+
+def test_a_thread_keeps_its_worker_and_threads_never_share_one(pool):
+	main = pool.call(pid, timeout=30)
+	assert pool.call(pid, timeout=30) == main
+
+	seen = []
+	thread = threading.Thread(target=lambda: seen.append(pool.call(pid, timeout=30)))
+	thread.start()
+	thread.join()
+
+	assert seen[0] not in (main, os.getpid())
+
+
+def test_a_worker_is_replaced_after_max_jobs():
+	pool = ProcessPool(max_jobs=2)
+	try:
+		pids = [pool.call(pid, timeout=30) for _ in range(3)]
+	finally:
+		pool.close()
+
+	assert pids[0] == pids[1] != pids[2]
+
+
+def test_a_worker_that_grew_past_max_rss_is_replaced():
+	pool = ProcessPool(max_rss=0)
+	try:
+		assert pool.call(pid, timeout=30) != pool.call(pid, timeout=30)
+	finally:
+		pool.close()
+
+
+def test_errors_come_back_as_themselves_and_keep_the_worker(pool):
+	first = pool.call(pid, timeout=30)
+	with pytest.raises(LookupError, match='no such video'):
+		pool.call(refuse, 'no such video', timeout=30)
+
+	assert pool.call(pid, timeout=30) == first
+
+
+def test_an_error_that_cannot_pickle_keeps_its_message(pool):
+	with pytest.raises(JobFailed, match='RuntimeError: HTTP Error 429'):
+		pool.call(unpicklable_error, timeout=30)
+
+
+def test_a_job_past_its_timeout_is_killed(pool):
+	first = pool.call(pid, timeout=30)
+
+	started = time.monotonic()
+	with pytest.raises(JobTimeout):
+		pool.call(nap, 30, timeout=0.5)
+
+	assert time.monotonic() - started < 5
+	assert pool.call(pid, timeout=30) != first
+
+
+def test_an_aborted_job_is_killed(pool):
+	pool.call(pid, timeout=30)
+	abort = threading.Event()
+	threading.Timer(0.2, abort.set).start()
+
+	started = time.monotonic()
+	with pytest.raises(JobAborted):
+		pool.call(nap, 30, timeout=60, abort=abort)
+
+	assert time.monotonic() - started < 5
+
+
+def test_a_worker_that_dies_is_reported_and_replaced(pool):
+	with pytest.raises(JobFailed, match='code 3'):
+		pool.call(die, timeout=30)
+
+	assert pool.call(pid, timeout=30) != os.getpid()
+
+
+def test_the_parent_answers_the_worker_without_spending_its_timeout(pool):
+	told = []
+
+	def serve(name, *args):
+		if name == 'note':
+			told.extend(args)
+			return None
+		time.sleep(0.6)
+		return args[0] * 2
+
+	assert pool.call(ask_twice, timeout=1, serve=serve) == [4, 10]
+	assert told == ['started']
@@ -0,0 +1,193 @@
+"""GaplessSource: switching to the chained source on the same frame, and crossfading PCM."""
+from array import array
+
+from src.features.music.transition import GaplessSource
+
+
+def pcm(value: int) -> bytes:
+	"""One 20 ms stereo frame holding a single sample value."""
+	return array('h', [value] * 1920).tobytes()
+
+
+class FakeSource:
+	def __init__(self, frames, *, opus: bool = False):
+		self.frames = list(frames)
+		self.opus = opus
+		self.cleaned = False
+
+	def read(self) -> bytes:
+		return self.frames.pop(0) if self.frames else b''
+
+	def is_opus(self) -> bool:
+		return self.opus
+
+	def cleanup(self):
+		self.cleaned = True
+
+
+def drain(source: GaplessSource) -> list[bytes]:
+	frames = []
+	while frame := source.read():
+		frames.append(frame)
+	return frames
+
+
+def test_the_chained_source_follows_on_the_same_read():
+	switches = []
+	first = FakeSource([b'a1', b'a2'], opus=True)
+	second = FakeSource([b'b1'], opus=True)
+	source = GaplessSource(first, on_switch=lambda: switches.append(True))
+	source.chain(second, 'next')
+
+	assert drain(source) == [b'a1', b'a2', b'b1']
+	assert switches == [True]
+	assert source.take_switch() == 'next'
+	assert source.take_switch() is None
+
+
+def test_frames_are_counted_per_track():
+	source = GaplessSource(FakeSource([b'a1', b'a2', b'a3'], opus=True))
+	source.chain(FakeSource([b'b1', b'b2'], opus=True), 'next')
+
+	for _ in range(3):
+		source.read()
+	assert source.frames == 3
+
+	source.read()
+	assert source.frames == 1
+
+	drain(source)
+	assert source.frames == 2
+
+
+def test_a_replaced_source_carries_on_from_the_next_read():
+	first = FakeSource([b'a1', b'a2', b'a3'], opus=True)
+	source = GaplessSource(first)
+	source.read()
+
+	assert source.replace(FakeSource([b'seeked'], opus=True))
+	assert drain(source) == [b'seeked']
+	assert source.frames == 1
+
+
+def test_a_stalled_read_does_not_hold_up_the_player():
+	import threading
+	import time
+	release = threading.Event()
+
+	class StalledSource(FakeSource):
+		def read(self) -> bytes:
+			release.wait(2)
+			return super().read()
+
+	source = GaplessSource(StalledSource([b'a1'], opus=True))
+	reader = threading.Thread(target=source.read)
+	reader.start()
+	time.sleep(0.05)
+
+	started = time.perf_counter()
+	source.chain(FakeSource([b'b1'], opus=True), 'next')
+	source.take_switch()
+	assert source.replace(FakeSource([b'seeked'], opus=True))
+	blocked = time.perf_counter() - started
+	release.set()
+	reader.join()
+
+	assert blocked < 0.1
+	assert drain(source) == [b'seeked', b'b1']
+
+
+def test_a_track_replaced_as_it_runs_dry_carries_on_from_the_replacement():
+	import threading
+	release = threading.Event()
+
+	class DryingSource(FakeSource):
+		def read(self) -> bytes:
+			release.wait(2)
+			return super().read()
+
+	source = GaplessSource(DryingSource([], opus=True))
+	source.chain(FakeSource([b'b1'], opus=True), 'next')
+	frames = []
+	reader = threading.Thread(target=lambda: frames.append(source.read()))
+	reader.start()
+	source.replace(FakeSource([b'seeked'], opus=True))
+	release.set()
+	reader.join()
+
+	assert frames == [b'seeked']
+	assert drain(source) == [b'b1']
+
+
+def test_a_track_that_already_gave_way_is_not_replaced():
+	source = GaplessSource(FakeSource([], opus=True))
+	source.chain(FakeSource([b'b1', b'b2'], opus=True), 'next')
+	source.read()
+
+	assert not source.replace(FakeSource([b'seeked'], opus=True))
+	assert source.read() == b'b2'
+
+
+def test_an_unchained_source_ends_with_its_track():
+	first = FakeSource([b'a1'], opus=True)
+	second = FakeSource([b'b1'], opus=True)
+	source = GaplessSource(first)
+	source.chain(second, 'next')
+	source.unchain()
+
+	assert drain(source) == [b'a1']
+	assert source.take_switch() is None
+
+
+def test_chaining_again_replaces_the_queued_source(monkeypatch):
+	from src.features.music import transition
+	cleaned = []
+	monkeypatch.setattr(transition, '_cleanup_later', cleaned.append)
+	stale = FakeSource([b'x'], opus=True)
+	source = GaplessSource(FakeSource([], opus=True))
+	source.chain(stale, 'stale')
+	source.chain(FakeSource([b'b1'], opus=True), 'next')
+
+	assert cleaned == [stale]
+	assert drain(source) == [b'b1']
+	assert source.take_switch() == 'next'
+
+
+def test_cleanup_reaches_a_source_that_never_played():
+	first, second = FakeSource([b'a1'], opus=True), FakeSource([b'b1'], opus=True)
+	source = GaplessSource(first)
+	source.chain(second, 'next')
+
+	source.cleanup()
+
+	assert first.cleaned and second.cleaned
+
+
+def test_pcm_tracks_crossfade_over_the_last_frames():
+	first = FakeSource([pcm(1000)] * 6)
+	second = FakeSource([pcm(-1000)] * 6)
+	source = GaplessSource(first, fade_frames=2)
+	source.chain(second, 'next')
+
+	frames = [array('h', frame) for frame in drain(source)]
+
+	# Four frames of the first track alone, two mixed, then the rest of the second.
+	assert len(frames) == 10
+	assert [frame[0] for frame in frames[3:7]] == [1000, 333, -333, -1000]
+	assert source.take_switch() == 'next'
+
+
+def test_opus_tracks_switch_without_a_fade():
+	first = FakeSource([pcm(1000)] * 3)
+	second = FakeSource([b'opus'], opus=True)
+	source = GaplessSource(first, fade_frames=2)
+	source.chain(second, 'next')
+
+	frames = []
+	kinds = []
+	while frame := source.read():
+		frames.append(frame)
+		kinds.append(source.is_opus())
+
+	assert frames == [pcm(1000)] * 3 + [b'opus']
+	assert kinds == [False, False, False, True]
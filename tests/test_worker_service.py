@@ -0,0 +1,192 @@
+"""The worker service and the bot's client for it: lookups, downloads, releases, fallback."""
+import asyncio
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from src.features.music import extractor as ex
+from src.features.music import worker_service
+from src.features.music.executor import Lane, Ticket
+from src.features.music.worker_client import ServiceError, WorkerClient
+
+
+FIELDS = {
+	'title': 'Song', 'webpage_url': 'https://www.youtube.com/watch?v=abcdefghijk',
+	'duration': 90, 'thumbnail': None, 'uploader': 'Band',
+}
+
+
+@pytest.fixture
+async def service(monkeypatch):
+	# Well inside the 108 bytes a UNIX socket path may take.
+	socket = Path(tempfile.mkdtemp(prefix='mw')) / 'sock'
+	runner = await worker_service.serve(socket=str(socket))
+	client = WorkerClient(f'unix:{socket}')
+	monkeypatch.setattr(ex, 'SERVICE', client)
+	yield client
+	client.close()
+	await runner.cleanup()
+	shutil.rmtree(socket.parent, ignore_errors=True)
+
+
+async def settle():
+	"""Let fire-and-forget calls to the service land."""
+	for _ in range(20):
+		await asyncio.sleep(0.01)
+
+
+async def test_a_track_is_looked_up_by_the_service(service, monkeypatch):
+	seen = []
+
+	async def lookup(query, guild_id, bitrate):
+		seen.append((query, guild_id, bitrate))
+		return FIELDS, {'id': 'abcdefghijk', 'format_id': '251', 'formats': []}
+
+	monkeypatch.setattr(ex, '_lookup', lookup)
+
+	track = await ex.extract_track('some song', 1, 'a', guild_id=7, bitrate=96000)
+
+	assert seen == [('some song', 7, 96000)]
+	assert (track.title, track.requester_name) == ('Song', 'a')
+	assert track.source['format_id'] == '251'
+
+
+async def test_a_rejection_comes_back_as_itself(service, monkeypatch):
+	async def lookup(query, guild_id, bitrate):
+		raise ex.TrackRejected('Live streams are not supported.', 'abcdefghijk')
+
+	monkeypatch.setattr(ex, '_lookup', lookup)
+
+	with pytest.raises(ex.TrackRejected, match='Live streams') as raised:
+		await ex.extract_track('some stream', 1, 'a')
+	assert raised.value.video_id == 'abcdefghijk'
+
+
+async def test_other_failures_are_reported_as_service_errors(service, monkeypatch):
+	async def resolve(webpage_url, guild_id, bitrate):
+		raise RuntimeError('player script changed')
+
+	monkeypatch.setattr(ex, '_resolve_here', resolve)
+
+	with pytest.raises(ServiceError, match='player script changed'):
+		await ex.resolve_stream('https://youtu.be/abcdefghijk')
+
+
+async def test_a_downloaded_path_is_released_back_to_the_service(service, monkeypatch, tmp_path):
+	path = tmp_path / 'abcdefghijk.opus'
+	released = []
+
+	async def download(webpage_url, guild_id, ticket, source, bitrate):
+		return path
+
+	monkeypatch.setattr(ex, '_download_here', download)
+	monkeypatch.setattr(ex, '_release_here', released.append)
+
+	assert await ex.download_audio('https://youtu.be/abcdefghijk', 7) == path
+	assert service.owns(path)
+
+	ex.release_audio(path)
+	await settle()
+
+	assert released == [path]
+	assert not service.owns(path)
+
+
+async def test_the_service_never_deletes_a_path_it_did_not_hand_out(service, tmp_path):
+	victim = tmp_path / 'important.txt'
+	victim.write_text('keep me')
+
+	await service._post('release', {'path': str(victim)})
+
+	assert victim.exists()
+
+
+async def test_a_token_is_required_when_the_service_has_one(monkeypatch):
+	async def lookup(query, guild_id, bitrate):
+		return FIELDS, None
+
+	monkeypatch.setattr(ex, '_lookup', lookup)
+	socket = Path(tempfile.mkdtemp(prefix='mw')) / 'sock'
+	runner = await worker_service.serve(socket=str(socket), token='secret')
+	strangers = WorkerClient(f'unix:{socket}')
+	bot = WorkerClient(f'unix:{socket}', 'secret')
+	try:
+		with pytest.raises(ServiceError):
+			await strangers.extract('some song', 1, None)
+		fields, _ = await bot.extract('some song', 1, None)
+	finally:
+		strangers.close()
+		bot.close()
+		await settle()
+		await runner.cleanup()
+		shutil.rmtree(socket.parent, ignore_errors=True)
+
+	assert fields['title'] == 'Song'
+
+
+async def test_health_reports_the_governor_budget(monkeypatch):
+	from aiohttp.test_utils import TestClient, TestServer
+
+	from src.features.music.governor import Governor
+
+	monkeypatch.setattr(ex, 'GOVERNOR', Governor(rate=3, burst=5))
+	async with TestClient(TestServer(worker_service.create_app())) as client:
+		response = await client.get('/health')
+		health = await response.json()
+
+	assert health['governor']['max_rate'] == 3
+	assert health['governor']['backoffs'] == 0
+	assert 'pending' in health
+
+
+async def test_listening_off_loopback_takes_a_token():
+	with pytest.raises(ValueError, match='MUSIC_WORKER_TOKEN'):
+		await worker_service.serve(host='0.0.0.0', port=0)
+
+
+async def test_a_promotion_reaches_the_download_in_the_service(service, monkeypatch, tmp_path):
+	started = asyncio.Event()
+	lanes = []
+
+	async def download(webpage_url, guild_id, ticket, source, bitrate):
+		started.set()
+		while ticket.lane != Lane.PLAYBACK:
+			await asyncio.sleep(0.01)
+		lanes.append(ticket.lane)
+		return tmp_path / 'abcdefghijk.opus'
+
+	monkeypatch.setattr(ex, '_download_here', download)
+	ticket = Ticket(Lane.PREFETCH)
+
+	task = asyncio.create_task(ex.download_audio('https://youtu.be/abcdefghijk', 7, ticket))
+	await asyncio.wait_for(started.wait(), 5)
+	ticket.promote(Lane.PLAYBACK)
+	await asyncio.wait_for(task, 5)
+
+	assert lanes == [Lane.PLAYBACK]
+
+
+async def test_an_unreachable_service_falls_back_to_this_process(monkeypatch, capsys):
+	async def lookup(query, guild_id, bitrate):
+		return FIELDS, None
+
+	monkeypatch.setattr(ex, '_lookup', lookup)
+	monkeypatch.setattr(ex, 'SERVICE', WorkerClient('unix:/nonexistent/music.sock'))
+
+	track = await ex.extract_track('some song', 1, 'a')
+	ex.SERVICE.close()
+
+	assert track.title == 'Song'
+	assert 'running the job here' in capsys.readouterr().out
+
+
+def test_a_bot_using_a_service_keeps_its_own_downloads_apart(monkeypatch):
+	for name in ('SERVICE', 'CACHE_DIR', 'AUDIO_CACHE'):
+		monkeypatch.setattr(ex, name, getattr(ex, name))
+
+	ex.configure_service('http://127.0.0.1:8750')
+	ex.configure_service('http://127.0.0.1:8750')
+
+	assert ex.CACHE_DIR == ex.AUDIO_CACHE.root == ex.FALLBACK_CACHE_DIR
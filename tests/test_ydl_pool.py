@@ -0,0 +1,109 @@
+"""Pooled YoutubeDL handles: reuse, per-thread ownership, recycling."""
+import threading
+
+import pytest
+
+from src.features.music import ydl_pool
+from src.features.music.ydl_pool import YdlPool
+
+
+class FakeYoutubeDL:
+	created = []
+
+	def __init__(self, opts):
+		self.params = opts
+		self.closed = False
+		FakeYoutubeDL.created.append(self)
+
+	def close(self):
+		self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def fake_ydl(monkeypatch):
+	FakeYoutubeDL.created = []
+	monkeypatch.setattr(ydl_pool.yt_dlp, 'YoutubeDL', FakeYoutubeDL)
+
+
+def use(pool):
+	with pool.checkout() as ydl:
+		return ydl
+
+
+def test_a_thread_reuses_its_handle():
+	pool = YdlPool({'quiet': True})
+	assert use(pool) is use(pool)
+	assert len(FakeYoutubeDL.created) == 1
+
+
+def test_threads_never_share_a_handle():
+	pool = YdlPool({})
+	main = use(pool)
+	seen = []
+	thread = threading.Thread(target=lambda: seen.append(use(pool)))
+	thread.start()
+	thread.join()
+
+	assert seen[0] is not main
+
+
+def test_handle_is_recycled_after_max_uses():
+	pool = YdlPool({}, max_uses=2)
+	first = use(pool)
+	assert use(pool) is first
+	assert first.closed
+
+	assert use(pool) is not first
+
+
+def test_an_error_retires_the_handle():
+	pool = YdlPool({})
+	with pytest.raises(RuntimeError):
+		with pool.checkout() as ydl:
+			broken = ydl
+			raise RuntimeError('mid-request')
+
+	assert broken.closed
+	assert use(pool) is not broken
+
+
+class Rejected(Exception):
+	pass
+
+
+@pytest.mark.parametrize('error', [
+	ydl_pool.yt_dlp.utils.DownloadCancelled('Download abandoned'),
+	Rejected('not playable'),
+], ids=['cancelled', 'clean'])
+def test_an_error_between_requests_keeps_the_handle(error):
+	pool = YdlPool({}, max_uses=2, clean_errors=(Rejected,))
+	with pytest.raises(type(error)):
+		with pool.checkout() as ydl:
+			kept = ydl
+			raise error
+
+	assert not kept.closed
+	assert use(pool) is kept
+	# Still counted as a use.
+	assert kept.closed
+
+
+def test_handles_do_not_share_option_dicts():
+	opts = {'outtmpl': 'x'}
+	pool = YdlPool(opts)
+	use(pool).params['outtmpl'] = {'default': 'changed'}
+	assert opts == {'outtmpl': 'x'}
+
+
+def test_close_closes_every_handle():
+	pool = YdlPool({})
+	main = use(pool)
+	other = []
+	thread = threading.Thread(target=lambda: other.append(use(pool)))
+	thread.start()
+	thread.join()
+
+	pool.close()
+
+	assert main.closed and other[0].closed
+	assert use(pool) is not main